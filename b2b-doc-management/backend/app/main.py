@@ -1,10 +1,30 @@
+import asyncio
+import logging
+import os
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.middleware.query_stats import QueryStatsMiddleware
 from app.routes import router
 from app.routes_v2 import router as v2_router
+from app.routes_v2_async import router as v2_async_router
 # from app.routes_ai import router as ai_router  # 暫時停用AI功能
 from app.services.auth import router as auth_router
-from app.utils.db import init_db
+from app.services.application_stats import ApplicationStatsService, APPLICATION_COUNTER_RECONCILE_INTERVAL
+from app.services.password_hasher import password_hasher
+from app.services.thumbnailer import thumbnailer
+from app.services.token_revocation import revocation_store, REVOCATION_SYNC_INTERVAL
+from app.utils.db import init_db, warm_up_pool, wait_for_db, check_db
+from app.utils.migrations import run_migrations
+from app.utils.async_db import dispose_async_engine
+from app.utils.slow_query import slow_query_log
+from app.utils.blob_store import blob_store, BLOB_GC_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# 啟動時自動套用資料庫遷移；多實例部署可關閉並改由 scripts.migrate 在部署時執行
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', 'true').lower() in ('1', 'true', 'yes')
 
 app = FastAPI()
 
@@ -15,13 +35,111 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Queries"],
 )
+# 每個請求的 SQL 語句數與資料庫耗時
+app.add_middleware(QueryStatsMiddleware)
+
+async def sync_revocations():
+    """定期同步其他工作行程的登出紀錄並清除過期項目"""
+    loop = asyncio.get_running_loop()
+    cycles = 0
+    while True:
+        try:
+            await loop.run_in_executor(None, revocation_store.sync)
+            cycles += 1
+            if cycles % 60 == 0:
+                await loop.run_in_executor(None, revocation_store.purge_expired)
+        except Exception as e:
+            logger.warning(f"同步撤銷紀錄失敗: {e}")
+        await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+
+async def collect_blob_garbage():
+    """定期清除引用數歸零的 blob"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL)
+        try:
+            await loop.run_in_executor(None, blob_store.collect_garbage)
+        except Exception as e:
+            logger.warning(f"清除未引用的 blob 失敗: {e}")
+
+async def reconcile_application_counters():
+    """定期以申請案件重新計算統計計數並修正漂移"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(APPLICATION_COUNTER_RECONCILE_INTERVAL)
+        try:
+            result = await loop.run_in_executor(None, ApplicationStatsService.reconcile)
+            if not result['success']:
+                logger.warning(f"申請案件計數對帳失敗: {result['error']}")
+        except Exception as e:
+            logger.warning(f"申請案件計數對帳失敗: {e}")
+
+async def prepare_database():
+    """等待資料庫、建立資料表、套用遷移並預熱連線池，完成後才將服務標記為 ready"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, wait_for_db)
+            await loop.run_in_executor(None, init_db)
+            if DB_AUTO_MIGRATE:
+                await loop.run_in_executor(None, run_migrations)
+            await loop.run_in_executor(None, warm_up_pool)
+            break
+        except Exception as e:
+            logger.error(f"資料庫初始化失敗，稍後重試: {e}")
+            await asyncio.sleep(5)
+
+    app.state.db_ready = True
+    app.state.revocation_sync = asyncio.create_task(sync_revocations())
+    app.state.blob_gc = asyncio.create_task(collect_blob_garbage())
+    if APPLICATION_COUNTER_RECONCILE_INTERVAL > 0:
+        app.state.counter_reconcile = asyncio.create_task(reconcile_application_counters())
 
 @app.on_event("startup")
 async def startup_event():
-    init_db()
+    # 不在啟動時阻塞等待資料庫；以 /readyz 讓編排系統決定何時導入流量
+    app.state.db_ready = False
+    app.state.revocation_sync = None
+    app.state.blob_gc = None
+    app.state.counter_reconcile = None
+    app.state.db_prepare = asyncio.create_task(prepare_database())
+    # 在背景預熱密碼雜湊行程池
+    asyncio.get_running_loop().run_in_executor(None, password_hasher.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.db_prepare.cancel()
+    if app.state.revocation_sync:
+        app.state.revocation_sync.cancel()
+    if app.state.blob_gc:
+        app.state.blob_gc.cancel()
+    if app.state.counter_reconcile:
+        app.state.counter_reconcile.cancel()
+    password_hasher.shutdown()
+    thumbnailer.shutdown()
+    slow_query_log.shutdown()
+    await dispose_async_engine()
+
+@app.get('/healthz')
+async def healthz():
+    """Liveness probe：行程存活即回應"""
+    return {'status': 'ok'}
+
+@app.get('/readyz')
+async def readyz():
+    """Readiness probe：資料庫已初始化、連線池已預熱且目前可連線"""
+    if not app.state.db_ready:
+        return JSONResponse({'status': 'starting'}, status_code=503)
+    if not await run_in_threadpool(check_db):
+        return JSONResponse({'status': 'database unavailable'}, status_code=503)
+    return {'status': 'ready'}
 
 app.include_router(router)
+if os.getenv('API_V2_ASYNC', 'false').lower() in ('1', 'true', 'yes'):
+    # 非同步版本的 v2 唯讀端點需先註冊，才能優先於同路徑的同步端點
+    app.include_router(v2_async_router)
 app.include_router(v2_router)  # 新的 API 路由
 # app.include_router(ai_router)  # AI 功能路由 - 暫時停用
 app.include_router(auth_router)
@@ -3,9 +3,12 @@
 提供統一的Token驗證和用戶認證功能
 """
 from fastapi import HTTPException, Header, Depends
-from typing import Optional
-from app.services.auth_service import AuthService
-from app.models import User
+from typing import AsyncIterator, Iterator, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.auth_service import AuthService, TokenPrincipal, STATELESS_CLAIMS_ENABLED
+from app.utils.db import get_db, ReadSessionLocal, bind_session_user
+from app.utils.async_db import AsyncReadSessionLocal
 
 
 def get_bearer_token(authorization: str = Header(None)) -> str:
@@ -36,12 +39,13 @@ def get_bearer_token(authorization: str = Header(None)) -> str:
     return authorization.split(' ', 1)[1]
 
 
-def get_current_user(token: str = Depends(get_bearer_token)) -> User:
+def get_current_user(token: str = Depends(get_bearer_token), db: Session = Depends(get_db)) -> TokenPrincipal:
     """
     根據token獲取當前用戶
     
     Args:
         token: JWT token
+        db: 請求範圍的資料庫 session
         
     Returns:
         當前用戶對象
@@ -49,7 +53,7 @@ def get_current_user(token: str = Depends(get_bearer_token)) -> User:
     Raises:
         HTTPException: 當token無效或用戶不存在時
     """
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     user = auth_service.get_user_by_token(token)
     
     if not user:
@@ -58,10 +62,73 @@ def get_current_user(token: str = Depends(get_bearer_token)) -> User:
             detail='Unauthorized - Invalid or expired token'
         )
     
+    # 此請求提交的寫入會讓該用戶後續的讀取暫時改走主庫
+    bind_session_user(db, user.id)
     return user
 
 
-def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+def get_current_principal(token: str = Depends(get_bearer_token), db: Session = Depends(get_db)) -> TokenPrincipal:
+    """
+    取得只需身分、公司與角色的當前用戶主體
+    
+    啟用 AUTH_STATELESS_CLAIMS 時直接由已驗證的token claims建立，不查詢資料庫；
+    未啟用或token已超過 claims 有效期時，退回 get_current_user。
+    
+    Args:
+        token: JWT token
+        db: 請求範圍的資料庫 session
+        
+    Returns:
+        具有 id、username、company_name、role、is_admin 的用戶主體
+        
+    Raises:
+        HTTPException: 當token無效或用戶不存在時
+    """
+    if STATELESS_CLAIMS_ENABLED:
+        principal = AuthService(db).get_principal_by_token(token)
+        if principal:
+            return principal
+    
+    return get_current_user(token, db)
+
+
+def get_read_db(current_user: TokenPrincipal = Depends(get_current_principal)) -> Iterator[Session]:
+    """
+    請求範圍的讀取專用 session（FastAPI 依賴）
+    
+    一般讀取走讀取副本；當前用戶剛寫入過（read-your-writes 視窗內）時改走主庫。
+    
+    Args:
+        current_user: 當前用戶主體
+        
+    Returns:
+        讀取專用 session
+    """
+    db = ReadSessionLocal(current_user.id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(current_user: TokenPrincipal = Depends(get_current_principal)) -> AsyncIterator[AsyncSession]:
+    """
+    請求範圍的讀取專用 AsyncSession（FastAPI 依賴），路由規則同 get_read_db
+    
+    Args:
+        current_user: 當前用戶主體
+        
+    Returns:
+        讀取專用 AsyncSession
+    """
+    db = AsyncReadSessionLocal(current_user.id)
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def get_current_admin(current_user: TokenPrincipal = Depends(get_current_user)) -> TokenPrincipal:
     """
     檢查當前用戶是否為管理員
     
@@ -83,12 +150,13 @@ def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def get_optional_user(authorization: str = Header(None)) -> Optional[User]:
+def get_optional_user(authorization: str = Header(None), db: Session = Depends(get_db)) -> Optional[TokenPrincipal]:
     """
     可選的用戶認證，不會拋出異常
     
     Args:
         authorization: Authorization header值
+        db: 請求範圍的資料庫 session
         
     Returns:
         用戶對象或None
@@ -98,14 +166,14 @@ def get_optional_user(authorization: str = Header(None)) -> Optional[User]:
             return None
         
         token = authorization.split(' ', 1)[1]
-        auth_service = AuthService()
+        auth_service = AuthService(db)
         return auth_service.get_user_by_token(token)
     except Exception:
         return None
 
 
 def verify_user_permission(
-    current_user: User, 
+    current_user: TokenPrincipal, 
     target_user_id: int, 
     allow_admin: bool = True
 ) -> bool:
@@ -130,7 +198,7 @@ def verify_user_permission(
 
 
 def verify_company_permission(
-    current_user: User, 
+    current_user: TokenPrincipal, 
     target_company: str, 
     allow_admin: bool = True
 ) -> bool:
@@ -0,0 +1,52 @@
+"""
+請求 SQL 統計中間件
+為每個請求建立 QueryStats，回應時加上 Server-Timing 與 X-DB-Queries header 並輸出結構化日誌
+"""
+import json
+import logging
+from app.utils.query_stats import track_queries
+
+logger = logging.getLogger('app.request')
+
+# 探針請求頻繁且不查詢業務資料，只加 header 不寫日誌
+QUIET_PATHS = ('/healthz', '/readyz')
+
+
+class QueryStatsMiddleware:
+    """ASGI 中間件：統計每個 HTTP 請求的 SQL 語句數、資料庫耗時與讀取列數"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        with track_queries() as stats:
+            stats.scope = scope
+            async def send_with_stats(message):
+                nonlocal status_code
+                if message['type'] == 'http.response.start':
+                    status_code = message['status']
+                    summary = stats.to_dict()
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', (
+                        f'db;dur={summary["db_ms"]};desc="{summary["db_queries"]} queries", '
+                        f'total;dur={summary["total_ms"]}'
+                    ).encode('latin-1')))
+                    headers.append((b'x-db-queries', str(summary['db_queries']).encode('latin-1')))
+                    message = {**message, 'headers': headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                if scope['path'] not in QUIET_PATHS:
+                    logger.info(json.dumps({
+                        'method': scope['method'],
+                        'path': scope['path'],
+                        'status': status_code,
+                        **stats.to_dict()
+                    }, ensure_ascii=False))
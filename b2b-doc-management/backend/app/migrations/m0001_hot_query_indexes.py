@@ -0,0 +1,25 @@
+"""
+0001 熱門查詢的複合索引
+"""
+from app.utils.migrations import create_index_if_missing
+
+VERSION = '0001'
+DESCRIPTION = 'hot query composite indexes'
+
+INDEXES = [
+    # 用戶申請列表：WHERE user_id=? [AND status=?] ORDER BY created_at DESC
+    ('applications', 'ix_applications_user_created', ['user_id', 'created_at']),
+    ('applications', 'ix_applications_user_status_created', ['user_id', 'status', 'created_at']),
+    # 管理員列表：[WHERE status=?] ORDER BY created_at DESC LIMIT/OFFSET
+    ('applications', 'ix_applications_status_created', ['status', 'created_at']),
+    ('applications', 'ix_applications_created', ['created_at']),
+    # 依中文姓名查找既有個人資料
+    ('individuals', 'ix_individuals_chinese_name', ['chinese_last_name', 'chinese_first_name']),
+    # 未讀通知：WHERE user_id=? AND is_read=0
+    ('notifications', 'ix_notifications_user_read', ['user_id', 'is_read']),
+]
+
+
+def upgrade(connection):
+    for table, name, columns in INDEXES:
+        create_index_if_missing(connection, table, name, columns)
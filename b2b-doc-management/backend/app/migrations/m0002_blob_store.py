@@ -0,0 +1,29 @@
+"""
+0002 內容定址 blob store：blobs 資料表與個人資料圖片的摘要/大小/MIME 欄位
+"""
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table
+from app.utils.migrations import add_column_if_missing, create_index_if_missing
+
+VERSION = '0002'
+DESCRIPTION = 'content-addressed blob store'
+
+_metadata = MetaData()
+blobs = Table(
+    'blobs', _metadata,
+    Column('digest', String(64), primary_key=True),
+    Column('size', Integer, nullable=False),
+    Column('mime_type', String(100), nullable=False),
+    Column('refcount', Integer, nullable=False, default=0),
+    Column('created_at', DateTime),
+)
+
+IMAGE_FIELDS = ['passport_infomation_image', 'id_card_front_image', 'id_card_back_image']
+
+
+def upgrade(connection):
+    blobs.create(connection, checkfirst=True)
+    create_index_if_missing(connection, 'blobs', 'ix_blobs_refcount', ['refcount'])
+    for field in IMAGE_FIELDS:
+        add_column_if_missing(connection, 'individuals', f'{field}_digest', 'VARCHAR(64)')
+        add_column_if_missing(connection, 'individuals', f'{field}_size', 'INTEGER')
+        add_column_if_missing(connection, 'individuals', f'{field}_mime', 'VARCHAR(100)')
@@ -0,0 +1,24 @@
+"""
+0003 個人資料圖片的更新時間欄位，並為尚未遷移到 blob store 的舊圖片回填大小與更新時間，
+之後列表、詳情與存在判斷只需讀取中繼資料欄位
+"""
+from sqlalchemy import text
+from app.utils.migrations import add_column_if_missing
+
+VERSION = '0003'
+DESCRIPTION = 'individual image metadata'
+
+IMAGE_FIELDS = ['passport_infomation_image', 'id_card_front_image', 'id_card_back_image']
+
+
+def upgrade(connection):
+    for field in IMAGE_FIELDS:
+        add_column_if_missing(connection, 'individuals', f'{field}_updated_at', 'DATETIME')
+        connection.execute(text(
+            f"UPDATE individuals SET {field}_size = LENGTH({field}), {field}_updated_at = updated_at "
+            f"WHERE {field} IS NOT NULL AND {field}_size IS NULL"
+        ))
+        connection.execute(text(
+            f"UPDATE individuals SET {field}_updated_at = updated_at "
+            f"WHERE {field}_size IS NOT NULL AND {field}_updated_at IS NULL"
+        ))
@@ -0,0 +1,20 @@
+"""
+0004 管理員列表的游標分頁索引：以 (created_at, id) 取代只有 created_at 的索引，
+ORDER BY created_at DESC, id DESC 與游標條件都能直接走索引
+"""
+from app.utils.migrations import create_index_if_missing, drop_index_if_exists
+
+VERSION = '0004'
+DESCRIPTION = 'keyset pagination indexes'
+
+REPLACED_INDEXES = [
+    ('applications', 'ix_applications_created_id', ['created_at', 'id'], 'ix_applications_created'),
+    ('applications', 'ix_applications_status_created_id', ['status', 'created_at', 'id'], 'ix_applications_status_created'),
+]
+
+
+def upgrade(connection):
+    for table, name, columns, replaced in REPLACED_INDEXES:
+        create_index_if_missing(connection, table, name, columns)
+        # 新索引涵蓋舊索引的前綴，移除舊索引以免增加寫入成本
+        drop_index_if_exists(connection, table, replaced)
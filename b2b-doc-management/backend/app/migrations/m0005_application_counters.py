@@ -0,0 +1,29 @@
+"""
+0005 申請案件計數表：依用戶 × 狀態 × 急件程度維護的計數，並由現有申請案件回填
+"""
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, text
+
+VERSION = '0005'
+DESCRIPTION = 'application counters'
+
+_metadata = MetaData()
+application_counters = Table(
+    'application_counters', _metadata,
+    Column('user_id', Integer, primary_key=True, autoincrement=False),
+    Column('status', String(20), primary_key=True),
+    Column('urgency', String(20), primary_key=True),
+    Column('count', Integer, nullable=False, default=0),
+    Column('updated_at', DateTime),
+)
+
+
+def upgrade(connection):
+    application_counters.create(connection, checkfirst=True)
+    # 以現有資料重新計算；之後的漂移由定期對帳修正
+    connection.execute(text("DELETE FROM application_counters"))
+    connection.execute(text(
+        "INSERT INTO application_counters (user_id, status, urgency, count, updated_at) "
+        "SELECT user_id, COALESCE(status, ''), urgency, COUNT(*), :now FROM applications "
+        "GROUP BY user_id, COALESCE(status, ''), urgency"
+    ), {'now': datetime.utcnow()})
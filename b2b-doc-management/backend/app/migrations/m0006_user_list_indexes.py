@@ -0,0 +1,27 @@
+"""
+0006 用戶申請列表的分頁與排序索引：(user_id, created_at, id) 取代只有 created_at 的索引，
+並新增依申請日期排序與區間篩選的 (user_id, application_date, id)
+"""
+from app.utils.migrations import create_index_if_missing, drop_index_if_exists
+
+VERSION = '0006'
+DESCRIPTION = 'user application list indexes'
+
+REPLACED_INDEXES = [
+    ('applications', 'ix_applications_user_created_id', ['user_id', 'created_at', 'id'], 'ix_applications_user_created'),
+    ('applications', 'ix_applications_user_status_created_id', ['user_id', 'status', 'created_at', 'id'],
+     'ix_applications_user_status_created'),
+]
+
+NEW_INDEXES = [
+    ('applications', 'ix_applications_user_date_id', ['user_id', 'application_date', 'id']),
+]
+
+
+def upgrade(connection):
+    for table, name, columns, replaced in REPLACED_INDEXES:
+        create_index_if_missing(connection, table, name, columns)
+        # 新索引涵蓋舊索引的前綴，移除舊索引以免增加寫入成本
+        drop_index_if_exists(connection, table, replaced)
+    for table, name, columns in NEW_INDEXES:
+        create_index_if_missing(connection, table, name, columns)
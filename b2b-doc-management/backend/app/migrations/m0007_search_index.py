@@ -0,0 +1,23 @@
+"""
+0007 搜尋用的 n-gram 倒排索引（search_terms）與依個人資料查找申請案件的索引；
+既有資料需另外執行 python -m scripts.rebuild_search_index 建立索引內容
+"""
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table
+from app.utils.migrations import create_index_if_missing
+
+VERSION = '0007'
+DESCRIPTION = 'search index'
+
+_metadata = MetaData()
+search_terms = Table(
+    'search_terms', _metadata,
+    Column('field', String(16), primary_key=True),
+    Column('term', String(16), primary_key=True),
+    Column('doc_id', Integer, primary_key=True, autoincrement=False),
+    Index('ix_search_terms_doc', 'doc_id', 'field'),
+)
+
+
+def upgrade(connection):
+    search_terms.create(connection, checkfirst=True)
+    create_index_if_missing(connection, 'applications', 'ix_applications_individual_id', ['individual_id'])
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, LargeBinary, Date
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, LargeBinary, Date, Index
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime, date
 from .utils.db import Base
 
@@ -38,15 +38,35 @@ class Individual(Base):
     english_first_name = Column(String(100), nullable=False, comment='英文名')
     national_id = Column(String(20), nullable=False, unique=True, comment='身分證字號')
     gender = Column(Enum('男', '女'), nullable=False, comment='性別')
-    passport_infomation_image = Column(LargeBinary, comment='護照資訊頁圖片')
-    id_card_front_image = Column(LargeBinary, comment='身分證正面圖片')
-    id_card_back_image = Column(LargeBinary, comment='身分證背面圖片')
+    # 舊的圖片欄位：新上傳的圖片存放在 blob store，這些欄位只保留尚未遷移的資料；
+    # 預設延遲載入，只有圖片端點才會讀取內容
+    passport_infomation_image = deferred(Column(LargeBinary, comment='護照資訊頁圖片'))
+    id_card_front_image = deferred(Column(LargeBinary, comment='身分證正面圖片'))
+    id_card_back_image = deferred(Column(LargeBinary, comment='身分證背面圖片'))
+    # 圖片中繼資料（blob store 摘要、位元組數、MIME 類型、更新時間）；size 不為 NULL 即表示有圖片
+    passport_infomation_image_digest = Column(String(64), nullable=True, comment='護照資訊頁圖片摘要')
+    passport_infomation_image_size = Column(Integer, nullable=True)
+    passport_infomation_image_mime = Column(String(100), nullable=True)
+    passport_infomation_image_updated_at = Column(DateTime, nullable=True)
+    id_card_front_image_digest = Column(String(64), nullable=True, comment='身分證正面圖片摘要')
+    id_card_front_image_size = Column(Integer, nullable=True)
+    id_card_front_image_mime = Column(String(100), nullable=True)
+    id_card_front_image_updated_at = Column(DateTime, nullable=True)
+    id_card_back_image_digest = Column(String(64), nullable=True, comment='身分證背面圖片摘要')
+    id_card_back_image_size = Column(Integer, nullable=True)
+    id_card_back_image_mime = Column(String(100), nullable=True)
+    id_card_back_image_updated_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # 關聯
     applications = relationship("Application", back_populates="individual")
 
+    __table_args__ = (
+        # 依中文姓名查找既有個人資料
+        Index('ix_individuals_chinese_name', 'chinese_last_name', 'chinese_first_name'),
+    )
+
     @property
     def full_chinese_name(self):
         """完整中文姓名"""
@@ -78,6 +98,18 @@ class Application(Base):
     user = relationship("User", back_populates="applications")
     individual = relationship("Individual", back_populates="applications")
 
+    __table_args__ = (
+        # 用戶申請列表：WHERE user_id=? [AND status=?] ORDER BY created_at|application_date, id，游標分頁以 (排序欄位, id) 定位
+        Index('ix_applications_user_created_id', 'user_id', 'created_at', 'id'),
+        Index('ix_applications_user_status_created_id', 'user_id', 'status', 'created_at', 'id'),
+        Index('ix_applications_user_date_id', 'user_id', 'application_date', 'id'),
+        # 管理員列表：[WHERE status=?] ORDER BY created_at DESC, id DESC，游標分頁以 (created_at, id) 定位
+        Index('ix_applications_status_created_id', 'status', 'created_at', 'id'),
+        Index('ix_applications_created_id', 'created_at', 'id'),
+        # 依個人資料搜尋申請案件：WHERE individual_id IN (...)
+        Index('ix_applications_individual_id', 'individual_id'),
+    )
+
 class Notification(Base):
     __tablename__ = 'notifications'
 
@@ -90,6 +122,60 @@ class Notification(Base):
     # 關聯
     user = relationship("User", back_populates="notifications")
 
+    __table_args__ = (
+        # 未讀通知：WHERE user_id=? AND is_read=0
+        Index('ix_notifications_user_read', 'user_id', 'is_read'),
+    )
+
+class RevokedToken(Base):
+    """已撤銷（登出）的 token，保留到 token 過期為止"""
+    __tablename__ = 'revoked_tokens'
+
+    jti = Column(String(64), primary_key=True, comment='token 唯一識別碼')
+    user_id = Column(Integer, nullable=True, comment='token 所屬用戶')
+    expires_at = Column(DateTime, nullable=False, index=True, comment='token 過期時間')
+    revoked_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class Blob(Base):
+    """內容定址的檔案（以 SHA-256 為鍵），refcount 為引用此內容的欄位數"""
+    __tablename__ = 'blobs'
+
+    digest = Column(String(64), primary_key=True, comment='SHA-256 摘要（十六進位）')
+    size = Column(Integer, nullable=False, comment='位元組數')
+    mime_type = Column(String(100), nullable=False)
+    refcount = Column(Integer, nullable=False, default=0, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ApplicationCounter(Base):
+    """申請案件計數（每個用戶 × 狀態 × 急件程度一列），與申請案件的變更在同一個交易中維護"""
+    __tablename__ = 'application_counters'
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False, comment='申請用戶（公司）')
+    status = Column(String(20), primary_key=True, comment='申請狀態（無狀態時為空字串）')
+    urgency = Column(String(20), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SearchTerm(Base):
+    """搜尋用的 n-gram 倒排索引：每個 (欄位群組, 詞) 對應的文件 ID，隨申請案件與個人資料寫入時增量維護"""
+    __tablename__ = 'search_terms'
+
+    field = Column(String(16), primary_key=True, comment='application（客戶名稱）、individual（姓名）、national_id')
+    term = Column(String(16), primary_key=True, comment='正規化後的 n-gram')
+    doc_id = Column(Integer, primary_key=True, autoincrement=False, comment='申請案件或個人資料 ID')
+
+    __table_args__ = (
+        # 寫入時讀取文件既有的詞
+        Index('ix_search_terms_doc', 'doc_id', 'field'),
+    )
+
+# 圖片類型與 Individual 欄位前綴的對應
+INDIVIDUAL_IMAGE_FIELDS = {
+    'passport': 'passport_infomation_image',
+    'front': 'id_card_front_image',
+    'back': 'id_card_back_image',
+}
+
 # === 以下為舊模型，保持向後兼容 ===
 
 class Document(Base):
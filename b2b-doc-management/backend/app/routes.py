@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
 from app.services.file_upload import FileUploadService
-from app.utils.db import SessionLocal
+from app.utils.db import get_db
 from app.models import Document, User
-from app.middleware.auth import get_current_user, verify_user_permission, verify_company_permission
+from app.middleware.auth import get_current_user, get_current_principal, get_read_db, verify_user_permission, verify_company_permission
 import json
 import io
 import pandas as pd
@@ -63,18 +64,15 @@ def delete_record(record_id: int, current_user: User = Depends(get_current_user)
 
 
 @router.post('/record/{record_id}/resubmit')
-def resubmit_record(record_id: int, payload: dict, current_user: User = Depends(get_current_user)):
+def resubmit_record(record_id: int, payload: dict, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """重新提交記錄"""
     try:
-        db = SessionLocal()
         doc = db.query(Document).filter(Document.id == record_id).first()
         if not doc:
-            db.close()
             raise HTTPException(status_code=404, detail='Record not found')
         
         # 檢查用戶權限（只能操作自己的記錄或管理員）
         if not verify_user_permission(current_user, doc.user_id):
-            db.close()
             raise HTTPException(status_code=403, detail='Permission denied')
         
         existing = []
@@ -89,14 +87,13 @@ def resubmit_record(record_id: int, payload: dict, current_user: User = Depends(
         db.add(doc)
         db.commit()
         db.refresh(doc)
-        db.close()
         return JSONResponse({'message': 'Record resubmitted'})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post('/records')
-def create_record(payload: dict, current_user: User = Depends(get_current_user)):
+def create_record(payload: dict, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """創建新記錄"""
     required = ['type', 'speed', 'date', 'name']
     for r in required:
@@ -104,7 +101,6 @@ def create_record(payload: dict, current_user: User = Depends(get_current_user))
             raise HTTPException(status_code=400, detail=f'Missing {r}')
     
     try:
-        db = SessionLocal()
         # 使用當前用戶的信息
         doc = Document(
             user_id=current_user.id,
@@ -118,21 +114,19 @@ def create_record(payload: dict, current_user: User = Depends(get_current_user))
         db.add(doc)
         db.commit()
         db.refresh(doc)
-        db.close()
         return JSONResponse({'message': 'Record created', 'id': doc.id}, status_code=201)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get('/export/{company}')
-def export_company(company: str, current_user: User = Depends(get_current_user)):
+def export_company(company: str, current_user: User = Depends(get_current_principal), db: Session = Depends(get_read_db)):
     """導出公司記錄"""
     # 檢查權限：只能導出自己公司的數據或管理員
     if not verify_company_permission(current_user, company):
         raise HTTPException(status_code=403, detail='Permission denied')
     
     try:
-        db = SessionLocal()
         rows = db.query(Document).join(User, Document.user_id == User.id).filter(User.company_name == company).all()
         arr = []
         for r in rows:
@@ -2,16 +2,29 @@
 新的 API 路由
 處理個人資料和申請案件的 API 端點
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import json
 import base64
-from app.models import User
-from app.middleware.auth import get_current_user
+import mimetypes
+from sqlalchemy.orm import Session
+from app.models import User, INDIVIDUAL_IMAGE_FIELDS
+from app.middleware.auth import get_current_user, get_current_principal, get_read_db
+from app.utils.db import get_db, get_pool_status
 from app.services.individual_service import IndividualService
 from app.services.application_service import ApplicationService
+from app.services.application_stats import ApplicationStatsService
+from app.services.roster_import import RosterImportService
+from app.services.auth_service import principal_cache
+from app.services.thumbnailer import THUMBNAIL_FORMATS, ThumbnailUnsupported, ThumbnailerBusy, thumbnailer
+from app.utils.slow_query import slow_query_log
+from app.utils.blob_store import blob_store, compute_digest
+from app.utils.http_cache import (
+    IMAGE_CACHE_MAX_AGE, RangeNotSatisfiable, etag_matches, http_date, iter_file_range,
+    not_modified_since, parse_range
+)
 
 # 創建路由器
 router = APIRouter(prefix="/api/v2")
@@ -23,6 +36,8 @@ class IndividualRequest(BaseModel):
     chinese_first_name: str
     english_last_name: str
     english_first_name: str
+    national_id: Optional[str] = None  # 身分證字號（個人資料以此為鍵新增或更新）
+    gender: Optional[str] = None       # '男', '女'
     id_card_front_image: Optional[str] = None  # Base64 編碼的圖片
     id_card_back_image: Optional[str] = None   # Base64 編碼的圖片
 
@@ -49,10 +64,10 @@ class ApplicationUpdateRequest(BaseModel):
 # === 個人資料相關 API ===
 
 @router.post('/individuals')
-def create_individual(individual: IndividualRequest, current_user: User = Depends(get_current_user)):
+def create_individual(individual: IndividualRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """創建個人資料"""
     try:
-        result = IndividualService.create_individual(individual.dict())
+        result = IndividualService.create_individual(individual.dict(), db=db)
         
         if result['success']:
             return JSONResponse({
@@ -69,11 +84,38 @@ def create_individual(individual: IndividualRequest, current_user: User = Depend
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
+@router.post('/individuals/import')
+def import_individuals(roster: UploadFile = File(...), images: Optional[UploadFile] = File(None),
+                       current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """匯入團體名冊（CSV/XLSX，可附圖片 ZIP），以身分證字號新增或更新個人資料"""
+    try:
+        result = RosterImportService.import_roster(
+            roster.file.read(),
+            roster.filename,
+            images.file.read() if images is not None else None,
+            db=db
+        )
+        
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'summary': result['summary'],
+                'rows': result['rows']
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': result['error']
+            }, status_code=400)
+            
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
+
 @router.get('/individuals/{individual_id}')
-def get_individual(individual_id: int, current_user: User = Depends(get_current_user)):
+def get_individual(individual_id: int, current_user: User = Depends(get_current_principal), db: Session = Depends(get_read_db)):
     """獲取個人資料詳情"""
     try:
-        individual = IndividualService.get_individual_by_id(individual_id)
+        individual = IndividualService.get_individual_by_id(individual_id, db=db)
         
         if individual:
             return JSONResponse({
@@ -90,12 +132,13 @@ def get_individual(individual_id: int, current_user: User = Depends(get_current_
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 @router.put('/individuals/{individual_id}')
-def update_individual(individual_id: int, update_data: IndividualRequest, current_user: User = Depends(get_current_user)):
+def update_individual(individual_id: int, update_data: IndividualRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """更新個人資料"""
     try:
-        result = IndividualService.update_individual(individual_id, update_data.dict(exclude_unset=True))
+        result = IndividualService.update_individual(individual_id, update_data.dict(exclude_unset=True), db=db)
         
         if result['success']:
+            db.commit()
             return JSONResponse({
                 'success': True,
                 'message': result['message']
@@ -110,39 +153,127 @@ def update_individual(individual_id: int, update_data: IndividualRequest, curren
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 @router.get('/individuals/{individual_id}/images/{image_type}')
-def get_individual_image(individual_id: int, image_type: str, current_user: User = Depends(get_current_user)):
-    """獲取個人資料的圖片"""
+def get_individual_image(individual_id: int, image_type: str, request: Request,
+                         w: Optional[int] = None, image_format: Optional[str] = Query(None, alias='format'),
+                         current_user: User = Depends(get_current_principal), db: Session = Depends(get_read_db)):
+    """獲取個人資料的圖片（支援 ETag/Last-Modified 條件請求與 Range；指定 w 或 format 時回傳縮圖）"""
     try:
-        if image_type not in ['front', 'back']:
+        if image_type not in INDIVIDUAL_IMAGE_FIELDS:
             return JSONResponse({
                 'success': False,
-                'error': '圖片類型必須是 front 或 back'
+                'error': '圖片類型必須是 front、back 或 passport'
             }, status_code=400)
         
-        image_data = IndividualService.get_individual_image(individual_id, image_type)
+        variant = None
+        if w is not None or image_format is not None:
+            try:
+                variant = thumbnailer.normalize(w, image_format)
+            except ValueError as e:
+                return JSONResponse({
+                    'success': False,
+                    'error': str(e)
+                }, status_code=400)
         
-        if image_data:
-            return Response(
-                content=image_data,
-                media_type='image/jpeg',
-                headers={'Content-Disposition': f'inline; filename="id_card_{image_type}.jpg"'}
-            )
-        else:
+        info = IndividualService.get_individual_image_info(individual_id, image_type, db=db)
+        if not info:
             return JSONResponse({
                 'success': False,
                 'error': '找不到該圖片'
             }, status_code=404)
+        
+        legacy_data = None
+        digest = info['digest']
+        if digest is None:
+            # 尚未遷移到 blob store 的舊資料，只能讀出完整內容
+            legacy_data = IndividualService.get_individual_image(individual_id, image_type, db=db)
+            if legacy_data is None:
+                return JSONResponse({
+                    'success': False,
+                    'error': '找不到該圖片'
+                }, status_code=404)
+            digest = compute_digest(legacy_data)
+        
+        if variant:
+            etag = f'"{thumbnailer.variant_key(digest, *variant)}"'
+            mime_type = THUMBNAIL_FORMATS[variant[1]]
+        else:
+            etag = f'"{digest}"'
+            mime_type = info['mime_type'] or 'image/jpeg'
+        extension = mimetypes.guess_extension(mime_type) or ''
+        headers = {
+            'ETag': etag,
+            'Cache-Control': f'private, max-age={IMAGE_CACHE_MAX_AGE}, must-revalidate',
+            'Accept-Ranges': 'bytes',
+            'Content-Disposition': f'inline; filename="id_card_{image_type}{extension}"'
+        }
+        if info['updated_at'] is not None:
+            headers['Last-Modified'] = http_date(info['updated_at'])
+        
+        # If-None-Match 優先於 If-Modified-Since
+        if_none_match = request.headers.get('if-none-match')
+        if etag_matches(if_none_match, headers['ETag']) or (
+            if_none_match is None and not_modified_since(request.headers.get('if-modified-since'), info['updated_at'])
+        ):
+            headers.pop('Content-Disposition')
+            return Response(status_code=304, headers=headers)
+        
+        body = legacy_data
+        if variant:
+            source = legacy_data
+            body = thumbnailer.get(digest, *variant, load_source=lambda: source if source is not None else blob_store.read(digest))
+        size = len(body) if body is not None else info['size']
+        
+        # If-Range 與目前 ETag 不同時忽略 Range，回應完整內容
+        byte_range = None
+        if_range = request.headers.get('if-range')
+        if if_range is None or if_range.strip() == headers['ETag']:
+            try:
+                byte_range = parse_range(request.headers.get('range'), size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={'Content-Range': f'bytes */{size}', 'ETag': headers['ETag']})
+        
+        start, end = byte_range or (0, size - 1)
+        headers['Content-Length'] = str(end - start + 1)
+        status_code = 200
+        if byte_range:
+            headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+            status_code = 206
+        
+        if body is not None:
+            return Response(content=body[start:end + 1], status_code=status_code, media_type=mime_type, headers=headers)
+        return StreamingResponse(
+            iter_file_range(blob_store.open(digest), start, end),
+            status_code=status_code,
+            media_type=mime_type,
+            headers=headers
+        )
             
+    except FileNotFoundError:
+        return JSONResponse({
+            'success': False,
+            'error': '找不到該圖片'
+        }, status_code=404)
+    except ThumbnailerBusy as e:
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=503, headers={'Retry-After': '1'})
+    except ThumbnailUnsupported as e:
+        # 原樣保存的非圖片檔（例如 PDF），可不指定 w/format 取得原檔
+        return JSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=415)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 # === 申請案件相關 API ===
 
 @router.post('/applications')
-def create_application(application: ApplicationRequest, current_user: User = Depends(get_current_user)):
+def create_application(application: ApplicationRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """創建申請案件（包含個人資料的新增/更新）"""
     try:
-        result = ApplicationService.create_application(application.dict(), current_user.id)
+        result = ApplicationService.create_application(application.dict(), current_user.id, db=db)
         
         if result['success']:
             return JSONResponse({
@@ -162,27 +293,51 @@ def create_application(application: ApplicationRequest, current_user: User = Dep
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 @router.get('/applications')
-def get_user_applications(status: Optional[str] = None, current_user: User = Depends(get_current_user)):
-    """獲取當前用戶的申請案件列表"""
+def get_user_applications(
+    status: Optional[str] = None,
+    application_type: Optional[str] = None,
+    urgency: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort: str = '-created_at',
+    page: int = 1,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    current_user: User = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
+):
+    """獲取當前用戶的申請案件列表（分頁），可依申請日期區間、類型、急件程度篩選並依建立時間或申請日期排序"""
     try:
-        applications = ApplicationService.get_applications_by_user(current_user.id, status)
+        result = ApplicationService.get_applications_by_user(
+            current_user.id, status, db=db, page=page, limit=limit, cursor=cursor,
+            application_type=application_type, urgency=urgency, date_from=date_from, date_to=date_to,
+            sort=sort, with_total=with_total
+        )
         
-        return JSONResponse({
-            'success': True,
-            'data': applications
-        })
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'data': result['data'],
+                'pagination': result['pagination']
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': result['error']
+            }, status_code=400)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 @router.get('/applications/{application_id}')
-def get_application(application_id: int, current_user: User = Depends(get_current_user)):
+def get_application(application_id: int, current_user: User = Depends(get_current_principal), db: Session = Depends(get_read_db)):
     """獲取申請案件詳情"""
     try:
         # 檢查是否為管理員
         user_id = None if current_user.is_admin else current_user.id
         
-        application = ApplicationService.get_application_by_id(application_id, user_id)
+        application = ApplicationService.get_application_by_id(application_id, user_id, db=db)
         
         if application:
             return JSONResponse({
@@ -199,7 +354,7 @@ def get_application(application_id: int, current_user: User = Depends(get_curren
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 @router.put('/applications/{application_id}')
-def update_application(application_id: int, update_data: ApplicationUpdateRequest, current_user: User = Depends(get_current_user)):
+def update_application(application_id: int, update_data: ApplicationUpdateRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """更新申請案件"""
     try:
         # 檢查是否為管理員
@@ -208,7 +363,8 @@ def update_application(application_id: int, update_data: ApplicationUpdateReques
         result = ApplicationService.update_application(
             application_id, 
             update_data.dict(exclude_unset=True), 
-            user_id
+            user_id,
+            db=db
         )
         
         if result['success']:
@@ -226,13 +382,13 @@ def update_application(application_id: int, update_data: ApplicationUpdateReques
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
 @router.delete('/applications/{application_id}')
-def delete_application(application_id: int, current_user: User = Depends(get_current_user)):
+def delete_application(application_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """刪除申請案件"""
     try:
         # 檢查是否為管理員
         user_id = None if current_user.is_admin else current_user.id
         
-        result = ApplicationService.delete_application(application_id, user_id)
+        result = ApplicationService.delete_application(application_id, user_id, db=db)
         
         if result['success']:
             return JSONResponse({
@@ -255,9 +411,12 @@ def get_all_applications(
     status: Optional[str] = None, 
     page: int = 1, 
     limit: int = 50, 
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    current_user: User = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
 ):
-    """獲取所有申請案件（管理員專用）"""
+    """獲取所有申請案件（管理員專用），可用 cursor 傳入上一頁的 next_cursor 以游標分頁"""
     try:
         if not current_user.is_admin:
             return JSONResponse({
@@ -265,7 +424,7 @@ def get_all_applications(
                 'error': '權限不足，僅管理員可使用'
             }, status_code=403)
         
-        result = ApplicationService.get_all_applications(status, page, limit)
+        result = ApplicationService.get_all_applications(status, page, limit, db=db, cursor=cursor, with_total=with_total)
         
         if result['success']:
             return JSONResponse({
@@ -282,11 +441,73 @@ def get_all_applications(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
+@router.get('/admin/applications/stats')
+def get_application_stats(
+    current_user: User = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
+):
+    """依狀態、急件程度與公司彙總的申請案件數（管理員專用）"""
+    try:
+        if not current_user.is_admin:
+            return JSONResponse({
+                'success': False,
+                'error': '權限不足，僅管理員可使用'
+            }, status_code=403)
+        
+        result = ApplicationStatsService.get_stats(db=db)
+        
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'data': result['data']
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': result['error']
+            }, status_code=400)
+            
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
+
+@router.get('/admin/applications/search')
+def search_applications(
+    q: str,
+    limit: int = 20,
+    current_user: User = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
+):
+    """以客戶名稱、中英文姓名或身分證字號片段搜尋申請案件（管理員專用）"""
+    try:
+        if not current_user.is_admin:
+            return JSONResponse({
+                'success': False,
+                'error': '權限不足，僅管理員可使用'
+            }, status_code=403)
+        
+        result = ApplicationService.search_applications(q, limit, db=db)
+        
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'data': result['data'],
+                'has_more': result['has_more']
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': result['error']
+            }, status_code=400)
+            
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
+
 @router.put('/admin/applications/{application_id}/status')
 def update_application_status(
     application_id: int, 
     status_data: dict,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """更新申請案件狀態（管理員專用）"""
     try:
@@ -297,7 +518,7 @@ def update_application_status(
             }, status_code=403)
         
         # 管理員可以更新任何申請的狀態
-        result = ApplicationService.update_application(application_id, status_data, None)
+        result = ApplicationService.update_application(application_id, status_data, None, db=db)
         
         if result['success']:
             return JSONResponse({
@@ -313,6 +534,40 @@ def update_application_status(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
 
+@router.get('/admin/metrics')
+def get_metrics(current_user: User = Depends(get_current_principal)):
+    """資料庫連線池與認證快取的即時指標（管理員專用）"""
+    if not current_user.is_admin:
+        return JSONResponse({
+            'success': False,
+            'error': '權限不足，僅管理員可使用'
+        }, status_code=403)
+    
+    return JSONResponse({
+        'success': True,
+        'data': {
+            'db_pool': get_pool_status(),
+            'auth_principal_cache': principal_cache.stats()
+        }
+    })
+
+@router.get('/admin/slow-queries')
+def get_slow_queries(limit: int = 20, order_by: str = 'total_ms', current_user: User = Depends(get_current_principal)):
+    """依正規化 SQL 彙總的最慢語句，含來源路由、服務方法與執行計畫（管理員專用）"""
+    if not current_user.is_admin:
+        return JSONResponse({
+            'success': False,
+            'error': '權限不足，僅管理員可使用'
+        }, status_code=403)
+    
+    return JSONResponse({
+        'success': True,
+        'data': {
+            'threshold_ms': slow_query_log.threshold_ms,
+            'statements': slow_query_log.top(limit, order_by)
+        }
+    })
+
 # === 通用 API ===
 
 @router.post('/upload-image')
@@ -0,0 +1,132 @@
+"""
+v2 API 非同步路由
+以 AsyncSession 實作 v2 的唯讀端點，等待資料庫時不佔用執行緒池；
+啟用 API_V2_ASYNC 時於 v2 路由之前註冊，同路徑的 GET 請求由此處理，其餘端點仍走同步路由
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.models import User
+from app.middleware.auth import get_current_principal, get_async_read_db
+from app.services.async_individual_service import AsyncIndividualService
+from app.services.async_application_service import AsyncApplicationService
+
+# 創建路由器
+router = APIRouter(prefix="/api/v2")
+
+@router.get('/individuals/{individual_id}')
+async def get_individual(individual_id: int, current_user: User = Depends(get_current_principal), db: AsyncSession = Depends(get_async_read_db)):
+    """獲取個人資料詳情"""
+    try:
+        individual = await AsyncIndividualService.get_individual_by_id(individual_id, db)
+
+        if individual:
+            return JSONResponse({
+                'success': True,
+                'data': individual
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': '找不到該個人資料'
+            }, status_code=404)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
+
+@router.get('/applications')
+async def get_user_applications(
+    status: Optional[str] = None,
+    application_type: Optional[str] = None,
+    urgency: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort: str = '-created_at',
+    page: int = 1,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    current_user: User = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """獲取當前用戶的申請案件列表（分頁），可依申請日期區間、類型、急件程度篩選並依建立時間或申請日期排序"""
+    try:
+        result = await AsyncApplicationService.get_applications_by_user(
+            current_user.id, db, status, page=page, limit=limit, cursor=cursor,
+            application_type=application_type, urgency=urgency, date_from=date_from, date_to=date_to,
+            sort=sort, with_total=with_total
+        )
+
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'data': result['data'],
+                'pagination': result['pagination']
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': result['error']
+            }, status_code=400)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
+
+@router.get('/applications/{application_id}')
+async def get_application(application_id: int, current_user: User = Depends(get_current_principal), db: AsyncSession = Depends(get_async_read_db)):
+    """獲取申請案件詳情"""
+    try:
+        # 檢查是否為管理員
+        user_id = None if current_user.is_admin else current_user.id
+
+        application = await AsyncApplicationService.get_application_by_id(application_id, db, user_id)
+
+        if application:
+            return JSONResponse({
+                'success': True,
+                'data': application
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': '找不到該申請案件或無權限查看'
+            }, status_code=404)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
+
+@router.get('/admin/applications')
+async def get_all_applications(
+    status: Optional[str] = None,
+    page: int = 1,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None,
+    current_user: User = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """獲取所有申請案件（管理員專用），可用 cursor 傳入上一頁的 next_cursor 以游標分頁"""
+    try:
+        if not current_user.is_admin:
+            return JSONResponse({
+                'success': False,
+                'error': '權限不足，僅管理員可使用'
+            }, status_code=403)
+
+        result = await AsyncApplicationService.get_all_applications(db, status, page, limit, cursor, with_total)
+
+        if result['success']:
+            return JSONResponse({
+                'success': True,
+                'data': result['data'],
+                'pagination': result['pagination']
+            })
+        else:
+            return JSONResponse({
+                'success': False,
+                'error': result['error']
+            }, status_code=400)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'伺服器錯誤: {str(e)}')
@@ -2,188 +2,247 @@
 申請案件服務
 處理申請案件的 CRUD 操作和業務邏輯
 """
+from sqlalchemy import Date, and_, func, or_, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import date, datetime
 from ..models import Application, Individual, User
-from ..utils.db import SessionLocal
+from ..utils.db import session_scope
+from ..utils.pagination import decode_cursor, encode_cursor
+from .application_stats import ApplicationStatsService
 from .individual_service import IndividualService
+from .search_index import SearchIndexService
+
+
+# 列表只需要的欄位：申請案件欄位、個人資料的中文姓名
+LIST_COLUMNS = (
+    Application.id, Application.application_type, Application.urgency, Application.application_date,
+    Application.customer_name, Application.status, Application.substatus, Application.created_at,
+    Individual.chinese_last_name, Individual.chinese_first_name
+)
+
+# 列表可排序的欄位（用戶列表皆有 (user_id, 欄位, id) 索引），前綴 '-' 表示遞減
+SORT_COLUMNS = {
+    'created_at': Application.created_at,
+    'application_date': Application.application_date,
+}
+
+# 列表每頁數量上限
+LIST_MAX_LIMIT = 200
 
 
 class ApplicationService:
     """申請案件服務類"""
     
     @staticmethod
-    def create_application(application_data: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    def list_item(row) -> Dict[str, Any]:
+        """將列表查詢的資料列轉為回應格式"""
+        return {
+            'id': row.id,
+            'application_type': row.application_type,
+            'urgency': row.urgency,
+            'application_date': row.application_date.isoformat() if row.application_date else None,
+            'customer_name': row.customer_name,
+            'status': row.status,
+            'substatus': row.substatus,
+            'created_at': row.created_at.isoformat(),
+            'individual_name': f"{row.chinese_last_name}{row.chinese_first_name}" if row.chinese_last_name is not None else None
+        }
+    
+    @staticmethod
+    def create_application(application_data: Dict[str, Any], user_id: int, db: Optional[Session] = None) -> Dict[str, Any]:
         """
         創建新的申請案件
         
         Args:
             application_data: 包含申請案件資料的字典
             user_id: 申請用戶的 ID
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             創建結果和申請案件 ID
         """
-        db: Session = SessionLocal()
-        try:
-            # 處理個人資料
-            individual_data = application_data.get('individual_data', {})
-            individual_result = IndividualService.create_or_update_individual(individual_data)
-            
-            if not individual_result['success']:
+        with session_scope(db) as db:
+            try:
+                # 處理個人資料
+                individual_data = application_data.get('individual_data', {})
+                individual_result = IndividualService.create_or_update_individual(individual_data, db=db)
+                
+                if not individual_result['success']:
+                    return {
+                        'success': False,
+                        'error': f"個人資料處理失敗: {individual_result['error']}"
+                    }
+                
+                individual_id = individual_result['individual_id']
+                
+                # 創建申請案件
+                application = Application(
+                    user_id=user_id,
+                    individual_id=individual_id,
+                    application_type=application_data.get('application_type'),
+                    urgency=application_data.get('urgency'),
+                    application_date=ApplicationService._parse_date(
+                        application_data.get('application_date')
+                    ),
+                    customer_name=application_data.get('customer_name'),
+                    status=application_data.get('status', '草稿'),
+                    substatus=application_data.get('substatus'),
+                    reason=application_data.get('reason')
+                )
+                
+                db.add(application)
+                db.flush()
+                ApplicationStatsService.record_change(db, None, ApplicationStatsService.counter_key(application))
+                SearchIndexService.index_applications(db, [application])
+                db.commit()
+                db.refresh(application)
+                
+                return {
+                    'success': True,
+                    'application_id': application.id,
+                    'individual_id': individual_id,
+                    'individual_action': individual_result.get('action', 'unknown'),
+                    'message': '申請案件創建成功'
+                }
+                
+            except SQLAlchemyError as e:
+                db.rollback()
                 return {
                     'success': False,
-                    'error': f"個人資料處理失敗: {individual_result['error']}"
+                    'error': f'資料庫錯誤: {str(e)}'
+                }
+            except Exception as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'創建申請案件失敗: {str(e)}'
                 }
-            
-            individual_id = individual_result['individual_id']
-            
-            # 創建申請案件
-            application = Application(
-                user_id=user_id,
-                individual_id=individual_id,
-                application_type=application_data.get('application_type'),
-                urgency=application_data.get('urgency'),
-                application_date=ApplicationService._parse_date(
-                    application_data.get('application_date')
-                ),
-                customer_name=application_data.get('customer_name'),
-                status=application_data.get('status', '草稿'),
-                substatus=application_data.get('substatus'),
-                reason=application_data.get('reason')
-            )
-            
-            db.add(application)
-            db.commit()
-            db.refresh(application)
-            
-            return {
-                'success': True,
-                'application_id': application.id,
-                'individual_id': individual_id,
-                'individual_action': individual_result.get('action', 'unknown'),
-                'message': '申請案件創建成功'
-            }
-            
-        except SQLAlchemyError as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'資料庫錯誤: {str(e)}'
-            }
-        except Exception as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'創建申請案件失敗: {str(e)}'
-            }
-        finally:
-            db.close()
     
     @staticmethod
-    def get_application_by_id(application_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    def get_application_by_id(application_id: int, user_id: Optional[int] = None, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
         """
         根據 ID 獲取申請案件詳情
         
         Args:
             application_id: 申請案件 ID
             user_id: 用戶 ID（用於權限檢查，None 表示管理員查看）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             申請案件詳情字典或 None
         """
-        db: Session = SessionLocal()
-        try:
-            query = db.query(Application).filter(Application.id == application_id)
-            
-            # 如果指定了 user_id，則只能查看自己的申請
-            if user_id is not None:
-                query = query.filter(Application.user_id == user_id)
-            
-            application = query.first()
-            if not application:
+        with session_scope(db) as db:
+            try:
+                query = db.query(Application).filter(Application.id == application_id)
+                
+                # 如果指定了 user_id，則只能查看自己的申請
+                if user_id is not None:
+                    query = query.filter(Application.user_id == user_id)
+                
+                application = query.first()
+                if not application:
+                    return None
+                
+                # 獲取關聯的個人資料
+                individual_data = IndividualService.get_individual_by_id(application.individual_id, db=db)
+                
+                # 獲取用戶資料
+                user = db.query(User).filter(User.id == application.user_id).first()
+                
+                return {
+                    'id': application.id,
+                    'user_id': application.user_id,
+                    'individual_id': application.individual_id,
+                    'application_type': application.application_type,
+                    'urgency': application.urgency,
+                    'application_date': application.application_date.isoformat() if application.application_date else None,
+                    'customer_name': application.customer_name,
+                    'status': application.status,
+                    'substatus': application.substatus,
+                    'reason': application.reason,
+                    'created_at': application.created_at.isoformat(),
+                    'updated_at': application.updated_at.isoformat(),
+                    'individual_data': individual_data,
+                    'user_data': {
+                        'id': user.id,
+                        'company_name': user.company_name,
+                        'username': user.username,
+                        'email': user.email
+                    } if user else None
+                }
+                
+            except Exception as e:
                 return None
-            
-            # 獲取關聯的個人資料
-            individual_data = IndividualService.get_individual_by_id(application.individual_id)
-            
-            # 獲取用戶資料
-            user = db.query(User).filter(User.id == application.user_id).first()
-            
-            return {
-                'id': application.id,
-                'user_id': application.user_id,
-                'individual_id': application.individual_id,
-                'application_type': application.application_type,
-                'urgency': application.urgency,
-                'application_date': application.application_date.isoformat() if application.application_date else None,
-                'customer_name': application.customer_name,
-                'status': application.status,
-                'substatus': application.substatus,
-                'reason': application.reason,
-                'created_at': application.created_at.isoformat(),
-                'updated_at': application.updated_at.isoformat(),
-                'individual_data': individual_data,
-                'user_data': {
-                    'id': user.id,
-                    'company_name': user.company_name,
-                    'username': user.username,
-                    'email': user.email
-                } if user else None
-            }
-            
-        except Exception as e:
-            return None
-        finally:
-            db.close()
     
     @staticmethod
-    def get_applications_by_user(user_id: int, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_applications_by_user(user_id: int, status: Optional[str] = None, db: Optional[Session] = None,
+                                 page: int = 1, limit: int = 50, cursor: Optional[str] = None,
+                                 application_type: Optional[str] = None, urgency: Optional[str] = None,
+                                 date_from: Optional[str] = None, date_to: Optional[str] = None,
+                                 sort: str = '-created_at', with_total: Optional[bool] = None) -> Dict[str, Any]:
         """
-        獲取用戶的申請案件列表
+        獲取用戶的申請案件列表（分頁）
         
         Args:
             user_id: 用戶 ID
             status: 狀態篩選（可選）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
+            page: 頁碼
+            limit: 每頁數量（上限 LIST_MAX_LIMIT）
+            cursor: 游標分頁，傳入上一頁的 next_cursor（可選，指定時忽略 page）
+            application_type: 申請類型篩選（可選）
+            urgency: 急件程度篩選（可選）
+            date_from: 申請日期起日 YYYY-MM-DD（可選）
+            date_to: 申請日期迄日 YYYY-MM-DD（可選）
+            sort: 排序欄位 created_at 或 application_date，前綴 '-' 表示遞減
+            with_total: 是否計算總數（預設：page 模式計算、游標模式不計算）
             
         Returns:
-            申請案件列表
+            申請案件列表和分頁資訊
         """
-        db: Session = SessionLocal()
-        try:
-            query = db.query(Application).filter(Application.user_id == user_id)
-            
-            if status:
-                query = query.filter(Application.status == status)
-            
-            applications = query.order_by(Application.created_at.desc()).all()
-            
-            result = []
-            for app in applications:
-                individual_data = IndividualService.get_individual_by_id(app.individual_id)
-                result.append({
-                    'id': app.id,
-                    'application_type': app.application_type,
-                    'urgency': app.urgency,
-                    'application_date': app.application_date.isoformat() if app.application_date else None,
-                    'customer_name': app.customer_name,
-                    'status': app.status,
-                    'substatus': app.substatus,
-                    'created_at': app.created_at.isoformat(),
-                    'individual_name': individual_data['full_chinese_name'] if individual_data else None
-                })
-            
-            return result
-            
-        except Exception as e:
-            return []
-        finally:
-            db.close()
+        page = max(page, 1)
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        if with_total is None:
+            with_total = not cursor
+        
+        with session_scope(db) as db:
+            try:
+                try:
+                    conditions, count_statement = ApplicationService.user_list_filters(
+                        user_id, status, application_type, urgency, date_from, date_to
+                    )
+                    # 單一 JOIN 查詢，只取列表需要的欄位（不載入個人資料的其他欄位與圖片）
+                    query = ApplicationService.paginate(
+                        db.query(*LIST_COLUMNS).outerjoin(
+                            Individual, Individual.id == Application.individual_id
+                        ).filter(*conditions),
+                        page, limit, cursor, sort
+                    )
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'error': str(e)
+                    }
+                
+                total = db.execute(count_statement).scalar() if with_total else None
+                
+                rows, pagination = ApplicationService.page_info(query.all(), page, limit, cursor, total, sort)
+                return {
+                    'success': True,
+                    'data': [ApplicationService.list_item(row) for row in rows],
+                    'pagination': pagination
+                }
+                
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': f'獲取申請案件列表失敗: {str(e)}'
+                }
     
     @staticmethod
-    def update_application(application_id: int, update_data: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+    def update_application(application_id: int, update_data: Dict[str, Any], user_id: Optional[int] = None, db: Optional[Session] = None) -> Dict[str, Any]:
         """
         更新申請案件
         
@@ -191,191 +250,375 @@ class ApplicationService:
             application_id: 申請案件 ID
             update_data: 要更新的資料
             user_id: 用戶 ID（用於權限檢查，None 表示管理員操作）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             更新結果
         """
-        db: Session = SessionLocal()
-        try:
-            query = db.query(Application).filter(Application.id == application_id)
-            
-            # 如果指定了 user_id，則只能更新自己的申請
-            if user_id is not None:
-                query = query.filter(Application.user_id == user_id)
-            
-            application = query.first()
-            if not application:
-                return {
-                    'success': False,
-                    'error': '找不到該申請案件或無權限操作'
-                }
-            
-            # 更新申請案件資料
-            if 'application_type' in update_data:
-                application.application_type = update_data['application_type']
-            if 'urgency' in update_data:
-                application.urgency = update_data['urgency']
-            if 'application_date' in update_data:
-                application.application_date = ApplicationService._parse_date(
-                    update_data['application_date']
-                )
-            if 'customer_name' in update_data:
-                application.customer_name = update_data['customer_name']
-            if 'status' in update_data:
-                application.status = update_data['status']
-            if 'substatus' in update_data:
-                application.substatus = update_data['substatus']
-            if 'reason' in update_data:
-                application.reason = update_data['reason']
-            
-            # 如果有個人資料更新
-            if 'individual_data' in update_data:
-                individual_result = IndividualService.update_individual(
-                    application.individual_id, 
-                    update_data['individual_data']
-                )
-                if not individual_result['success']:
+        with session_scope(db) as db:
+            try:
+                query = db.query(Application).filter(Application.id == application_id)
+                
+                # 如果指定了 user_id，則只能更新自己的申請
+                if user_id is not None:
+                    query = query.filter(Application.user_id == user_id)
+                
+                application = query.first()
+                if not application:
                     return {
                         'success': False,
-                        'error': f"個人資料更新失敗: {individual_result['error']}"
+                        'error': '找不到該申請案件或無權限操作'
                     }
-            
-            db.commit()
-            db.refresh(application)
-            
-            return {
-                'success': True,
-                'message': '申請案件更新成功'
-            }
-            
-        except SQLAlchemyError as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'資料庫錯誤: {str(e)}'
-            }
-        except Exception as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'更新申請案件失敗: {str(e)}'
-            }
-        finally:
-            db.close()
+                
+                counter_key = ApplicationStatsService.counter_key(application)
+                
+                # 更新申請案件資料
+                if 'application_type' in update_data:
+                    application.application_type = update_data['application_type']
+                if 'urgency' in update_data:
+                    application.urgency = update_data['urgency']
+                if 'application_date' in update_data:
+                    application.application_date = ApplicationService._parse_date(
+                        update_data['application_date']
+                    )
+                if 'customer_name' in update_data:
+                    application.customer_name = update_data['customer_name']
+                if 'status' in update_data:
+                    application.status = update_data['status']
+                if 'substatus' in update_data:
+                    application.substatus = update_data['substatus']
+                if 'reason' in update_data:
+                    application.reason = update_data['reason']
+                
+                # 如果有個人資料更新
+                if 'individual_data' in update_data:
+                    individual_result = IndividualService.update_individual(
+                        application.individual_id, 
+                        update_data['individual_data'],
+                        db=db
+                    )
+                    if not individual_result['success']:
+                        return {
+                            'success': False,
+                            'error': f"個人資料更新失敗: {individual_result['error']}"
+                        }
+                
+                ApplicationStatsService.record_change(db, counter_key, ApplicationStatsService.counter_key(application))
+                if 'customer_name' in update_data:
+                    SearchIndexService.index_applications(db, [application])
+                db.commit()
+                db.refresh(application)
+                
+                return {
+                    'success': True,
+                    'message': '申請案件更新成功'
+                }
+                
+            except SQLAlchemyError as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'資料庫錯誤: {str(e)}'
+                }
+            except Exception as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'更新申請案件失敗: {str(e)}'
+                }
     
     @staticmethod
-    def delete_application(application_id: int, user_id: Optional[int] = None) -> Dict[str, Any]:
+    def delete_application(application_id: int, user_id: Optional[int] = None, db: Optional[Session] = None) -> Dict[str, Any]:
         """
         刪除申請案件
         
         Args:
             application_id: 申請案件 ID
             user_id: 用戶 ID（用於權限檢查，None 表示管理員操作）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             刪除結果
         """
-        db: Session = SessionLocal()
-        try:
-            query = db.query(Application).filter(Application.id == application_id)
-            
-            # 如果指定了 user_id，則只能刪除自己的申請
-            if user_id is not None:
-                query = query.filter(Application.user_id == user_id)
-            
-            application = query.first()
-            if not application:
+        with session_scope(db) as db:
+            try:
+                query = db.query(Application).filter(Application.id == application_id)
+                
+                # 如果指定了 user_id，則只能刪除自己的申請
+                if user_id is not None:
+                    query = query.filter(Application.user_id == user_id)
+                
+                application = query.first()
+                if not application:
+                    return {
+                        'success': False,
+                        'error': '找不到該申請案件或無權限操作'
+                    }
+                
+                ApplicationStatsService.record_change(db, ApplicationStatsService.counter_key(application), None)
+                SearchIndexService.remove_applications(db, [application.id])
+                db.delete(application)
+                db.commit()
+                
+                return {
+                    'success': True,
+                    'message': '申請案件刪除成功'
+                }
+                
+            except SQLAlchemyError as e:
+                db.rollback()
                 return {
                     'success': False,
-                    'error': '找不到該申請案件或無權限操作'
+                    'error': f'資料庫錯誤: {str(e)}'
                 }
+            except Exception as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'刪除申請案件失敗: {str(e)}'
+                }
+    
+    @staticmethod
+    def sort_column(sort: str):
+        """
+        解析排序參數
+        
+        Args:
+            sort: 排序欄位名稱，前綴 '-' 表示遞減（例如 '-created_at'）
             
-            db.delete(application)
-            db.commit()
+        Returns:
+            (欄位, 是否遞減)
             
-            return {
-                'success': True,
-                'message': '申請案件刪除成功'
-            }
+        Raises:
+            ValueError: 不支援的排序欄位
+        """
+        descending = sort.startswith('-')
+        column = SORT_COLUMNS.get(sort.lstrip('-'))
+        if column is None:
+            raise ValueError(f"無效的排序欄位: {sort}（可用: {', '.join(SORT_COLUMNS)}）")
+        return column, descending
+    
+    @staticmethod
+    def paginate(query, page: int, limit: int, cursor: Optional[str] = None, sort: str = '-created_at'):
+        """
+        依排序欄位與 id 排序並套用分頁（Query 與 select() 皆可）
+        
+        有游標時以 (排序欄位, id) 接續上一頁，否則使用 page/limit；多取一筆用於判斷是否還有下一頁
+        
+        Args:
+            query: 已套用篩選條件的查詢（需包含 Application.id 與排序欄位）
+            page: 頁碼（無游標時使用）
+            limit: 每頁數量
+            cursor: 上一頁回傳的 next_cursor（可選）
+            sort: 排序欄位，前綴 '-' 表示遞減
+            
+        Raises:
+            ValueError: 游標格式或排序欄位錯誤
+        """
+        column, descending = ApplicationService.sort_column(sort)
+        if descending:
+            query = query.order_by(column.desc(), Application.id.desc())
+        else:
+            query = query.order_by(column.asc(), Application.id.asc())
+        
+        if cursor:
+            value, last_id = decode_cursor(cursor)
+            if isinstance(column.type, Date):
+                value = value.date()
+            if descending:
+                query = query.where(or_(column < value, and_(column == value, Application.id < last_id)))
+            else:
+                query = query.where(or_(column > value, and_(column == value, Application.id > last_id)))
+        else:
+            query = query.offset((page - 1) * limit)
+        return query.limit(limit + 1)
+    
+    @staticmethod
+    def page_info(rows: List, page: int, limit: int, cursor: Optional[str], total: Optional[int],
+                  sort: str = '-created_at') -> Tuple[List, Dict[str, Any]]:
+        """
+        由 paginate() 的結果（多取一筆）產生本頁資料列與分頁資訊
+        
+        Returns:
+            (本頁資料列, 分頁資訊)；未計算總數時 total 與 pages 為 None
+        """
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, {
+            'page': None if cursor else page,
+            'limit': limit,
+            'total': total,
+            'pages': (total + limit - 1) // limit if total is not None else None,
+            'has_more': has_more,
+            'next_cursor': encode_cursor(getattr(rows[-1], sort.lstrip('-')), rows[-1].id) if has_more else None
+        }
+    
+    @staticmethod
+    def user_list_filters(user_id: int, status: Optional[str] = None, application_type: Optional[str] = None,
+                          urgency: Optional[str] = None, date_from: Optional[str] = None,
+                          date_to: Optional[str] = None) -> Tuple[List, Any]:
+        """
+        用戶申請列表的篩選條件與總數查詢（同步與非同步 session 皆可使用）
+        
+        Args:
+            user_id: 用戶 ID
+            status: 狀態篩選（可選）
+            application_type: 申請類型篩選（可選）
+            urgency: 急件程度篩選（可選）
+            date_from: 申請日期起日 YYYY-MM-DD（可選，含當天）
+            date_to: 申請日期迄日 YYYY-MM-DD（可選，含當天）
+            
+        Returns:
+            (篩選條件列表, 總數查詢)；只依狀態或急件程度篩選時總數由計數表讀取
             
-        except SQLAlchemyError as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'資料庫錯誤: {str(e)}'
-            }
-        except Exception as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'刪除申請案件失敗: {str(e)}'
-            }
-        finally:
-            db.close()
+        Raises:
+            ValueError: 日期格式錯誤
+        """
+        conditions = [Application.user_id == user_id]
+        if status:
+            conditions.append(Application.status == status)
+        if urgency:
+            conditions.append(Application.urgency == urgency)
+        if application_type:
+            conditions.append(Application.application_type == application_type)
+        if date_from:
+            conditions.append(Application.application_date >= ApplicationService._parse_filter_date(date_from))
+        if date_to:
+            conditions.append(Application.application_date <= ApplicationService._parse_filter_date(date_to))
+        
+        if application_type or date_from or date_to:
+            count_statement = select(func.count(Application.id)).where(*conditions)
+        else:
+            count_statement = ApplicationStatsService.total_statement(status, user_id=user_id, urgency=urgency)
+        return conditions, count_statement
     
     @staticmethod
-    def get_all_applications(status: Optional[str] = None, page: int = 1, limit: int = 50) -> Dict[str, Any]:
+    def get_all_applications(status: Optional[str] = None, page: int = 1, limit: int = 50, db: Optional[Session] = None,
+                             cursor: Optional[str] = None, with_total: Optional[bool] = None) -> Dict[str, Any]:
         """
         獲取所有申請案件（管理員用）
         
         Args:
             status: 狀態篩選（可選）
             page: 頁碼
-            limit: 每頁數量
+            limit: 每頁數量（上限 LIST_MAX_LIMIT）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
+            cursor: 游標分頁，傳入上一頁的 next_cursor（可選，指定時忽略 page）
+            with_total: 是否計算總數（預設：page 模式計算、游標模式不計算）
             
         Returns:
             申請案件列表和分頁資訊
         """
-        db: Session = SessionLocal()
-        try:
-            query = db.query(Application)
-            
-            if status:
-                query = query.filter(Application.status == status)
-            
-            # 計算總數
-            total = query.count()
-            
-            # 分頁
-            offset = (page - 1) * limit
-            applications = query.order_by(Application.created_at.desc()).offset(offset).limit(limit).all()
-            
-            result = []
-            for app in applications:
-                individual_data = IndividualService.get_individual_by_id(app.individual_id)
-                user = db.query(User).filter(User.id == app.user_id).first()
-                
-                result.append({
-                    'id': app.id,
-                    'application_type': app.application_type,
-                    'urgency': app.urgency,
-                    'application_date': app.application_date.isoformat() if app.application_date else None,
-                    'customer_name': app.customer_name,
-                    'status': app.status,
-                    'substatus': app.substatus,
-                    'created_at': app.created_at.isoformat(),
-                    'individual_name': individual_data['full_chinese_name'] if individual_data else None,
-                    'company_name': user.company_name if user else None
-                })
-            
-            return {
-                'success': True,
-                'data': result,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': total,
-                    'pages': (total + limit - 1) // limit
+        page = max(page, 1)
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        if with_total is None:
+            with_total = not cursor
+        
+        with session_scope(db) as db:
+            try:
+                # 單一 JOIN 查詢，只取列表需要的欄位與公司名稱
+                query = db.query(*LIST_COLUMNS, User.company_name).outerjoin(
+                    Individual, Individual.id == Application.individual_id
+                ).outerjoin(User, User.id == Application.user_id)
+                
+                if status:
+                    query = query.filter(Application.status == status)
+                
+                try:
+                    query = ApplicationService.paginate(query, page, limit, cursor)
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'error': str(e)
+                    }
+                
+                # 總數由計數表讀取
+                total = db.execute(ApplicationStatsService.total_statement(status)).scalar() if with_total else None
+                
+                rows, pagination = ApplicationService.page_info(query.all(), page, limit, cursor, total)
+                result = [
+                    dict(ApplicationService.list_item(row), company_name=row.company_name)
+                    for row in rows
+                ]
+                
+                return {
+                    'success': True,
+                    'data': result,
+                    'pagination': pagination
                 }
-            }
+                
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': f'獲取申請案件列表失敗: {str(e)}'
+                }
+    
+    @staticmethod
+    def search_applications(query: str, limit: int = 20, db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        以客戶名稱、中英文姓名或身分證字號片段搜尋申請案件（管理員用）
+        
+        Args:
+            query: 搜尋字串（以空白分隔多個字詞，所有字詞需出現在同一類欄位）
+            limit: 回傳筆數（上限 LIST_MAX_LIMIT）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'獲取申請案件列表失敗: {str(e)}'
-            }
-        finally:
-            db.close()
+        Returns:
+            依建立時間由新到舊的申請案件列表
+        """
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        
+        with session_scope(db) as db:
+            try:
+                try:
+                    found = SearchIndexService.find(db, query)
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'error': str(e)
+                    }
+                
+                application_ids, individual_ids = found['application_ids'], found['individual_ids']
+                rows = []
+                if application_ids or individual_ids:
+                    conditions = []
+                    if application_ids:
+                        conditions.append(Application.id.in_(application_ids))
+                    if individual_ids:
+                        conditions.append(Application.individual_id.in_(individual_ids))
+                    rows = db.query(*LIST_COLUMNS, Individual.national_id, User.company_name).outerjoin(
+                        Individual, Individual.id == Application.individual_id
+                    ).outerjoin(User, User.id == Application.user_id).filter(
+                        or_(*conditions)
+                    ).order_by(Application.created_at.desc(), Application.id.desc()).limit(limit + 1).all()
+                
+                return {
+                    'success': True,
+                    'data': [
+                        dict(ApplicationService.list_item(row), company_name=row.company_name, national_id=row.national_id)
+                        for row in rows[:limit]
+                    ],
+                    'has_more': len(rows) > limit or found['truncated']
+                }
+                
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': f'搜尋申請案件失敗: {str(e)}'
+                }
+    
+    @staticmethod
+    def _parse_filter_date(date_value: str) -> date:
+        """
+        解析篩選用的日期
+        
+        Raises:
+            ValueError: 日期格式錯誤
+        """
+        parsed = ApplicationService._parse_date(date_value)
+        if parsed is None:
+            raise ValueError(f'無效的日期: {date_value}（格式 YYYY-MM-DD）')
+        return parsed
     
     @staticmethod
     def _parse_date(date_value: Any) -> Optional[date]:
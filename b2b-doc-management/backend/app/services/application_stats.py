@@ -0,0 +1,236 @@
+"""
+申請案件統計服務
+application_counters 以 (用戶, 狀態, 急件程度) 為鍵記錄申請案件數，在新增、更新、刪除申請案件的同一個交易中增減；
+儀表板的各項統計與列表總數都由這張小表讀取，不必對 applications 執行 COUNT(*)。
+reconcile() 以 GROUP BY 重新計算並修正漂移，由背景工作定期執行
+"""
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import String, func, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from ..models import Application, ApplicationCounter, User
+from ..utils.db import session_scope
+
+logger = logging.getLogger(__name__)
+
+# 背景對帳的間隔（秒，0 表示停用）
+APPLICATION_COUNTER_RECONCILE_INTERVAL = int(os.getenv('APPLICATION_COUNTER_RECONCILE_INTERVAL', 3600))
+
+# (user_id, status, urgency)
+CounterKey = Tuple[int, str, str]
+
+
+class ApplicationStatsService:
+    """申請案件統計服務類"""
+
+    @staticmethod
+    def counter_key(application: Application) -> CounterKey:
+        """申請案件所屬的計數列（無狀態時以空字串表示）"""
+        return (application.user_id, application.status or '', application.urgency)
+
+    @staticmethod
+    def record_change(db: Session, before: Optional[CounterKey], after: Optional[CounterKey]) -> None:
+        """
+        在呼叫端的交易中套用一筆申請案件的計數變化
+
+        Args:
+            db: 資料庫 session
+            before: 變更前的計數列（None 表示新增）
+            after: 變更後的計數列（None 表示刪除）
+        """
+        if before == after:
+            return
+        deltas = Counter()
+        if before is not None:
+            deltas[before] -= 1
+        if after is not None:
+            deltas[after] += 1
+        ApplicationStatsService.apply_deltas(db, deltas)
+
+    @staticmethod
+    def apply_deltas(db: Session, deltas: Dict[CounterKey, int]) -> None:
+        """
+        以單一 upsert 語句增減多個計數列（不存在的列會新增）
+
+        Args:
+            db: 資料庫 session
+            deltas: 計數列 → 增減量
+        """
+        now = datetime.utcnow()
+        # 依鍵排序，同時更新多列的交易以相同順序取得列鎖，避免互相死結
+        rows = [
+            {'user_id': user_id, 'status': status, 'urgency': urgency, 'count': delta, 'updated_at': now}
+            for (user_id, status, urgency), delta in sorted(deltas.items())
+            if delta
+        ]
+        if not rows:
+            return
+
+        if db.get_bind().dialect.name in ('mysql', 'mariadb'):
+            statement = mysql_insert(ApplicationCounter).values(rows)
+            statement = statement.on_duplicate_key_update(
+                count=ApplicationCounter.count + statement.inserted.count,
+                updated_at=statement.inserted.updated_at
+            )
+        else:
+            statement = sqlite_insert(ApplicationCounter).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=[ApplicationCounter.user_id, ApplicationCounter.status, ApplicationCounter.urgency],
+                set_={
+                    'count': ApplicationCounter.count + statement.excluded.count,
+                    'updated_at': statement.excluded.updated_at
+                }
+            )
+        db.execute(statement)
+
+    @staticmethod
+    def total_statement(status: Optional[str] = None, user_id: Optional[int] = None, urgency: Optional[str] = None):
+        """
+        申請案件總數的查詢（讀取計數表，同步與非同步 session 皆可執行）
+
+        Args:
+            status: 狀態篩選（可選）
+            user_id: 用戶篩選（可選）
+            urgency: 急件程度篩選（可選）
+        """
+        query = select(func.coalesce(func.sum(ApplicationCounter.count), 0))
+        if user_id is not None:
+            query = query.where(ApplicationCounter.user_id == user_id)
+        if status:
+            query = query.where(ApplicationCounter.status == status)
+        if urgency:
+            query = query.where(ApplicationCounter.urgency == urgency)
+        return query
+
+    @staticmethod
+    def get_stats(db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        依狀態、急件程度與公司彙總的申請案件數（單一查詢讀取計數表）
+
+        Args:
+            db: 資料庫 session（可選，未提供時自行建立）
+
+        Returns:
+            總數與各項分類統計
+        """
+        with session_scope(db) as db:
+            try:
+                rows = db.execute(
+                    select(
+                        ApplicationCounter.user_id, ApplicationCounter.status, ApplicationCounter.urgency,
+                        ApplicationCounter.count, User.company_name
+                    ).outerjoin(User, User.id == ApplicationCounter.user_id)
+                ).all()
+
+                # 列出所有狀態與急件程度，沒有案件的分類也回傳 0
+                by_status = dict.fromkeys(Application.status.type.enums, 0)
+                by_urgency = dict.fromkeys(Application.urgency.type.enums, 0)
+                companies = {}
+                total = 0
+                for row in rows:
+                    if not row.count:
+                        continue
+                    total += row.count
+                    by_status[row.status] = by_status.get(row.status, 0) + row.count
+                    by_urgency[row.urgency] = by_urgency.get(row.urgency, 0) + row.count
+                    company = companies.setdefault(row.user_id, {
+                        'user_id': row.user_id,
+                        'company_name': row.company_name,
+                        'total': 0,
+                        'by_status': {},
+                        'by_urgency': {}
+                    })
+                    company['total'] += row.count
+                    company['by_status'][row.status] = company['by_status'].get(row.status, 0) + row.count
+                    company['by_urgency'][row.urgency] = company['by_urgency'].get(row.urgency, 0) + row.count
+
+                return {
+                    'success': True,
+                    'data': {
+                        'total': total,
+                        'by_status': by_status,
+                        'by_urgency': by_urgency,
+                        'by_company': sorted(companies.values(), key=lambda company: -company['total'])
+                    }
+                }
+
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': f'獲取申請案件統計失敗: {str(e)}'
+                }
+
+    @staticmethod
+    def reconcile(db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        以 applications 重新計算各計數列並修正差異
+
+        先鎖定計數表再計算：已更新計數但尚未提交的交易會先完成，之後才更新計數的交易則等待對帳結束，
+        兩者都不會被重複計算或遺漏。
+
+        Args:
+            db: 資料庫 session（可選，未提供時自行建立）
+
+        Returns:
+            對帳結果與修正的計數列
+        """
+        with session_scope(db) as db:
+            try:
+                recorded = {
+                    (row.user_id, row.status, row.urgency): row.count
+                    for row in db.execute(select(
+                        ApplicationCounter.user_id, ApplicationCounter.status,
+                        ApplicationCounter.urgency, ApplicationCounter.count
+                    ).with_for_update())
+                }
+                # 以字串讀取狀態，避免 Enum 型別在讀取時驗證值
+                status = func.coalesce(Application.status, '', type_=String)
+                actual = {
+                    (row.user_id, row.status, row.urgency): row.count
+                    for row in db.execute(select(
+                        Application.user_id, status.label('status'), Application.urgency,
+                        func.count(Application.id).label('count')
+                    ).group_by(Application.user_id, status, Application.urgency))
+                }
+
+                deltas = {
+                    key: actual.get(key, 0) - recorded.get(key, 0)
+                    for key in recorded.keys() | actual.keys()
+                    if actual.get(key, 0) != recorded.get(key, 0)
+                }
+                ApplicationStatsService.apply_deltas(db, deltas)
+                db.commit()
+
+                corrected = [
+                    {
+                        'user_id': user_id,
+                        'status': status,
+                        'urgency': urgency,
+                        'recorded': recorded.get((user_id, status, urgency), 0),
+                        'actual': actual.get((user_id, status, urgency), 0)
+                    }
+                    for user_id, status, urgency in sorted(deltas)
+                ]
+                if corrected:
+                    logger.warning(f"申請案件計數有 {len(corrected)} 列與實際不符，已修正")
+
+                return {
+                    'success': True,
+                    'corrected': corrected
+                }
+
+            except SQLAlchemyError as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'資料庫錯誤: {str(e)}'
+                }
+
+
+__all__ = ['APPLICATION_COUNTER_RECONCILE_INTERVAL', 'ApplicationStatsService']
@@ -0,0 +1,189 @@
+"""
+申請案件服務（非同步版本）
+提供 v2 非同步路由使用的唯讀查詢，回傳格式與 ApplicationService 相同
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Dict, Any
+from ..models import Application, Individual, User
+from .application_service import ApplicationService, LIST_COLUMNS, LIST_MAX_LIMIT
+from .application_stats import ApplicationStatsService
+from .async_individual_service import AsyncIndividualService
+
+
+class AsyncApplicationService:
+    """申請案件服務類（非同步）"""
+
+    @staticmethod
+    async def get_application_by_id(application_id: int, db: AsyncSession, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        根據 ID 獲取申請案件詳情
+
+        Args:
+            application_id: 申請案件 ID
+            db: 請求範圍的 AsyncSession
+            user_id: 用戶 ID（用於權限檢查，None 表示管理員查看）
+
+        Returns:
+            申請案件詳情字典或 None
+        """
+        try:
+            query = select(Application).where(Application.id == application_id)
+
+            # 如果指定了 user_id，則只能查看自己的申請
+            if user_id is not None:
+                query = query.where(Application.user_id == user_id)
+
+            application = (await db.execute(query)).scalars().first()
+            if not application:
+                return None
+
+            individual_data = await AsyncIndividualService.get_individual_by_id(application.individual_id, db)
+
+            user = (await db.execute(
+                select(User.id, User.company_name, User.username, User.email).where(User.id == application.user_id)
+            )).first()
+
+            return {
+                'id': application.id,
+                'user_id': application.user_id,
+                'individual_id': application.individual_id,
+                'application_type': application.application_type,
+                'urgency': application.urgency,
+                'application_date': application.application_date.isoformat() if application.application_date else None,
+                'customer_name': application.customer_name,
+                'status': application.status,
+                'substatus': application.substatus,
+                'reason': application.reason,
+                'created_at': application.created_at.isoformat(),
+                'updated_at': application.updated_at.isoformat(),
+                'individual_data': individual_data,
+                'user_data': {
+                    'id': user.id,
+                    'company_name': user.company_name,
+                    'username': user.username,
+                    'email': user.email
+                } if user else None
+            }
+
+        except Exception as e:
+            return None
+
+    @staticmethod
+    async def get_applications_by_user(user_id: int, db: AsyncSession, status: Optional[str] = None,
+                                       page: int = 1, limit: int = 50, cursor: Optional[str] = None,
+                                       application_type: Optional[str] = None, urgency: Optional[str] = None,
+                                       date_from: Optional[str] = None, date_to: Optional[str] = None,
+                                       sort: str = '-created_at', with_total: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        獲取用戶的申請案件列表（分頁，參數同 ApplicationService.get_applications_by_user）
+
+        Args:
+            user_id: 用戶 ID
+            db: 請求範圍的 AsyncSession
+            status: 狀態篩選（可選）
+
+        Returns:
+            申請案件列表和分頁資訊
+        """
+        page = max(page, 1)
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        if with_total is None:
+            with_total = not cursor
+
+        try:
+            try:
+                conditions, count_statement = ApplicationService.user_list_filters(
+                    user_id, status, application_type, urgency, date_from, date_to
+                )
+                # 單一 JOIN 查詢，只取列表需要的欄位
+                query = ApplicationService.paginate(
+                    select(*LIST_COLUMNS).outerjoin(
+                        Individual, Individual.id == Application.individual_id
+                    ).where(*conditions),
+                    page, limit, cursor, sort
+                )
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+
+            total = (await db.execute(count_statement)).scalar_one() if with_total else None
+
+            rows, pagination = ApplicationService.page_info(
+                (await db.execute(query)).all(), page, limit, cursor, total, sort
+            )
+            return {
+                'success': True,
+                'data': [ApplicationService.list_item(row) for row in rows],
+                'pagination': pagination
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'獲取申請案件列表失敗: {str(e)}'
+            }
+
+    @staticmethod
+    async def get_all_applications(db: AsyncSession, status: Optional[str] = None, page: int = 1, limit: int = 50,
+                                   cursor: Optional[str] = None, with_total: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        獲取所有申請案件（管理員用）
+
+        Args:
+            db: 請求範圍的 AsyncSession
+            status: 狀態篩選（可選）
+            page: 頁碼
+            limit: 每頁數量
+            cursor: 游標分頁，傳入上一頁的 next_cursor（可選，指定時忽略 page）
+            with_total: 是否計算總數（預設：page 模式計算、游標模式不計算）
+
+        Returns:
+            申請案件列表和分頁資訊
+        """
+        page = max(page, 1)
+        limit = min(max(limit, 1), LIST_MAX_LIMIT)
+        if with_total is None:
+            with_total = not cursor
+
+        try:
+            # 單一 JOIN 查詢，只取列表需要的欄位與公司名稱
+            query = select(*LIST_COLUMNS, User.company_name).outerjoin(
+                Individual, Individual.id == Application.individual_id
+            ).outerjoin(User, User.id == Application.user_id)
+
+            if status:
+                query = query.where(Application.status == status)
+
+            try:
+                query = ApplicationService.paginate(query, page, limit, cursor)
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+
+            # 總數由計數表讀取
+            total = (await db.execute(ApplicationStatsService.total_statement(status))).scalar_one() if with_total else None
+
+            rows, pagination = ApplicationService.page_info(
+                (await db.execute(query)).all(), page, limit, cursor, total
+            )
+            result = [
+                dict(ApplicationService.list_item(row), company_name=row.company_name)
+                for row in rows
+            ]
+
+            return {
+                'success': True,
+                'data': result,
+                'pagination': pagination
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'獲取申請案件列表失敗: {str(e)}'
+            }
@@ -0,0 +1,65 @@
+"""
+個人資料服務（非同步版本）
+提供 v2 非同步路由使用的唯讀查詢，回傳格式與 IndividualService 相同
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Dict, Any
+from ..models import Individual
+
+
+class AsyncIndividualService:
+    """個人資料服務類（非同步）"""
+
+    @staticmethod
+    async def get_individual_by_id(individual_id: int, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """
+        根據 ID 獲取個人資料（由圖片中繼資料判斷是否有圖片，不讀取圖片內容）
+
+        Args:
+            individual_id: 個人資料 ID
+            db: 請求範圍的 AsyncSession
+
+        Returns:
+            個人資料字典或 None
+        """
+        try:
+            result = await db.execute(
+                select(
+                    Individual.id,
+                    Individual.chinese_last_name,
+                    Individual.chinese_first_name,
+                    Individual.english_last_name,
+                    Individual.english_first_name,
+                    Individual.national_id,
+                    Individual.gender,
+                    Individual.passport_infomation_image_size.isnot(None).label('has_passport_image'),
+                    Individual.id_card_front_image_size.isnot(None).label('has_front_image'),
+                    Individual.id_card_back_image_size.isnot(None).label('has_back_image'),
+                    Individual.created_at,
+                    Individual.updated_at
+                ).where(Individual.id == individual_id)
+            )
+            row = result.first()
+            if not row:
+                return None
+
+            return {
+                'id': row.id,
+                'chinese_last_name': row.chinese_last_name,
+                'chinese_first_name': row.chinese_first_name,
+                'english_last_name': row.english_last_name,
+                'english_first_name': row.english_first_name,
+                'national_id': row.national_id,
+                'gender': row.gender,
+                'full_chinese_name': f"{row.chinese_last_name}{row.chinese_first_name}",
+                'full_english_name': f"{row.english_first_name} {row.english_last_name}",
+                'has_passport_image': bool(row.has_passport_image),
+                'has_front_image': bool(row.has_front_image),
+                'has_back_image': bool(row.has_back_image),
+                'created_at': row.created_at.isoformat(),
+                'updated_at': row.updated_at.isoformat()
+            }
+
+        except Exception as e:
+            return None
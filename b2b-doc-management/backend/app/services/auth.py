@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 from app.services.auth_service import AuthService
+from app.services.password_hasher import PasswordHasherBusy
+from app.utils.db import get_db
 from typing import Optional
 
 router = APIRouter(prefix="/auth")
@@ -30,37 +33,41 @@ class TokenRequest(BaseModel):
 
 
 @router.post('/login')
-def login(request: LoginRequest):
+async def login(request: LoginRequest, db: Session = Depends(get_db)):
     """用戶登入端點"""
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     try:
-        result = auth_service.login(request.username, request.password)
+        result = await auth_service.login(request.username, request.password)
         if result:
             return {'message': 'Login successful', 'user': result}
         raise HTTPException(status_code=401, detail='Invalid username or password')
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail='Login service busy, please retry', headers={'Retry-After': '1'})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Login failed: {str(e)}')
 
 
 @router.post('/register')
-def register(request: RegisterRequest):
+async def register(request: RegisterRequest, db: Session = Depends(get_db)):
     """用戶註冊端點"""
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     try:
-        result = auth_service.register(request.username, request.password, request.company, request.email)
+        result = await auth_service.register(request.username, request.password, request.company, request.email)
         if result:
             return {'message': 'User registered successfully', 'user': result}
         raise HTTPException(status_code=400, detail='Registration failed - user may already exist')
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail='Registration service busy, please retry', headers={'Retry-After': '1'})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Registration failed: {str(e)}')
 
 
 @router.post('/change-password')
-def change_password(request: ChangePasswordRequest):
+async def change_password(request: ChangePasswordRequest, db: Session = Depends(get_db)):
     """修改密碼端點"""
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     try:
-        success = auth_service.change_password(
+        success = await auth_service.change_password(
             request.username, 
             request.old_password, 
             request.new_password
@@ -68,14 +75,16 @@ def change_password(request: ChangePasswordRequest):
         if success:
             return {'message': 'Password changed successfully'}
         raise HTTPException(status_code=400, detail='Password change failed - invalid credentials')
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail='Password service busy, please retry', headers={'Retry-After': '1'})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Password change failed: {str(e)}')
 
 
 @router.post('/validate-token')
-def validate_token(request: TokenRequest):
+def validate_token(request: TokenRequest, db: Session = Depends(get_db)):
     """驗證token端點"""
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     try:
         payload = auth_service.validate_token(request.token)
         if payload:
@@ -86,9 +95,9 @@ def validate_token(request: TokenRequest):
 
 
 @router.post('/refresh-token')
-def refresh_token(request: TokenRequest):
+def refresh_token(request: TokenRequest, db: Session = Depends(get_db)):
     """刷新token端點"""
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     try:
         new_token = auth_service.refresh_token(request.token)
         if new_token:
@@ -99,9 +108,9 @@ def refresh_token(request: TokenRequest):
 
 
 @router.post('/logout')
-def logout(request: TokenRequest):
+def logout(request: TokenRequest, db: Session = Depends(get_db)):
     """用戶登出端點"""
-    auth_service = AuthService()
+    auth_service = AuthService(db)
     try:
         success = auth_service.logout(request.token)
         if success:
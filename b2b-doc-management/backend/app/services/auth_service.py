@@ -1,23 +1,123 @@
 import jwt
+import os
+import time
+import uuid
 import datetime
-from werkzeug.security import check_password_hash, generate_password_hash
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from app.utils.db import SessionLocal
+from app.utils.cache import TTLCache
+from app.services.password_hasher import password_hasher, PasswordHasherBusy
+from app.services.token_revocation import revocation_store
 from app.models import User
 from typing import Optional, Dict, Any
 
 SECRET_KEY = 'replace-with-secure-secret'
 
+# token 有效期；縮短可讓無狀態認證的資料更即時
+TOKEN_TTL = datetime.timedelta(hours=float(os.getenv('AUTH_TOKEN_TTL_HOURS', 8)))
+
+# 無狀態（claims-only）認證：僅需身分、公司與角色的路由直接信任已驗證的 token 內容，
+# 但只接受簽發後 AUTH_CLAIMS_MAX_AGE 秒內的 token，較舊的 token 會改走資料庫驗證
+STATELESS_CLAIMS_ENABLED = os.getenv('AUTH_STATELESS_CLAIMS', 'false').lower() in ('1', 'true', 'yes')
+CLAIMS_MAX_AGE = int(os.getenv('AUTH_CLAIMS_MAX_AGE', 900))
+
+# token → (TokenPrincipal, jti) 快取，穩定狀態下認證不需要任何 SQL；
+# 快取不可變的快照而非 ORM 實例，同時進行的請求共用同一個物件也不會互相影響
+principal_cache = TTLCache(
+    maxsize=int(os.getenv('AUTH_PRINCIPAL_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('AUTH_PRINCIPAL_CACHE_TTL', 300))
+)
+
+
+def invalidate_user_principals(user_id: int) -> int:
+    """移除某用戶所有已快取的 token 主體，回傳移除數量"""
+    return principal_cache.discard_if(lambda token, entry: entry[0].id == user_id)
+
+
+class TokenPrincipal:
+    """輕量且不可變的用戶主體，提供與 User 相同的身分欄位；由已驗證的 JWT claims 或資料庫的 User 建立"""
+
+    __slots__ = ('id', 'username', 'company_name', 'role')
+
+    def __init__(self, id: int, username: str, company_name: str, role: str):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'company_name', company_name)
+        object.__setattr__(self, 'role', role)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"TokenPrincipal 為唯讀，無法設定 {name}")
+
+    @classmethod
+    def from_user(cls, user: User) -> 'TokenPrincipal':
+        """由資料庫的 User 建立快照"""
+        return cls(id=user.id, username=user.username, company_name=user.company_name, role=user.role)
+
+    @property
+    def is_admin(self):
+        """檢查用戶是否為管理員"""
+        return self.role in ['admin', 'sudo']
+
+
+@event.listens_for(User, 'after_update')
+def _invalidate_principals_on_update(mapper, connection, target):
+    """角色、公司或密碼等用戶資料變更時，讓該用戶的快取失效"""
+    invalidate_user_principals(target.id)
+
 
 class AuthService:
-    def __init__(self):
-        self.db = SessionLocal()
+    def __init__(self, db: Optional[Session] = None):
+        # 優先沿用請求範圍的 session，只有自行建立的 session 才由本物件關閉
+        self._owns_db = db is None
+        self.db = db if db is not None else SessionLocal()
+
+    def close(self):
+        """關閉自行建立的資料庫 session"""
+        if getattr(self, '_owns_db', False):
+            self.db.close()
+            self._owns_db = False
 
     def __del__(self):
         """確保資料庫連接被正確關閉"""
         if hasattr(self, 'db'):
-            self.db.close()
+            self.close()
+
+    def _issue_token(self, user: User) -> str:
+        """為用戶簽發 JWT，包含唯一的 jti 與簽發時間 iat"""
+        now = datetime.datetime.utcnow()
+        payload = {
+            'sub': user.id,
+            'jti': uuid.uuid4().hex,
+            'username': user.username,
+            'company': user.company_name,
+            'role': user.role,
+            'is_admin': user.is_admin,
+            'iat': now,
+            'exp': now + TOKEN_TTL
+        }
+        return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
-    def login(self, username: str, password: str) -> Optional[Dict[str, Any]]:
+    def _find_user(self, username: str) -> Optional[User]:
+        return self.db.query(User).filter(User.username == username).first()
+
+    def _save_password(self, user: User, hashed_password: str) -> None:
+        user.password = hashed_password
+        self.db.commit()
+
+    async def _upgrade_password_hash(self, user: User, password: str) -> None:
+        """登入成功後以目前的雜湊參數重新雜湊舊密碼；失敗時保留原雜湊，不影響登入"""
+        try:
+            await run_in_threadpool(self._save_password, user, await password_hasher.hash_async(password))
+        except Exception as e:
+            await run_in_threadpool(self.db.rollback)
+            print(f"Password hash upgrade skipped: {e}")
+
+    # 以下方法的資料庫操作在執行緒池執行，雜湊則以 await 等待行程池：
+    # 等待雜湊的請求不佔用執行緒，登入尖峰不會耗盡其他同步端點共用的執行緒池
+
+    async def login(self, username: str, password: str) -> Optional[Dict[str, Any]]:
         """用戶登入
         
         Args:
@@ -28,34 +128,56 @@ class AuthService:
             成功返回用戶信息和token，失敗返回None
         """
         try:
-            user = self.db.query(User).filter(User.username == username).first()
+            user = await run_in_threadpool(self._find_user, username)
             if not user:
                 return None
 
-            if check_password_hash(user.password, password):
-                payload = {
-                    'sub': user.id,
-                    'username': user.username,
-                    'company': user.company_name,
-                    'role': user.role,
-                    'is_admin': user.is_admin,
-                    'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=8)
-                }
-                token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
-                return {
+            if await password_hasher.verify_async(user.password, password):
+                # 升級雜湊會提交交易，先讀取回應所需的欄位
+                result = {
                     'id': user.id, 
                     'username': user.username, 
                     'company': user.company_name,
                     'role': user.role,
                     'is_admin': user.is_admin,
-                    'token': token
+                    'token': self._issue_token(user)
                 }
+                if password_hasher.needs_rehash(user.password):
+                    await self._upgrade_password_hash(user, password)
+                return result
             return None
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             print(f"Login error: {e}")
             return None
 
-    def register(self, username: str, password: str, company: str = '', email: str = '') -> Optional[Dict[str, Any]]:
+    def _create_user(self, username: str, hashed_password: str, company: str, email: str) -> Dict[str, Any]:
+        new_user = User(
+            username=username,
+            password=hashed_password,
+            company_name=company,
+            email=email or f"{username}@example.com",
+            role='user'  # 新用戶默認為普通用戶
+        )
+        
+        self.db.add(new_user)
+        self.db.commit()
+        self.db.refresh(new_user)
+        
+        # 生成token
+        token = self._issue_token(new_user)
+        
+        return {
+            'id': new_user.id,
+            'username': new_user.username,
+            'company': new_user.company_name,
+            'role': new_user.role,
+            'is_admin': new_user.is_admin,
+            'token': token
+        }
+
+    async def register(self, username: str, password: str, company: str = '', email: str = '') -> Optional[Dict[str, Any]]:
         """用戶註冊
         
         Args:
@@ -69,49 +191,21 @@ class AuthService:
         """
         try:
             # 檢查用戶是否已存在
-            existing_user = self.db.query(User).filter(User.username == username).first()
-            if existing_user:
+            if await run_in_threadpool(self._find_user, username):
                 return None
             
             # 創建新用戶
-            hashed_password = generate_password_hash(password)
-            new_user = User(
-                username=username,
-                password=hashed_password,
-                company_name=company,
-                email=email or f"{username}@example.com",
-                role='user'  # 新用戶默認為普通用戶
-            )
-            
-            self.db.add(new_user)
-            self.db.commit()
-            self.db.refresh(new_user)
-            
-            # 生成token
-            payload = {
-                'sub': new_user.id,
-                'username': new_user.username,
-                'company': new_user.company_name,
-                'role': new_user.role,
-                'is_admin': new_user.is_admin,
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=8)
-            }
-            token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
-            
-            return {
-                'id': new_user.id,
-                'username': new_user.username,
-                'company': new_user.company_name,
-                'role': new_user.role,
-                'is_admin': new_user.is_admin,
-                'token': token
-            }
+            hashed_password = await password_hasher.hash_async(password)
+            return await run_in_threadpool(self._create_user, username, hashed_password, company, email)
+        except PasswordHasherBusy:
+            await run_in_threadpool(self.db.rollback)
+            raise
         except Exception as e:
-            self.db.rollback()
+            await run_in_threadpool(self.db.rollback)
             print(f"Registration error: {e}")
             return None
 
-    def change_password(self, username: str, old_password: str, new_password: str) -> bool:
+    async def change_password(self, username: str, old_password: str, new_password: str) -> bool:
         """修改密碼
         
         Args:
@@ -123,20 +217,24 @@ class AuthService:
             成功返回True，失敗返回False
         """
         try:
-            user = self.db.query(User).filter(User.username == username).first()
+            user = await run_in_threadpool(self._find_user, username)
             if not user:
                 return False
             
             # 驗證舊密碼
-            if not check_password_hash(user.password, old_password):
+            if not await password_hasher.verify_async(user.password, old_password):
                 return False
             
             # 更新密碼
-            user.password = generate_password_hash(new_password)
-            self.db.commit()
+            user_id = user.id
+            await run_in_threadpool(self._save_password, user, await password_hasher.hash_async(new_password))
+            invalidate_user_principals(user_id)
             return True
+        except PasswordHasherBusy:
+            await run_in_threadpool(self.db.rollback)
+            raise
         except Exception as e:
-            self.db.rollback()
+            await run_in_threadpool(self.db.rollback)
             print(f"Change password error: {e}")
             return False
 
@@ -151,6 +249,9 @@ class AuthService:
         """
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+            if revocation_store.is_revoked(payload.get('jti')):
+                print("Token has been revoked")
+                return None
             return payload
         except jwt.ExpiredSignatureError:
             print("Token has expired")
@@ -171,6 +272,8 @@ class AuthService:
         try:
             # 驗證舊token（允許過期的token進行刷新）
             payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'], options={"verify_exp": False})
+            if revocation_store.is_revoked(payload.get('jti')):
+                return None
             
             # 檢查用戶是否還存在
             user = self.db.query(User).filter(User.id == payload['sub']).first()
@@ -178,22 +281,13 @@ class AuthService:
                 return None
             
             # 生成新token
-            new_payload = {
-                'sub': user.id,
-                'username': user.username,
-                'company': user.company_name,
-                'role': user.role,
-                'is_admin': user.is_admin,
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=8)
-            }
-            new_token = jwt.encode(new_payload, SECRET_KEY, algorithm='HS256')
-            return new_token
+            return self._issue_token(user)
         except Exception as e:
             print(f"Refresh token error: {e}")
             return None
 
     def logout(self, token: str) -> bool:
-        """用戶登出（這裡可以實現token黑名單機制）
+        """用戶登出，將token的jti加入撤銷清單直到其過期
         
         Args:
             token: JWT token
@@ -201,26 +295,63 @@ class AuthService:
         Returns:
             成功返回True
         """
-        # 在真實應用中，可以將token加入黑名單
-        # 或者實現其他登出邏輯
+        principal_cache.pop(token)
+        payload = self.validate_token(token)
+        if payload and payload.get('jti'):
+            revocation_store.revoke(payload['jti'], payload['exp'], user_id=payload.get('sub'), db=self.db)
         return True
 
-    def get_user_by_token(self, token: str) -> Optional[User]:
+    def get_principal_by_token(self, token: str) -> Optional[TokenPrincipal]:
+        """僅根據已驗證的token claims建立用戶主體，不查詢資料庫
+        
+        Args:
+            token: JWT token
+            
+        Returns:
+            token有效且簽發時間在 CLAIMS_MAX_AGE 內時返回主體，否則返回None（呼叫端應改走資料庫驗證）
+        """
+        payload = self.validate_token(token)
+        if not payload or 'iat' not in payload:
+            return None
+
+        if time.time() - payload['iat'] > CLAIMS_MAX_AGE:
+            return None
+
+        return TokenPrincipal(
+            id=payload['sub'],
+            username=payload.get('username'),
+            company_name=payload.get('company'),
+            role=payload.get('role')
+        )
+
+    def get_user_by_token(self, token: str) -> Optional[TokenPrincipal]:
         """根據token獲取用戶信息
         
         Args:
             token: JWT token
             
         Returns:
-            成功返回用戶對象，失敗返回None
+            成功返回用戶主體（由資料庫讀取的快照），失敗返回None
         """
+        cached = principal_cache.get(token)
+        if cached is not None:
+            principal, jti = cached
+            # 其他工作行程登出的 token 只會出現在撤銷清單中
+            return None if revocation_store.is_revoked(jti) else principal
+
         payload = self.validate_token(token)
         if not payload:
             return None
         
         try:
             user = self.db.query(User).filter(User.id == payload['sub']).first()
-            return user
+            if not user:
+                return None
+            # 快取到期時間不晚於 token 本身的 exp
+            principal = TokenPrincipal.from_user(user)
+            expires_at = time.monotonic() + (payload['exp'] - time.time())
+            principal_cache.set(token, (principal, payload.get('jti')), expires_at=expires_at)
+            return principal
         except Exception as e:
             print(f"Get user by token error: {e}")
             return None
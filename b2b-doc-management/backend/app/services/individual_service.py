@@ -4,270 +4,331 @@
 """
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from typing import Optional, Dict, Any
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime
 import base64
-import hashlib
-from ..models import Individual
-from ..utils.db import SessionLocal
+from ..models import Individual, INDIVIDUAL_IMAGE_FIELDS
+from ..utils.db import session_scope
+from ..utils.blob_store import blob_store
+from ..utils.image_ingest import normalize_image
+from .search_index import SearchIndexService
+
+# 個人資料的基本欄位（不含圖片）
+INDIVIDUAL_BASIC_FIELDS = (
+    'chinese_last_name', 'chinese_first_name', 'english_last_name', 'english_first_name',
+    'national_id', 'gender'
+)
+
+# 會寫入搜尋索引的欄位
+SEARCHABLE_FIELDS = (
+    'chinese_last_name', 'chinese_first_name', 'english_last_name', 'english_first_name', 'national_id'
+)
 
 
 class IndividualService:
     """個人資料服務類"""
     
     @staticmethod
-    def create_individual(individual_data: Dict[str, Any]) -> Dict[str, Any]:
+    def create_individual(individual_data: Dict[str, Any], db: Optional[Session] = None) -> Dict[str, Any]:
         """
         創建新的個人資料
         
         Args:
             individual_data: 包含個人資料的字典
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             創建結果和個人資料 ID
         """
-        db: Session = SessionLocal()
-        try:
-            # 處理圖片數據
-            front_image_data = None
-            back_image_data = None
-            
-            if 'id_card_front_image' in individual_data:
-                front_image_data = IndividualService._process_image_data(
-                    individual_data['id_card_front_image']
-                )
-            
-            if 'id_card_back_image' in individual_data:
-                back_image_data = IndividualService._process_image_data(
-                    individual_data['id_card_back_image']
-                )
-            
-            # 處理護照圖片數據
-            passport_image_data = None
-            if 'passport_infomation_image' in individual_data:
-                passport_image_data = IndividualService._process_image_data(
-                    individual_data['passport_infomation_image']
+        # 先完成圖片解碼與正規化，不在資料庫交易中進行 CPU 密集的工作
+        images = {
+            field: IndividualService._process_image_data(individual_data[field])
+            for field in INDIVIDUAL_IMAGE_FIELDS.values() if field in individual_data
+        }
+        
+        with session_scope(db) as db:
+            try:
+                # 創建個人資料實例
+                individual = Individual(
+                    chinese_last_name=individual_data.get('chinese_last_name'),
+                    chinese_first_name=individual_data.get('chinese_first_name'),
+                    english_last_name=individual_data.get('english_last_name'),
+                    english_first_name=individual_data.get('english_first_name'),
+                    national_id=individual_data.get('national_id'),
+                    gender=individual_data.get('gender')
                 )
-            
-            # 創建個人資料實例
-            individual = Individual(
-                chinese_last_name=individual_data.get('chinese_last_name'),
-                chinese_first_name=individual_data.get('chinese_first_name'),
-                english_last_name=individual_data.get('english_last_name'),
-                english_first_name=individual_data.get('english_first_name'),
-                national_id=individual_data.get('national_id'),
-                gender=individual_data.get('gender'),
-                passport_infomation_image=passport_image_data,
-                id_card_front_image=front_image_data,
-                id_card_back_image=back_image_data
-            )
-            
-            db.add(individual)
-            db.commit()
-            db.refresh(individual)
-            
-            return {
-                'success': True,
-                'individual_id': individual.id,
-                'message': '個人資料創建成功'
-            }
-            
-        except SQLAlchemyError as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'資料庫錯誤: {str(e)}'
-            }
-        except Exception as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'創建個人資料失敗: {str(e)}'
-            }
-        finally:
-            db.close()
+                
+                # 處理圖片數據（存入 blob store，資料列只記錄摘要）
+                for field, image in images.items():
+                    IndividualService._store_image(db, individual, field, image)
+                
+                db.add(individual)
+                db.flush()
+                SearchIndexService.index_individuals(db, [individual])
+                db.commit()
+                db.refresh(individual)
+                
+                return {
+                    'success': True,
+                    'individual_id': individual.id,
+                    'message': '個人資料創建成功'
+                }
+                
+            except SQLAlchemyError as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'資料庫錯誤: {str(e)}'
+                }
+            except Exception as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'創建個人資料失敗: {str(e)}'
+                }
     
     @staticmethod
-    def get_individual_by_id(individual_id: int) -> Optional[Dict[str, Any]]:
+    def get_individual_by_id(individual_id: int, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
         """
         根據 ID 獲取個人資料
         
         Args:
             individual_id: 個人資料 ID
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             個人資料字典或 None
         """
-        db: Session = SessionLocal()
-        try:
-            individual = db.query(Individual).filter(Individual.id == individual_id).first()
-            if not individual:
+        with session_scope(db) as db:
+            try:
+                individual = db.query(Individual).filter(Individual.id == individual_id).first()
+                if not individual:
+                    return None
+                
+                return {
+                    'id': individual.id,
+                    'chinese_last_name': individual.chinese_last_name,
+                    'chinese_first_name': individual.chinese_first_name,
+                    'english_last_name': individual.english_last_name,
+                    'english_first_name': individual.english_first_name,
+                    'national_id': individual.national_id,
+                    'gender': individual.gender,
+                    'full_chinese_name': individual.full_chinese_name,
+                    'full_english_name': individual.full_english_name,
+                    'has_passport_image': individual.passport_infomation_image_size is not None,
+                    'has_front_image': individual.id_card_front_image_size is not None,
+                    'has_back_image': individual.id_card_back_image_size is not None,
+                    'created_at': individual.created_at.isoformat(),
+                    'updated_at': individual.updated_at.isoformat()
+                }
+                
+            except Exception as e:
                 return None
-            
-            return {
-                'id': individual.id,
-                'chinese_last_name': individual.chinese_last_name,
-                'chinese_first_name': individual.chinese_first_name,
-                'english_last_name': individual.english_last_name,
-                'english_first_name': individual.english_first_name,
-                'national_id': individual.national_id,
-                'gender': individual.gender,
-                'full_chinese_name': individual.full_chinese_name,
-                'full_english_name': individual.full_english_name,
-                'has_passport_image': individual.passport_infomation_image is not None,
-                'has_front_image': individual.id_card_front_image is not None,
-                'has_back_image': individual.id_card_back_image is not None,
-                'created_at': individual.created_at.isoformat(),
-                'updated_at': individual.updated_at.isoformat()
-            }
-            
-        except Exception as e:
-            return None
-        finally:
-            db.close()
     
     @staticmethod
-    def find_individual_by_name(chinese_last_name: str, chinese_first_name: str) -> Optional[Dict[str, Any]]:
+    def find_individual_by_name(chinese_last_name: str, chinese_first_name: str, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
         """
         根據中文姓名查找個人資料
         
         Args:
             chinese_last_name: 中文姓
             chinese_first_name: 中文名
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             個人資料字典或 None
         """
-        db: Session = SessionLocal()
-        try:
-            individual = db.query(Individual).filter(
-                Individual.chinese_last_name == chinese_last_name,
-                Individual.chinese_first_name == chinese_first_name
-            ).first()
-            
-            if not individual:
+        with session_scope(db) as db:
+            try:
+                individual = db.query(Individual).filter(
+                    Individual.chinese_last_name == chinese_last_name,
+                    Individual.chinese_first_name == chinese_first_name
+                ).first()
+                
+                if not individual:
+                    return None
+                
+                return IndividualService.get_individual_by_id(individual.id, db=db)
+                
+            except Exception as e:
                 return None
-            
-            return IndividualService.get_individual_by_id(individual.id)
-            
-        except Exception as e:
-            return None
-        finally:
-            db.close()
     
     @staticmethod
-    def update_individual(individual_id: int, update_data: Dict[str, Any]) -> Dict[str, Any]:
+    def update_individual(individual_id: int, update_data: Dict[str, Any], db: Optional[Session] = None) -> Dict[str, Any]:
         """
         更新個人資料
         
+        傳入 db 時只 flush 不提交，由呼叫端與其他變更（例如申請案件與計數）在同一個交易中提交。
+        
         Args:
             individual_id: 個人資料 ID
             update_data: 要更新的資料
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立並提交）
             
         Returns:
             更新結果
         """
-        db: Session = SessionLocal()
-        try:
-            individual = db.query(Individual).filter(Individual.id == individual_id).first()
-            if not individual:
+        images = {
+            field: IndividualService._process_image_data(update_data[field])
+            for field in INDIVIDUAL_IMAGE_FIELDS.values() if field in update_data
+        }
+        
+        owns_session = db is None
+        with session_scope(db) as db:
+            try:
+                individual = db.query(Individual).filter(Individual.id == individual_id).first()
+                if not individual:
+                    return {
+                        'success': False,
+                        'error': '找不到該個人資料'
+                    }
+                
+                # 更新基本資料
+                if 'chinese_last_name' in update_data:
+                    individual.chinese_last_name = update_data['chinese_last_name']
+                if 'chinese_first_name' in update_data:
+                    individual.chinese_first_name = update_data['chinese_first_name']
+                if 'english_last_name' in update_data:
+                    individual.english_last_name = update_data['english_last_name']
+                if 'english_first_name' in update_data:
+                    individual.english_first_name = update_data['english_first_name']
+                if 'national_id' in update_data:
+                    individual.national_id = update_data['national_id']
+                if 'gender' in update_data:
+                    individual.gender = update_data['gender']
+                
+                # 更新圖片
+                for field, image in images.items():
+                    IndividualService._store_image(db, individual, field, image)
+                
+                if any(field in update_data for field in SEARCHABLE_FIELDS):
+                    SearchIndexService.index_individuals(db, [individual])
+                db.flush()
+                if owns_session:
+                    db.commit()
+                
+                return {
+                    'success': True,
+                    'message': '個人資料更新成功'
+                }
+                
+            except SQLAlchemyError as e:
+                db.rollback()
                 return {
                     'success': False,
-                    'error': '找不到該個人資料'
+                    'error': f'資料庫錯誤: {str(e)}'
+                }
+            except Exception as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'更新個人資料失敗: {str(e)}'
                 }
-            
-            # 更新基本資料
-            if 'chinese_last_name' in update_data:
-                individual.chinese_last_name = update_data['chinese_last_name']
-            if 'chinese_first_name' in update_data:
-                individual.chinese_first_name = update_data['chinese_first_name']
-            if 'english_last_name' in update_data:
-                individual.english_last_name = update_data['english_last_name']
-            if 'english_first_name' in update_data:
-                individual.english_first_name = update_data['english_first_name']
-            if 'national_id' in update_data:
-                individual.national_id = update_data['national_id']
-            if 'gender' in update_data:
-                individual.gender = update_data['gender']
-            
-            # 更新圖片
-            if 'passport_infomation_image' in update_data:
-                individual.passport_infomation_image = IndividualService._process_image_data(
-                    update_data['passport_infomation_image']
-                )
-            if 'id_card_front_image' in update_data:
-                individual.id_card_front_image = IndividualService._process_image_data(
-                    update_data['id_card_front_image']
-                )
-            if 'id_card_back_image' in update_data:
-                individual.id_card_back_image = IndividualService._process_image_data(
-                    update_data['id_card_back_image']
-                )
-            
-            db.commit()
-            db.refresh(individual)
-            
-            return {
-                'success': True,
-                'message': '個人資料更新成功'
-            }
-            
-        except SQLAlchemyError as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'資料庫錯誤: {str(e)}'
-            }
-        except Exception as e:
-            db.rollback()
-            return {
-                'success': False,
-                'error': f'更新個人資料失敗: {str(e)}'
-            }
-        finally:
-            db.close()
     
     @staticmethod
-    def get_individual_image(individual_id: int, image_type: str) -> Optional[bytes]:
+    def get_individual_image(individual_id: int, image_type: str, db: Optional[Session] = None) -> Optional[bytes]:
         """
         獲取個人資料的圖片
         
         Args:
             individual_id: 個人資料 ID
-            image_type: 圖片類型 ('front' 或 'back')
+            image_type: 圖片類型 ('front'、'back' 或 'passport')
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
             
         Returns:
             圖片二進位數據或 None
         """
-        db: Session = SessionLocal()
-        try:
-            individual = db.query(Individual).filter(Individual.id == individual_id).first()
-            if not individual:
-                return None
-            
-            if image_type == 'front':
-                return individual.id_card_front_image
-            elif image_type == 'back':
-                return individual.id_card_back_image
-            elif image_type == 'passport':
-                return individual.passport_infomation_image
-            else:
+        with session_scope(db) as db:
+            try:
+                individual = db.query(Individual).filter(Individual.id == individual_id).first()
+                if not individual:
+                    return None
+                
+                field = INDIVIDUAL_IMAGE_FIELDS.get(image_type)
+                if not field:
+                    return None
+                
+                digest = getattr(individual, f'{field}_digest')
+                if digest:
+                    return blob_store.read(digest)
+                if getattr(individual, f'{field}_size') is None:
+                    return None
+                # 尚未遷移到 blob store 的舊資料（延遲載入，只讀取這一個欄位）
+                return getattr(individual, field)
+                
+            except Exception as e:
                 return None
-            
-        except Exception as e:
+
+    @staticmethod
+    def get_individual_image_info(individual_id: int, image_type: str, db: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+        """
+        獲取個人資料圖片的中繼資料（不讀取圖片內容），供快取驗證與串流使用
+
+        Args:
+            individual_id: 個人資料 ID
+            image_type: 圖片類型 ('front'、'back' 或 'passport')
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
+
+        Returns:
+            digest、size、mime_type、updated_at；尚未遷移的舊資料 digest 為 None；沒有圖片時返回 None
+        """
+        field = INDIVIDUAL_IMAGE_FIELDS.get(image_type)
+        if not field:
             return None
-        finally:
-            db.close()
+
+        with session_scope(db) as db:
+            row = db.query(
+                getattr(Individual, f'{field}_digest'),
+                getattr(Individual, f'{field}_size'),
+                getattr(Individual, f'{field}_mime'),
+                getattr(Individual, f'{field}_updated_at')
+            ).filter(Individual.id == individual_id).first()
+            if row is None or row[1] is None:
+                return None
+
+            digest, size, mime_type, updated_at = row
+            return {
+                'digest': digest,
+                'size': size,
+                'mime_type': mime_type,
+                'updated_at': updated_at
+            }
+
+    @staticmethod
+    def _store_image(db: Session, individual: Individual, field: str, image: Optional[Tuple[bytes, str]]) -> None:
+        """
+        將圖片存入 blob store 並更新中繼資料欄位，釋放原本圖片的引用
+        
+        Args:
+            db: 資料庫 session
+            individual: 個人資料實例
+            field: 圖片欄位名稱（INDIVIDUAL_IMAGE_FIELDS 的值）
+            image: _process_image_data() 的結果 (圖片數據, MIME 類型)（None 表示清除圖片）
+        """
+        old_digest = getattr(individual, f'{field}_digest')
+        
+        blob = blob_store.put(db, *image) if image is not None else None
+        setattr(individual, f'{field}_digest', blob.digest if blob else None)
+        setattr(individual, f'{field}_size', blob.size if blob else None)
+        setattr(individual, f'{field}_mime', blob.mime_type if blob else None)
+        setattr(individual, f'{field}_updated_at', datetime.utcnow() if blob else None)
+        # 清除尚未遷移的舊欄位內容
+        setattr(individual, field, None)
+        
+        blob_store.release(db, old_digest)
     
     @staticmethod
-    def _process_image_data(image_data: Any) -> Optional[bytes]:
+    def _process_image_data(image_data: Any) -> Optional[Tuple[bytes, str]]:
         """
-        處理圖片數據，支援 base64 字符串或直接的 bytes
+        處理圖片數據，支援 base64 字符串或直接的 bytes；解碼後正規化（方向、中繼資料、解析度、壓縮）
         
         Args:
             image_data: 圖片數據
             
         Returns:
-            處理後的 bytes 數據
+            (處理後的 bytes 數據, 實際的 MIME 類型)
         """
         if image_data is None:
             return None
@@ -278,24 +339,30 @@ class IndividualService:
                 # 移除可能的前綴 (data:image/jpeg;base64,)
                 if ',' in image_data:
                     image_data = image_data.split(',')[1]
-                return base64.b64decode(image_data)
+                image_data = base64.b64decode(image_data)
             except Exception:
                 return None
-        elif isinstance(image_data, bytes):
-            return image_data
-        else:
+        elif not isinstance(image_data, bytes):
             return None
+        
+        return normalize_image(image_data)
     
     @staticmethod
-    def create_or_update_individual(individual_data: Dict[str, Any]) -> Dict[str, Any]:
+    def create_or_update_individual(individual_data: Dict[str, Any], db: Optional[Session] = None) -> Dict[str, Any]:
         """
-        創建或更新個人資料（根據姓名查找是否存在）
+        創建或更新個人資料（以身分證字號 upsert）
+        
+        以單一 INSERT ... ON DUPLICATE KEY UPDATE（SQLite 為 ON CONFLICT DO UPDATE）寫入，
+        同時送出相同身分證字號的請求不會因唯一鍵衝突而失敗。傳入 db 時不提交，
+        由呼叫端與其他變更（例如申請案件）在同一個交易中提交。缺少新增所需的欄位時只更新既有資料
+        （依身分證字號，未提供時依中文姓名）。
         
         Args:
             individual_data: 個人資料
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立並提交）
             
         Returns:
-            操作結果和個人資料 ID
+            操作結果、個人資料 ID 和 action（created 或 updated）
         """
         chinese_last_name = individual_data.get('chinese_last_name')
         chinese_first_name = individual_data.get('chinese_first_name')
@@ -306,21 +373,98 @@ class IndividualService:
                 'error': '中文姓名為必填項'
             }
         
-        # 查找是否已存在
-        existing = IndividualService.find_individual_by_name(
-            chinese_last_name, chinese_first_name
-        )
+        images = {
+            field: IndividualService._process_image_data(individual_data[field])
+            for field in INDIVIDUAL_IMAGE_FIELDS.values() if field in individual_data
+        }
+        
+        owns_session = db is None
+        with session_scope(db) as db:
+            try:
+                missing = [field for field in INDIVIDUAL_BASIC_FIELDS if not individual_data.get(field)]
+                if not missing:
+                    # 寫入前先讀取是否已存在（不加鎖，避免同時新增相同身分證字號的請求互相死結）；
+                    # MySQL 的 upsert 更新既有資料列時影響列數為 2，可涵蓋讀取後才由其他請求新增的情況
+                    existing_id = db.query(Individual.id).filter(
+                        Individual.national_id == individual_data['national_id']
+                    ).scalar()
+                    # 插入與更新的資料列都會在 upsert 時鎖定，之後的讀取與圖片更新不會與其他請求交錯
+                    result = db.execute(IndividualService.upsert_statement(db, [individual_data], datetime.utcnow()))
+                    individual = db.query(Individual).filter(
+                        Individual.national_id == individual_data['national_id']
+                    ).populate_existing().one()
+                    action = 'updated' if existing_id is not None or result.rowcount > 1 else 'created'
+                else:
+                    # 缺少新增所需的欄位時只能更新既有資料（依身分證字號，未提供時依中文姓名）
+                    query = db.query(Individual)
+                    if individual_data.get('national_id'):
+                        query = query.filter(Individual.national_id == individual_data['national_id'])
+                    else:
+                        query = query.filter(
+                            Individual.chinese_last_name == chinese_last_name,
+                            Individual.chinese_first_name == chinese_first_name
+                        )
+                    individual = query.first()
+                    if not individual:
+                        return {
+                            'success': False,
+                            'error': f"新增個人資料缺少必填欄位: {', '.join(missing)}"
+                        }
+                    for field in INDIVIDUAL_BASIC_FIELDS:
+                        if individual_data.get(field) is not None:
+                            setattr(individual, field, individual_data[field])
+                    action = 'updated'
+                
+                for field, image in images.items():
+                    IndividualService._store_image(db, individual, field, image)
+                
+                db.flush()
+                SearchIndexService.index_individuals(db, [individual])
+                if owns_session:
+                    db.commit()
+                
+                return {
+                    'success': True,
+                    'individual_id': individual.id,
+                    'action': action,
+                    'message': '個人資料創建成功' if action == 'created' else '個人資料更新成功'
+                }
+                
+            except SQLAlchemyError as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'資料庫錯誤: {str(e)}'
+                }
+            except Exception as e:
+                db.rollback()
+                return {
+                    'success': False,
+                    'error': f'處理個人資料失敗: {str(e)}'
+                }
+    
+    @staticmethod
+    def upsert_statement(db: Session, rows: List[Dict[str, Any]], now: datetime):
+        """
+        以身分證字號為鍵的多列 upsert 語句（每列需包含所有基本欄位）
         
-        if existing:
-            # 更新現有資料
-            result = IndividualService.update_individual(existing['id'], individual_data)
-            if result['success']:
-                result['individual_id'] = existing['id']
-                result['action'] = 'updated'
-            return result
-        else:
-            # 創建新資料
-            result = IndividualService.create_individual(individual_data)
-            if result['success']:
-                result['action'] = 'created'
-            return result
\ No newline at end of file
+        Args:
+            db: 資料庫 session（用於判斷方言）
+            rows: 個人資料列表
+            now: 寫入 created_at/updated_at 的時間
+        """
+        values = [
+            dict({field: row[field] for field in INDIVIDUAL_BASIC_FIELDS}, created_at=now, updated_at=now)
+            for row in rows
+        ]
+        update_fields = [field for field in INDIVIDUAL_BASIC_FIELDS if field != 'national_id'] + ['updated_at']
+        
+        if db.get_bind().dialect.name in ('mysql', 'mariadb'):
+            statement = mysql_insert(Individual).values(values)
+            return statement.on_duplicate_key_update({field: statement.inserted[field] for field in update_fields})
+        
+        statement = sqlite_insert(Individual).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=[Individual.national_id],
+            set_={field: statement.excluded[field] for field in update_fields}
+        )
@@ -0,0 +1,179 @@
+"""
+密碼雜湊服務
+將 scrypt 雜湊/驗證移到專用且有上限的行程池執行，避免登入尖峰佔滿 FastAPI 的共用執行緒池；
+非同步路由以 hash_async/verify_async 等待結果，等待期間不佔用任何執行緒
+"""
+import asyncio
+import os
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """雜湊佇列已滿或等待逾時，呼叫端應回應 503"""
+
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash: str, password: str) -> bool:
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """有准入控制的密碼雜湊行程池
+
+    同時進行中的工作（執行中 + 排隊中）不超過 workers + queue_size，
+    超過時立即拋出 PasswordHasherBusy，而不是讓請求無限排隊。名額在工作實際結束時才釋放，
+    等待逾時的請求同樣拋出 PasswordHasherBusy，但其工作仍佔用名額直到行程池處理完畢。
+    workers 為 0 時在呼叫端執行緒內直接計算（腳本或單機測試用）。
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float = 10.0, method: str = 'scrypt:32768:8:1'):
+        self.workers = workers
+        self.method = method
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._method_prefix: Optional[str] = None
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn 避免在多執行緒的伺服器行程中 fork
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    logger.info(f"密碼雜湊行程池已啟動，workers={self.workers}")
+        return self._executor
+
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy('密碼雜湊佇列已滿，請稍後再試')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._reset_broken_pool()
+            raise
+        # 工作完成、失敗或取消時才釋放名額，逾時返回的請求不會讓行程池承接超過上限的工作
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _timed_out(self, future: Future) -> PasswordHasherBusy:
+        # 仍在排隊的工作直接取消；已在執行的工作會繼續佔用名額直到結束
+        future.cancel()
+        self.timeouts += 1
+        return PasswordHasherBusy('密碼雜湊逾時，請稍後再試')
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            if not self._slots.acquire(blocking=False):
+                self.rejected += 1
+                raise PasswordHasherBusy('密碼雜湊佇列已滿，請稍後再試')
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise self._timed_out(future) from None
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            raise
+
+    async def _run_async(self, fn, *args):
+        if self.workers <= 0:
+            return await asyncio.get_running_loop().run_in_executor(None, self._run, fn, *args)
+
+        future = self._submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(future) from None
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            raise
+
+    def _reset_broken_pool(self) -> None:
+        # 工作行程異常結束時重建行程池，下一個請求即可恢復
+        logger.error("密碼雜湊行程池已損毀，將重新建立")
+        self.shutdown()
+
+    def hash(self, password: str) -> str:
+        """以目前設定的參數產生密碼雜湊"""
+        return self._run(_hash, password, self.method)
+
+    async def hash_async(self, password: str) -> str:
+        """hash() 的非同步版本"""
+        return await self._run_async(_hash, password, self.method)
+
+    @property
+    def method_prefix(self) -> str:
+        """目前設定產生的雜湊前綴；werkzeug 會補齊省略的參數（例如 scrypt → scrypt:32768:8:1），以樣本雜湊取得"""
+        if self._method_prefix is None:
+            self._method_prefix = _hash('', self.method).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """雜湊參數與目前設定不同時返回 True（格式為 method$salt$hash）"""
+        return pwhash.split('$', 1)[0] != self.method_prefix
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """驗證密碼是否與雜湊相符"""
+        return self._run(_verify, pwhash, password)
+
+    async def verify_async(self, pwhash: str, password: str) -> bool:
+        """verify() 的非同步版本"""
+        return await self._run_async(_verify, pwhash, password)
+
+    def warm_up(self) -> None:
+        """預先啟動所有工作行程並計算雜湊前綴，避免第一批登入承擔啟動成本"""
+        self.method_prefix
+        if self.workers <= 0:
+            return
+        try:
+            executor = self._get_executor()
+            futures = [executor.submit(_verify, '', '') for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+        except Exception as e:
+            logger.warning(f"密碼雜湊行程池預熱失敗: {e}")
+
+    def shutdown(self) -> None:
+        """關閉行程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# 創建全局實例
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))),
+    queue_size=int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 32)),
+    timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', 10)),
+    method=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+)
+
+
+__all__ = ['PasswordHasher', 'PasswordHasherBusy', 'password_hasher']
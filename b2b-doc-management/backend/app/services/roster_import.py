@@ -0,0 +1,311 @@
+"""
+團體名冊匯入服務
+由 CSV/XLSX 名冊（可附圖片 ZIP）批次新增或更新個人資料：整份名冊以向量化方式驗證，
+通過驗證的資料列以多列 upsert 分批寫入，並回傳逐列的處理結果
+"""
+import io
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from ..models import Individual, INDIVIDUAL_IMAGE_FIELDS
+from ..utils.db import session_scope
+from ..utils.image_ingest import normalize_image
+from .individual_service import IndividualService, INDIVIDUAL_BASIC_FIELDS
+from .search_index import SearchIndexService
+
+logger = logging.getLogger(__name__)
+
+# 單次匯入的資料列上限
+ROSTER_IMPORT_MAX_ROWS = int(os.getenv('ROSTER_IMPORT_MAX_ROWS', 1000))
+# 每個 upsert 批次的資料列數
+ROSTER_IMPORT_BATCH_SIZE = int(os.getenv('ROSTER_IMPORT_BATCH_SIZE', 100))
+# ZIP 內單一圖片解壓後的大小上限（位元組）
+ROSTER_IMPORT_MAX_IMAGE_BYTES = int(os.getenv('ROSTER_IMPORT_MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+# 圖片正規化的執行緒數（Pillow 解碼/編碼時會釋放 GIL）
+ROSTER_IMPORT_IMAGE_WORKERS = int(os.getenv('ROSTER_IMPORT_IMAGE_WORKERS', 4))
+
+# 名冊欄位名稱（可使用英文欄位名稱或中文標題）
+ROSTER_COLUMN_ALIASES = {
+    'chinese_last_name': ('chinese_last_name', '中文姓'),
+    'chinese_first_name': ('chinese_first_name', '中文名'),
+    'english_last_name': ('english_last_name', '英文姓'),
+    'english_first_name': ('english_first_name', '英文名'),
+    'national_id': ('national_id', '身分證字號'),
+    'gender': ('gender', '性別'),
+    'id_card_front_image': ('id_card_front_image', 'front', '身分證正面'),
+    'id_card_back_image': ('id_card_back_image', 'back', '身分證背面'),
+    'passport_infomation_image': ('passport_infomation_image', 'passport', '護照'),
+}
+
+_GENDER_ALIASES = {'男': '男', '女': '女', 'M': '男', 'F': '女', 'MALE': '男', 'FEMALE': '女'}
+_NATIONAL_ID_PATTERN = r'^[A-Z][A-Z0-9]\d{8}$'
+_NAME_MAX_LENGTH = 100
+
+
+class RosterImportError(Exception):
+    """名冊或圖片檔無法讀取（呼叫端應回應 400）"""
+
+
+def read_roster(data: bytes, filename: str) -> pd.DataFrame:
+    """
+    讀取 CSV 或 XLSX 名冊，欄位名稱轉為個人資料欄位，所有值以字串讀入
+
+    Args:
+        data: 檔案內容
+        filename: 原始檔名（依副檔名判斷格式）
+
+    Returns:
+        名冊 DataFrame
+
+    Raises:
+        RosterImportError: 格式不支援、無法解析或缺少必填欄位
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    try:
+        if extension == '.csv':
+            df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        elif extension in ('.xlsx', '.xlsm'):
+            df = pd.read_excel(io.BytesIO(data), dtype=str, keep_default_na=False, engine='openpyxl')
+        else:
+            raise RosterImportError('名冊格式必須是 CSV 或 XLSX')
+    except RosterImportError:
+        raise
+    except Exception as e:
+        raise RosterImportError(f'無法讀取名冊: {e}')
+
+    aliases = {
+        alias.strip().lower(): field
+        for field, names in ROSTER_COLUMN_ALIASES.items() for alias in names
+    }
+    df = df.rename(columns=lambda column: aliases.get(str(column).strip().lower(), column))
+    missing = [field for field in INDIVIDUAL_BASIC_FIELDS if field not in df.columns]
+    if missing:
+        raise RosterImportError(f"名冊缺少必填欄位: {', '.join(missing)}")
+    if len(df) > ROSTER_IMPORT_MAX_ROWS:
+        raise RosterImportError(f'名冊資料列超過上限 {ROSTER_IMPORT_MAX_ROWS}')
+
+    columns = [field for field in ROSTER_COLUMN_ALIASES if field in df.columns]
+    # 名冊的第一列是標題，資料列號從 2 開始
+    df = df[columns].fillna('').astype(str).apply(lambda column: column.str.strip())
+    df.index = range(2, len(df) + 2)
+    return df
+
+
+def validate_roster(df: pd.DataFrame) -> Dict[int, List[str]]:
+    """
+    以向量化方式驗證整份名冊（必填、長度、身分證字號格式、性別、重複的身分證字號）
+
+    會就地正規化身分證字號（大寫）與性別（M/F 等轉為 男/女）。
+
+    Args:
+        df: read_roster() 的結果
+
+    Returns:
+        列號對應的錯誤訊息列表（沒有錯誤的資料列為空列表）
+    """
+    df['national_id'] = df['national_id'].str.upper()
+    df['gender'] = df['gender'].str.upper().map(_GENDER_ALIASES).fillna(df['gender'])
+
+    checks = {}
+    for field in INDIVIDUAL_BASIC_FIELDS:
+        checks[f'{field} 為必填'] = df[field] == ''
+    for field in ('chinese_last_name', 'chinese_first_name', 'english_last_name', 'english_first_name'):
+        checks[f'{field} 超過 {_NAME_MAX_LENGTH} 字'] = df[field].str.len() > _NAME_MAX_LENGTH
+    checks['national_id 格式錯誤'] = (df['national_id'] != '') & ~df['national_id'].str.match(_NATIONAL_ID_PATTERN)
+    checks['gender 必須是 男 或 女'] = (df['gender'] != '') & ~df['gender'].isin(('男', '女'))
+    checks['national_id 在名冊中重複'] = (df['national_id'] != '') & df['national_id'].duplicated(keep='first')
+
+    failed = pd.DataFrame(checks, index=df.index)
+    messages = {row_number: [] for row_number in df.index}
+    for row_number, row in failed[failed.any(axis=1)].iterrows():
+        messages[row_number] = [message for message, flag in row.items() if flag]
+    return messages
+
+
+class RosterImages:
+    """圖片 ZIP：依檔名（不分大小寫，可省略副檔名）取得圖片"""
+
+    def __init__(self, data: Optional[bytes]):
+        self._zip = None
+        self._entries: Dict[str, zipfile.ZipInfo] = {}
+        if not data:
+            return
+        try:
+            self._zip = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile as e:
+            raise RosterImportError(f'無法讀取圖片 ZIP: {e}')
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            name = os.path.basename(info.filename).lower()
+            if not name or name.startswith('.'):
+                continue
+            self._entries.setdefault(name, info)
+            self._entries.setdefault(os.path.splitext(name)[0], info)
+
+    def find(self, name: str) -> Optional[zipfile.ZipInfo]:
+        return self._entries.get(os.path.basename(name).strip().lower())
+
+    def read(self, info: zipfile.ZipInfo) -> bytes:
+        if info.file_size > ROSTER_IMPORT_MAX_IMAGE_BYTES:
+            raise ValueError(f'{info.filename} 超過 {ROSTER_IMPORT_MAX_IMAGE_BYTES} 位元組')
+        return self._zip.read(info)
+
+
+class RosterImportService:
+    """團體名冊匯入服務類"""
+
+    @staticmethod
+    def import_roster(roster_data: bytes, roster_filename: str, images_data: Optional[bytes] = None,
+                      db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        匯入團體名冊
+
+        圖片可在名冊的圖片欄位（front/back/passport）填入 ZIP 內的檔名；未填寫時依
+        「身分證字號_front」「身分證字號_back」「身分證字號_passport」的檔名自動對應。
+
+        Args:
+            roster_data: CSV/XLSX 名冊內容
+            roster_filename: 名冊檔名
+            images_data: 圖片 ZIP 內容（可選）
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
+
+        Returns:
+            匯入摘要與逐列結果
+        """
+        try:
+            df = read_roster(roster_data, roster_filename)
+            images = RosterImages(images_data)
+        except RosterImportError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+        errors = validate_roster(df)
+        image_files = RosterImportService._match_images(df, errors, images)
+        processed = RosterImportService._process_images(image_files, images, errors)
+
+        results: Dict[int, Dict[str, Any]] = {
+            row_number: {
+                'row': row_number,
+                'national_id': df.at[row_number, 'national_id'] or None,
+                'status': 'error' if errors[row_number] else 'pending',
+                'errors': errors[row_number]
+            } for row_number in df.index
+        }
+
+        valid_rows = [row_number for row_number in df.index if not errors[row_number]]
+        with session_scope(db) as db:
+            for start in range(0, len(valid_rows), ROSTER_IMPORT_BATCH_SIZE):
+                batch = valid_rows[start:start + ROSTER_IMPORT_BATCH_SIZE]
+                RosterImportService._import_batch(db, df, batch, processed, results)
+
+        rows = list(results.values())
+        summary = {'total': len(rows)}
+        for status in ('created', 'updated', 'error'):
+            summary[status] = sum(1 for row in rows if row['status'] == status)
+        return {
+            'success': True,
+            'summary': summary,
+            'rows': rows
+        }
+
+    @staticmethod
+    def _match_images(df: pd.DataFrame, errors: Dict[int, List[str]],
+                      images: RosterImages) -> Dict[Tuple[int, str], zipfile.ZipInfo]:
+        # 每列每種圖片對應到 ZIP 內的檔案
+        matched = {}
+        for image_type, field in INDIVIDUAL_IMAGE_FIELDS.items():
+            explicit = field in df.columns
+            for row_number in df.index:
+                if errors[row_number]:
+                    continue
+                name = df.at[row_number, field] if explicit else f"{df.at[row_number, 'national_id']}_{image_type}"
+                if not name:
+                    continue
+                info = images.find(name)
+                if info is not None:
+                    matched[(row_number, field)] = info
+                elif explicit:
+                    errors[row_number].append(f'找不到圖片檔 {name}')
+        return matched
+
+    @staticmethod
+    def _process_images(image_files: Dict[Tuple[int, str], zipfile.ZipInfo], images: RosterImages,
+                        errors: Dict[int, List[str]]) -> Dict[Tuple[int, str], Tuple[bytes, str]]:
+        # ZIP 讀取不是執行緒安全的，先依序解壓，再平行正規化
+        raw = {}
+        for key, info in image_files.items():
+            if errors[key[0]]:
+                continue
+            try:
+                raw[key] = images.read(info)
+            except Exception as e:
+                errors[key[0]].append(f'無法讀取圖片 {info.filename}: {e}')
+
+        if not raw:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, ROSTER_IMPORT_IMAGE_WORKERS)) as executor:
+            normalized = dict(zip(raw.keys(), executor.map(normalize_image, raw.values())))
+        return {key: value for key, value in normalized.items() if not errors[key[0]]}
+
+    @staticmethod
+    def _import_batch(db: Session, df: pd.DataFrame, batch: List[int],
+                      processed: Dict[Tuple[int, str], Tuple[bytes, str]], results: Dict[int, Dict[str, Any]]) -> None:
+        """以一條多列 upsert 寫入一批資料列，讀回 ID 後更新圖片；整批在同一個交易中提交"""
+        rows = [{field: df.at[row_number, field] for field in INDIVIDUAL_BASIC_FIELDS} for row_number in batch]
+        national_ids = [row['national_id'] for row in rows]
+        try:
+            # 寫入前讀取已存在的身分證字號，據此標示逐列結果為新增或更新；
+            # MariaDB 的唯一鍵不分大小寫，既有資料可能與名冊只差在大小寫，比對時一律轉為大寫
+            existing = {
+                national_id.upper() for (national_id,) in db.query(Individual.national_id).filter(
+                    Individual.national_id.in_(national_ids)
+                )
+            }
+            db.execute(IndividualService.upsert_statement(db, rows, datetime.utcnow()))
+            individuals = {
+                individual.national_id.upper(): individual
+                for individual in db.query(Individual).filter(
+                    Individual.national_id.in_(national_ids)
+                ).populate_existing()
+            }
+            outcomes = {}
+            for row_number, row in zip(batch, rows):
+                individual = individuals[row['national_id'].upper()]
+                for field in INDIVIDUAL_IMAGE_FIELDS.values():
+                    image = processed.get((row_number, field))
+                    if image is not None:
+                        IndividualService._store_image(db, individual, field, image)
+                outcomes[row_number] = {
+                    'status': 'updated' if row['national_id'].upper() in existing else 'created',
+                    'individual_id': individual.id
+                }
+            SearchIndexService.index_individuals(db, individuals.values())
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"名冊匯入批次失敗（第 {batch[0]}-{batch[-1]} 列）: {e}")
+            for row_number in batch:
+                results[row_number].update(status='error', errors=[f'資料庫錯誤: {e}'])
+            return
+        except OSError as e:
+            # blob store 寫入失敗（例如磁碟已滿）只影響本批次
+            db.rollback()
+            logger.warning(f"名冊匯入批次的圖片儲存失敗（第 {batch[0]}-{batch[-1]} 列）: {e}")
+            for row_number in batch:
+                results[row_number].update(status='error', errors=[f'圖片儲存失敗: {e}'])
+            return
+
+        for row_number, outcome in outcomes.items():
+            results[row_number].update(outcome)
+
+
+__all__ = ['RosterImportError', 'RosterImportService', 'read_roster', 'validate_roster']
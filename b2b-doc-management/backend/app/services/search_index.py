@@ -0,0 +1,300 @@
+"""
+申請案件與個人資料的搜尋索引
+以 n-gram 倒排索引（search_terms）支援客戶名稱、中英文姓名與身分證字號片段的搜尋：
+文字經 NFKC 正規化（全形轉半形）、轉小寫並去除空白與標點後，客戶名稱與姓名以 bigram 建立索引，中文不需斷詞；
+身分證字號的數字 bigram 只有 100 種、選擇性太低，改以 4-gram 建立索引。
+索引在申請案件與個人資料寫入的同一個交易中增量更新，查詢以主鍵範圍取得包含所有詞的文件，不需 LIKE '%…%' 掃描
+"""
+import logging
+import os
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, func, select, tuple_, union_all
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from ..models import Application, Individual, SearchTerm
+from ..utils.db import session_scope
+
+logger = logging.getLogger(__name__)
+
+# 欄位群組：客戶名稱（申請案件）、姓名與身分證字號（個人資料）
+APPLICATION_FIELD = 'application'
+INDIVIDUAL_FIELD = 'individual'
+NATIONAL_ID_FIELD = 'national_id'
+
+# 文字與身分證字號的 n-gram 長度
+TEXT_GRAM_SIZE = 2
+IDENTIFIER_GRAM_SIZE = 4
+# 每個索引詞先讀取的文件數，也是候選文件數的上限
+SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 2000))
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """NFKC 正規化、轉小寫並只保留文字與數字"""
+    if not value:
+        return ''
+    return ''.join(ch for ch in unicodedata.normalize('NFKC', value).casefold() if ch.isalnum())
+
+
+def ngrams(text: str, size: int) -> Set[str]:
+    """正規化文字的 n-gram；短於 n 的文字以整段作為一個詞"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def application_texts(application) -> Dict[str, List[str]]:
+    """申請案件可搜尋的正規化文字（依欄位群組）"""
+    return {APPLICATION_FIELD: [normalize_text(application.customer_name)]}
+
+
+def individual_texts(individual) -> Dict[str, List[str]]:
+    """個人資料可搜尋的正規化文字（依欄位群組）；中英文姓名各自連接姓與名，查詢可跨越姓名的邊界"""
+    return {
+        INDIVIDUAL_FIELD: [
+            normalize_text(f"{individual.chinese_last_name or ''}{individual.chinese_first_name or ''}"),
+            normalize_text(f"{individual.english_last_name or ''}{individual.english_first_name or ''}"),
+        ],
+        NATIONAL_ID_FIELD: [normalize_text(individual.national_id)],
+    }
+
+
+def document_terms(texts: Dict[str, List[str]]) -> Dict[str, Set[str]]:
+    """各欄位群組的索引詞"""
+    return {
+        field: set().union(*(
+            ngrams(text, IDENTIFIER_GRAM_SIZE if field == NATIONAL_ID_FIELD else TEXT_GRAM_SIZE)
+            for text in values
+        ))
+        for field, values in texts.items()
+    }
+
+
+def matches(words: List[str], texts: Dict[str, List[str]]) -> bool:
+    """任一欄位群組包含所有查詢字詞時視為符合（排除 n-gram 分散出現的誤判）"""
+    return any(
+        all(any(word in text for text in values) for word in words)
+        for values in texts.values()
+    )
+
+
+class SearchIndexService:
+    """搜尋索引服務類"""
+
+    @staticmethod
+    def index_applications(db: Session, applications: Iterable[Application]) -> None:
+        """在呼叫端的交易中更新申請案件的索引詞（申請案件需已有 ID）"""
+        SearchIndexService._sync(db, {
+            (field, application.id): terms
+            for application in applications
+            for field, terms in document_terms(application_texts(application)).items()
+        })
+
+    @staticmethod
+    def index_individuals(db: Session, individuals: Iterable[Individual]) -> None:
+        """在呼叫端的交易中更新個人資料的索引詞（個人資料需已有 ID）"""
+        SearchIndexService._sync(db, {
+            (field, individual.id): terms
+            for individual in individuals
+            for field, terms in document_terms(individual_texts(individual)).items()
+        })
+
+    @staticmethod
+    def remove_applications(db: Session, application_ids: List[int]) -> None:
+        """在呼叫端的交易中移除申請案件的索引詞"""
+        if application_ids:
+            db.execute(delete(SearchTerm).where(
+                SearchTerm.field == APPLICATION_FIELD, SearchTerm.doc_id.in_(application_ids)
+            ))
+
+    @staticmethod
+    def _sync(db: Session, documents: Dict[Tuple[str, int], Set[str]]) -> None:
+        """
+        將文件的索引詞更新為指定內容，只刪除與新增有差異的詞（內容未變時只有一次讀取）
+
+        Args:
+            db: 資料庫 session
+            documents: (欄位群組, 文件 ID) → 索引詞
+        """
+        if not documents:
+            return
+
+        existing = defaultdict(set)
+        for row in db.execute(select(SearchTerm.field, SearchTerm.doc_id, SearchTerm.term).where(
+            SearchTerm.field.in_({field for field, _ in documents}),
+            SearchTerm.doc_id.in_({doc_id for _, doc_id in documents})
+        )):
+            existing[(row.field, row.doc_id)].add(row.term)
+
+        stale = [
+            (field, doc_id, term)
+            for (field, doc_id), terms in existing.items() if (field, doc_id) in documents
+            for term in terms - documents[(field, doc_id)]
+        ]
+        fresh = [
+            {'field': field, 'term': term, 'doc_id': doc_id}
+            for (field, doc_id), terms in documents.items()
+            for term in terms - existing[(field, doc_id)]
+        ]
+
+        if stale:
+            db.execute(delete(SearchTerm).where(
+                tuple_(SearchTerm.field, SearchTerm.doc_id, SearchTerm.term).in_(stale)
+            ))
+        if fresh:
+            # 同時更新同一文件的請求可能已寫入相同的詞，重複時略過
+            if db.get_bind().dialect.name in ('mysql', 'mariadb'):
+                statement = mysql_insert(SearchTerm).values(fresh)
+                statement = statement.on_duplicate_key_update(doc_id=statement.inserted.doc_id)
+            else:
+                statement = sqlite_insert(SearchTerm).values(fresh).on_conflict_do_nothing()
+            db.execute(statement)
+
+    @staticmethod
+    def find(db: Session, query: str) -> Dict[str, Any]:
+        """
+        以索引找出符合的申請案件與個人資料
+
+        所有查詢字詞需出現在同一個欄位群組；候選文件會再以原始文字確認。
+
+        Args:
+            db: 資料庫 session
+            query: 搜尋字串（以空白分隔多個字詞）
+
+        Returns:
+            application_ids、individual_ids 與 truncated（結果是否可能不完整）
+
+        Raises:
+            ValueError: 搜尋字串過短
+        """
+        words = [word for word in (normalize_text(part) for part in query.split()) if word]
+        text_terms = set().union(*(ngrams(word, TEXT_GRAM_SIZE) for word in words if len(word) >= TEXT_GRAM_SIZE))
+        if not text_terms:
+            raise ValueError(f'搜尋字串至少需要 {TEXT_GRAM_SIZE} 個字元')
+
+        lookups = {APPLICATION_FIELD: text_terms, INDIVIDUAL_FIELD: text_terms}
+        if len(words) == 1 and len(words[0]) >= IDENTIFIER_GRAM_SIZE:
+            # 身分證字號片段
+            lookups[NATIONAL_ID_FIELD] = ngrams(words[0], IDENTIFIER_GRAM_SIZE)
+        candidates, truncated = SearchIndexService._candidates(db, lookups)
+        application_ids = candidates[APPLICATION_FIELD]
+        individual_ids = candidates[INDIVIDUAL_FIELD] | candidates.get(NATIONAL_ID_FIELD, set())
+
+        # 以原始文字確認，排除略過的常見詞與 n-gram 分散出現的誤判
+        if application_ids:
+            application_ids = {
+                row.id for row in db.execute(
+                    select(Application.id, Application.customer_name).where(Application.id.in_(application_ids))
+                ) if matches(words, application_texts(row))
+            }
+        if individual_ids:
+            individual_ids = {
+                row.id for row in db.execute(select(
+                    Individual.id, Individual.chinese_last_name, Individual.chinese_first_name,
+                    Individual.english_last_name, Individual.english_first_name, Individual.national_id
+                ).where(Individual.id.in_(individual_ids))) if matches(words, individual_texts(row))
+            }
+
+        return {
+            'application_ids': application_ids,
+            'individual_ids': individual_ids,
+            'truncated': truncated
+        }
+
+    @staticmethod
+    def _candidates(db: Session, lookups: Dict[str, Set[str]]) -> Tuple[Dict[str, Set[int]], bool]:
+        """
+        各欄位群組中包含所有索引詞的候選文件 ID
+
+        先以一條 UNION ALL 語句讀取每個詞最新的 SEARCH_MAX_CANDIDATES 筆（主鍵範圍讀取，成本不隨資料量增加），
+        完整讀到的詞直接取交集，超過上限的常見詞（例如「公司」）略過並交由原始文字確認；
+        所有詞都很常見時才在資料庫中對完整的詞列表取交集。
+
+        Args:
+            db: 資料庫 session
+            lookups: 欄位群組 → 索引詞
+
+        Returns:
+            (欄位群組 → 候選文件 ID, 候選數是否達上限)
+        """
+        probes = [
+            select(SearchTerm.field, SearchTerm.term, SearchTerm.doc_id)
+            .where(SearchTerm.field == field, SearchTerm.term == term)
+            .order_by(SearchTerm.doc_id.desc())
+            .limit(SEARCH_MAX_CANDIDATES + 1)
+            .subquery().select()
+            for field, terms in lookups.items() for term in sorted(terms)
+        ]
+        postings = defaultdict(set)
+        for row in db.execute(union_all(*probes) if len(probes) > 1 else probes[0]):
+            postings[(row.field, row.term)].add(row.doc_id)
+
+        candidates = {}
+        truncated = False
+        for field, terms in lookups.items():
+            lists = [postings[(field, term)] for term in terms]
+            complete = [doc_ids for doc_ids in lists if len(doc_ids) <= SEARCH_MAX_CANDIDATES]
+            if complete:
+                candidates[field] = set.intersection(*complete)
+                continue
+            candidates[field] = {row.doc_id for row in db.execute(
+                select(SearchTerm.doc_id)
+                .where(SearchTerm.field == field, SearchTerm.term.in_(terms))
+                .group_by(SearchTerm.doc_id)
+                .having(func.count() == len(terms))
+                .limit(SEARCH_MAX_CANDIDATES)
+            )}
+            truncated = truncated or len(candidates[field]) >= SEARCH_MAX_CANDIDATES
+        return candidates, truncated
+
+    @staticmethod
+    def rebuild(db: Optional[Session] = None, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        依現有資料重建索引：逐批更新所有文件的索引詞，並移除已不存在之文件的詞
+
+        Args:
+            db: 資料庫 session（可選，未提供時自行建立）
+            batch_size: 每批文件數（每批各自提交）
+
+        Returns:
+            各類文件的處理筆數
+        """
+        sources = [
+            ('applications', select(Application.id, Application.customer_name), Application.id,
+             SearchIndexService.index_applications),
+            ('individuals', select(
+                Individual.id, Individual.chinese_last_name, Individual.chinese_first_name,
+                Individual.english_last_name, Individual.english_first_name, Individual.national_id
+            ), Individual.id, SearchIndexService.index_individuals),
+        ]
+        counts = {}
+        with session_scope(db) as db:
+            for name, statement, id_column, index in sources:
+                counts[name] = 0
+                last_id = 0
+                while True:
+                    rows = db.execute(statement.where(id_column > last_id).order_by(id_column).limit(batch_size)).all()
+                    if not rows:
+                        break
+                    index(db, rows)
+                    db.commit()
+                    counts[name] += len(rows)
+                    last_id = rows[-1].id
+
+            for fields, id_column in (((APPLICATION_FIELD,), Application.id),
+                                      ((INDIVIDUAL_FIELD, NATIONAL_ID_FIELD), Individual.id)):
+                db.execute(delete(SearchTerm).where(
+                    SearchTerm.field.in_(fields), SearchTerm.doc_id.notin_(select(id_column))
+                ).execution_options(synchronize_session=False))
+            db.commit()
+
+        logger.info(f"搜尋索引已重建: {counts}")
+        return counts
+
+
+__all__ = [
+    'APPLICATION_FIELD', 'INDIVIDUAL_FIELD', 'NATIONAL_ID_FIELD', 'SEARCH_MAX_CANDIDATES', 'SearchIndexService',
+    'application_texts', 'individual_texts', 'matches', 'normalize_text'
+]
@@ -0,0 +1,395 @@
+"""
+圖片縮圖服務
+以 Pillow 在專用行程池產生縮小的 WebP/JPEG 衍生圖，結果依 (摘要, 寬度, 格式, 品質) 存入
+有容量上限的記憶體 + 磁碟 LRU 快取；原圖內容不變時衍生圖也不變，快取不需失效處理
+"""
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 支援的輸出格式與對應的 MIME 類型
+THUMBNAIL_FORMATS = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+_FORMAT_ALIASES = {'jpg': 'jpeg'}
+
+
+class ThumbnailerBusy(Exception):
+    """縮圖佇列已滿或等待逾時，呼叫端應回應 503"""
+
+
+class ThumbnailUnsupported(Exception):
+    """原圖無法解碼（例如原樣保存的 PDF 或超過像素上限的圖片），無法產生縮圖"""
+
+
+def _render(data: bytes, width: Optional[int], fmt: str, quality: int) -> bytes:
+    """在工作行程中產生衍生圖：套用 EXIF 方向、等比縮小（不放大）並重新編碼"""
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (Image.DecompressionBombError, OSError) as e:
+        # UnidentifiedImageError 與截斷的圖片都是 OSError
+        raise ThumbnailUnsupported(f'原圖無法產生縮圖: {e}') from None
+
+    with image:
+        image = ImageOps.exif_transpose(image)
+        if width and image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        if fmt == 'jpeg':
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+        output = io.BytesIO()
+        image.save(output, format=fmt.upper(), quality=quality, optimize=fmt == 'jpeg')
+        return output.getvalue()
+
+
+class DerivativeCache:
+    """衍生圖的兩層 LRU 快取
+
+    記憶體層保存最近使用的內容，磁碟層保存更多內容；兩層各自以總位元組數為上限，
+    超過時淘汰最久未使用的項目。磁碟目錄不可寫入時只使用記憶體層。
+    """
+
+    def __init__(self, memory_bytes: int, disk_path: Optional[str], disk_bytes: int):
+        self.memory_bytes = memory_bytes
+        self.disk_path = disk_path if disk_bytes > 0 else None
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._disk: Optional["OrderedDict[str, int]"] = None
+        self._disk_size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.disk_path, key[:2], key)
+
+    def _load_disk_index(self) -> None:
+        # 重新啟動後由既有檔案重建索引，依最後存取時間排序
+        entries = []
+        if os.path.isdir(self.disk_path):
+            for directory, _, files in os.walk(self.disk_path):
+                for name in files:
+                    if name.startswith('.tmp-'):
+                        continue
+                    stat = os.stat(os.path.join(directory, name))
+                    entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+        self._disk = OrderedDict((name, size) for _, name, size in entries)
+        self._disk_size = sum(size for _, _, size in entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        讀取衍生圖
+
+        Args:
+            key: 快取鍵（衍生圖名稱）
+
+        Returns:
+            內容或 None
+        """
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+            if self.disk_path is None:
+                self.misses += 1
+                return None
+            if self._disk is None:
+                self._load_disk_index()
+            on_disk = key in self._disk
+            if on_disk:
+                self._disk.move_to_end(key)
+
+        if on_disk:
+            path = self._file(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # 以修改時間記錄最後存取，重新啟動後維持 LRU 順序
+                os.utime(path)
+            except OSError:
+                # 檔案已被外部清除，移出索引
+                with self._lock:
+                    self._disk_size -= self._disk.pop(key, 0)
+                data = None
+            if data is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        寫入衍生圖（記憶體與磁碟）
+
+        Args:
+            key: 快取鍵（衍生圖名稱）
+            data: 內容
+        """
+        with self._lock:
+            self._remember(key, data)
+        if self.disk_path is not None:
+            try:
+                self._write_disk(key, data)
+            except OSError as e:
+                logger.warning(f"寫入縮圖磁碟快取失敗，改為只使用記憶體: {e}")
+                self.disk_path = None
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.evictions += 1
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        evicted: List[str] = []
+        with self._lock:
+            if self._disk is None:
+                self._load_disk_index()
+            self._disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._disk_size += len(data)
+            while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+                name, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                self.evictions += 1
+                evicted.append(name)
+        for name in evicted:
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """快取統計"""
+        with self._lock:
+            return {
+                'memory_items': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_items': len(self._disk) if self._disk is not None else 0,
+                'disk_bytes': self._disk_size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class Thumbnailer:
+    """有准入控制的縮圖行程池
+
+    與 PasswordHasher 相同：進行中的工作超過 workers + queue_size 時拋出 ThumbnailerBusy，
+    名額在工作實際結束時才釋放，等待逾時同樣拋出 ThumbnailerBusy；
+    workers 為 0 時在呼叫端執行緒內直接產生。同一衍生圖同時被多個請求要求時只產生一次。
+    """
+
+    def __init__(self, workers: int, queue_size: int, widths: List[int], quality: int,
+                 cache: DerivativeCache, timeout: float = 15.0):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.widths = sorted(widths)
+        self.quality = quality
+        self.cache = cache
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.rejected = 0
+        self.timeouts = 0
+
+    def normalize(self, width: Optional[int], fmt: Optional[str]) -> Tuple[Optional[int], str]:
+        """
+        將請求的寬度對齊到允許的寬度（避免任意寬度塞爆快取），並正規化格式名稱
+
+        Args:
+            width: 請求的寬度（None 表示維持原尺寸）
+            fmt: 請求的格式（None 時為 webp）
+
+        Returns:
+            (寬度, 格式)
+
+        Raises:
+            ValueError: 不支援的寬度或格式
+        """
+        fmt = (fmt or 'webp').lower()
+        fmt = _FORMAT_ALIASES.get(fmt, fmt)
+        if fmt not in THUMBNAIL_FORMATS:
+            raise ValueError(f"不支援的圖片格式: {fmt}")
+        if width is None:
+            return None, fmt
+        if width <= 0:
+            raise ValueError('圖片寬度必須大於 0')
+        for allowed in self.widths:
+            if allowed >= width:
+                return allowed, fmt
+        return self.widths[-1], fmt
+
+    def variant_key(self, digest: str, width: Optional[int], fmt: str) -> str:
+        """衍生圖名稱，同時作為快取鍵與 ETag"""
+        return f"{digest}-w{width or 0}-q{self.quality}.{fmt}"
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn 避免在多執行緒的伺服器行程中 fork
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    logger.info(f"縮圖行程池已啟動，workers={self.workers}")
+        return self._executor
+
+    def _render(self, data: bytes, width: Optional[int], fmt: str) -> bytes:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise ThumbnailerBusy('縮圖佇列已滿，請稍後再試')
+        if self.workers <= 0:
+            try:
+                return _render(data, width, fmt, self.quality)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(_render, data, width, fmt, self.quality)
+        except BaseException as e:
+            self._slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._reset_broken_pool()
+            raise
+        # 工作完成、失敗或取消時才釋放名額，逾時返回的請求不會讓行程池承接超過上限的工作
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # 仍在排隊的工作直接取消；已在執行的工作會繼續佔用名額直到結束
+            future.cancel()
+            self.timeouts += 1
+            raise ThumbnailerBusy('產生縮圖逾時，請稍後再試') from None
+        except BrokenProcessPool:
+            self._reset_broken_pool()
+            raise
+
+    def _reset_broken_pool(self) -> None:
+        # 工作行程異常結束（例如惡意圖片耗盡記憶體）時重建行程池
+        logger.error("縮圖行程池已損毀，將重新建立")
+        self.shutdown()
+
+    def get(self, digest: str, width: Optional[int], fmt: str, load_source: Callable[[], bytes]) -> bytes:
+        """
+        取得衍生圖，快取未命中時由原圖產生
+
+        Args:
+            digest: 原圖摘要
+            width: 已正規化的寬度
+            fmt: 已正規化的格式
+            load_source: 讀取原圖內容的函式（只在未命中時呼叫）
+
+        Returns:
+            衍生圖內容
+
+        Raises:
+            ThumbnailerBusy: 佇列已滿或等待逾時
+            ThumbnailUnsupported: 原圖無法解碼
+        """
+        key = self.variant_key(digest, width, fmt)
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if not owner:
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                self.timeouts += 1
+                raise ThumbnailerBusy('產生縮圖逾時，請稍後再試') from None
+
+        try:
+            data = self._render(load_source(), width, fmt)
+            self.cache.put(key, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def shutdown(self) -> None:
+        """關閉行程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# 創建全局實例
+thumbnailer = Thumbnailer(
+    workers=int(os.getenv('THUMBNAIL_WORKERS', min(2, os.cpu_count() or 1))),
+    queue_size=int(os.getenv('THUMBNAIL_QUEUE_SIZE', 16)),
+    widths=[int(w) for w in os.getenv('THUMBNAIL_WIDTHS', '160,320,640,1280').split(',') if w.strip()],
+    quality=int(os.getenv('THUMBNAIL_QUALITY', 80)),
+    timeout=float(os.getenv('THUMBNAIL_TIMEOUT', 15)),
+    cache=DerivativeCache(
+        memory_bytes=int(float(os.getenv('THUMBNAIL_MEMORY_CACHE_MB', 32)) * 1024 * 1024),
+        disk_path=os.getenv('THUMBNAIL_CACHE_PATH', '/var/lib/b2b/thumbnails'),
+        disk_bytes=int(float(os.getenv('THUMBNAIL_DISK_CACHE_MB', 512)) * 1024 * 1024)
+    )
+)
+
+
+__all__ = ['DerivativeCache', 'THUMBNAIL_FORMATS', 'ThumbnailUnsupported', 'Thumbnailer', 'ThumbnailerBusy', 'thumbnailer']
@@ -0,0 +1,144 @@
+"""
+Token 撤銷服務
+以 jti 為鍵記錄已登出的 token，記憶體查詢為 O(1)，前置 Bloom filter 讓「未撤銷」的常見情況只需幾次雜湊探測；
+撤銷紀錄寫入資料庫，重啟或多個工作行程之間透過定期同步保持一致
+"""
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy.orm import Session
+from app.models import RevokedToken
+from app.utils.bloom import BloomFilter
+from app.utils.db import session_scope
+
+logger = logging.getLogger(__name__)
+
+# 同步時向前重疊讀取的秒數：revoked_at 在 flush 時由應用程式填入，較早 flush、較晚提交的紀錄
+# （或其他主機時鐘較慢時寫入的紀錄）可能小於已同步的最大值；重複讀取的紀錄不影響結果
+REVOCATION_SYNC_OVERLAP = float(os.getenv('TOKEN_REVOCATION_SYNC_OVERLAP', 60))
+
+
+class TokenRevocationStore:
+    """已撤銷 token 的記憶體索引（jti → 過期時間 unix timestamp）"""
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self._entries: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity=capacity, error_rate=error_rate)
+        self._lock = threading.Lock()
+        self._watermark: Optional[datetime] = None
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        """
+        檢查 jti 是否已撤銷
+
+        Args:
+            jti: token 唯一識別碼
+
+        Returns:
+            已撤銷且尚未過期時返回 True
+        """
+        if not jti or jti not in self._bloom:
+            return False
+        expires_at = self._entries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def _remember(self, jti: str, expires_at: float) -> None:
+        with self._lock:
+            if jti not in self._entries:
+                self._bloom.add(jti)
+            self._entries[jti] = expires_at
+
+    def revoke(self, jti: str, expires_at: float, user_id: Optional[int] = None, db: Optional[Session] = None) -> None:
+        """
+        撤銷 token 並寫入資料庫
+
+        Args:
+            jti: token 唯一識別碼
+            expires_at: token 過期時間（unix timestamp）
+            user_id: token 所屬用戶
+            db: 請求範圍的資料庫 session（可選，未提供時自行建立）
+        """
+        self._remember(jti, expires_at)
+        with session_scope(db) as db:
+            try:
+                db.merge(RevokedToken(
+                    jti=jti,
+                    user_id=user_id,
+                    expires_at=datetime.utcfromtimestamp(expires_at)
+                ))
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"寫入撤銷紀錄失敗: {e}")
+
+    def sync(self, db: Optional[Session] = None) -> int:
+        """
+        從資料庫載入其他工作行程新增的撤銷紀錄（首次呼叫時載入全部未過期紀錄）
+
+        之後的同步讀取 revoked_at 不早於「已載入的最大值 − REVOCATION_SYNC_OVERLAP」的紀錄，
+        避免遺漏在已同步紀錄之後才提交的撤銷。
+
+        Returns:
+            新載入的紀錄數量
+        """
+        with session_scope(db) as db:
+            query = db.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at).filter(
+                RevokedToken.expires_at > datetime.utcnow()
+            )
+            if self._watermark is not None:
+                query = query.filter(
+                    RevokedToken.revoked_at >= self._watermark - timedelta(seconds=REVOCATION_SYNC_OVERLAP)
+                )
+
+            loaded = 0
+            for jti, expires_at, revoked_at in query.all():
+                if jti not in self._entries:
+                    loaded += 1
+                self._remember(jti, (expires_at - datetime(1970, 1, 1)).total_seconds())
+                if revoked_at and (self._watermark is None or revoked_at > self._watermark):
+                    self._watermark = revoked_at
+            return loaded
+
+    def purge_expired(self, db: Optional[Session] = None) -> int:
+        """
+        移除已過期的撤銷紀錄（記憶體與資料庫），並重建 Bloom filter
+
+        Returns:
+            移除的記憶體紀錄數量
+        """
+        now = time.time()
+        with self._lock:
+            expired = [jti for jti, expires_at in self._entries.items() if expires_at <= now]
+            for jti in expired:
+                del self._entries[jti]
+            if expired:
+                self._bloom.rebuild(self._entries.keys())
+
+        with session_scope(db) as db:
+            try:
+                db.query(RevokedToken).filter(RevokedToken.expires_at <= datetime.utcnow()).delete(
+                    synchronize_session=False
+                )
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"清除過期撤銷紀錄失敗: {e}")
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 創建全局實例
+revocation_store = TokenRevocationStore(
+    capacity=int(os.getenv('TOKEN_REVOCATION_CAPACITY', 100000))
+)
+
+# 背景同步間隔（秒）
+REVOCATION_SYNC_INTERVAL = float(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', 5))
+
+
+__all__ = ['TokenRevocationStore', 'revocation_store', 'REVOCATION_SYNC_INTERVAL', 'REVOCATION_SYNC_OVERLAP']
@@ -0,0 +1,119 @@
+"""
+非同步資料庫存取
+以 SQLAlchemy asyncio（AsyncEngine / AsyncSession）提供 v2 API 的非同步資料存取路徑；
+MariaDB 使用 aiomysql，本機開發以 aiosqlite 代替
+"""
+import os
+import logging
+from typing import AsyncIterator, Optional
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from .query_stats import instrument_engine
+from .db import DATABASE_URL, DATABASE_REPLICA_URL, POOL_SETTINGS, get_engine, get_replica_engine, wrote_recently
+
+logger = logging.getLogger(__name__)
+
+# 未設定 ASYNC_DATABASE_URL 時由 DATABASE_URL 推導
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+# 未設定 ASYNC_DATABASE_REPLICA_URL 時由 DATABASE_REPLICA_URL 推導
+ASYNC_DATABASE_REPLICA_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL")
+
+_async_engine = None
+_async_replica_engine = None
+_async_session_factory = sessionmaker(class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+def to_async_url(database_url: str) -> str:
+    """
+    將同步連線字串轉換為非同步 driver
+
+    Args:
+        database_url: 同步 DATABASE_URL（mariadb://、mysql://、sqlite://）
+
+    Returns:
+        對應的非同步連線字串
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        return str(url.set(drivername='sqlite+aiosqlite'))
+    if backend in ('mysql', 'mariadb'):
+        return str(url.set(drivername=f'{backend}+aiomysql'))
+    return database_url
+
+
+def _create_async_engine(url: str, explain_bind):
+    if url.startswith("sqlite"):
+        engine = create_async_engine(url)
+    else:
+        engine = create_async_engine(url, **POOL_SETTINGS)
+    instrument_engine(engine.sync_engine, explain_bind)
+    logger.info(f"非同步資料庫引擎已建立: {make_url(url).drivername}")
+    return engine
+
+
+def get_async_engine():
+    """取得全域唯一的 AsyncEngine，首次呼叫時才建立"""
+    global _async_engine
+    if _async_engine is None:
+        url = ASYNC_DATABASE_URL or (DATABASE_URL and to_async_url(DATABASE_URL))
+        if not url:
+            raise RuntimeError("DATABASE_URL 未設定")
+
+        _async_engine = _create_async_engine(url, get_engine)
+        _async_session_factory.configure(bind=_async_engine)
+    return _async_engine
+
+
+def get_async_replica_engine():
+    """取得讀取副本的 AsyncEngine；未設定讀取副本時回傳主庫 AsyncEngine"""
+    global _async_replica_engine
+    url = ASYNC_DATABASE_REPLICA_URL or (DATABASE_REPLICA_URL and to_async_url(DATABASE_REPLICA_URL))
+    if not url:
+        return get_async_engine()
+    if _async_replica_engine is None:
+        _async_replica_engine = _create_async_engine(url, get_replica_engine)
+    return _async_replica_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """建立新的 AsyncSession（首次呼叫時才建立 engine）"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+def AsyncReadSessionLocal(user_id: Optional[int] = None) -> AsyncSession:
+    """
+    建立讀取專用的 AsyncSession
+
+    Args:
+        user_id: 發出請求的用戶 ID；該用戶仍在 read-your-writes 視窗內時改用主庫
+
+    Returns:
+        綁定讀取副本（或主庫）的 AsyncSession
+    """
+    get_async_engine()
+    if user_id is not None and wrote_recently(user_id):
+        return _async_session_factory()
+    return _async_session_factory(bind=get_async_replica_engine())
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """請求範圍的 AsyncSession（FastAPI 依賴）"""
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def dispose_async_engine() -> None:
+    """關閉非同步引擎的所有連線"""
+    global _async_engine, _async_replica_engine
+    if _async_replica_engine is not None:
+        await _async_replica_engine.dispose()
+        _async_replica_engine = None
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -0,0 +1,251 @@
+"""
+內容定址的 blob store
+以 SHA-256 摘要為鍵儲存檔案內容，相同內容只存一份；blobs 資料表記錄大小、MIME 類型與引用數，
+引用數歸零的內容以及交易回滾後沒有對應資料列的檔案由 collect_garbage() 清除
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, List, Optional
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import Blob
+from .db import session_scope
+
+logger = logging.getLogger(__name__)
+
+# 本機檔案系統後端的根目錄（容器中應掛載為持久化 volume）
+BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', '/var/lib/b2b/blobs')
+# blob 建立後至少保留的時間，引用數歸零且超過此時間才會被清除
+BLOB_GC_GRACE_SECONDS = int(os.getenv('BLOB_GC_GRACE_SECONDS', 3600))
+# 背景清除未引用 blob 的間隔（秒）
+BLOB_GC_INTERVAL = int(os.getenv('BLOB_GC_INTERVAL', 3600))
+
+# 常見圖片與文件的檔頭
+_MAGIC_NUMBERS = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+]
+
+
+def sniff_mime_type(data: bytes) -> str:
+    """
+    由檔頭判斷 MIME 類型
+
+    Args:
+        data: 檔案內容
+
+    Returns:
+        MIME 類型，無法判斷時為 application/octet-stream
+    """
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mime_type in _MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return mime_type
+    return 'application/octet-stream'
+
+
+def compute_digest(data: bytes) -> str:
+    """計算內容的 SHA-256 摘要（十六進位）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalFileBackend:
+    """本機檔案系統後端：內容存放於 root/ab/cd/<digest>"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, digest: str, data: bytes) -> None:
+        """寫入內容；已存在時只更新修改時間（內容定址，相同摘要即相同內容）"""
+        path = self.path(digest)
+        try:
+            # 重用的檔案視為剛寫入，清除孤立檔案時不會刪除尚未提交的交易正在引用的內容
+            os.utime(path)
+            return
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先寫入暫存檔再改名，讀取端不會看到寫到一半的檔案
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path(digest), 'rb')
+
+    def modified_before(self, digest: str, cutoff: float) -> bool:
+        try:
+            return os.stat(self.path(digest)).st_mtime < cutoff
+        except FileNotFoundError:
+            return False
+
+    def list_digests(self, modified_before: float) -> Iterator[str]:
+        """列出修改時間早於 modified_before（unix timestamp）的內容摘要"""
+        if not os.path.isdir(self.root):
+            return
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.startswith('.tmp-'):
+                    continue
+                if self.modified_before(name, modified_before):
+                    yield name
+
+    def delete(self, digest: str) -> None:
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+
+class BlobStore:
+    """內容定址儲存：內容寫入後端，引用數記錄在呼叫端的資料庫交易中"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def put(self, db: Session, data: bytes, mime_type: Optional[str] = None) -> Blob:
+        """
+        儲存內容並增加引用數（與呼叫端的變更在同一個交易中提交）
+
+        Args:
+            db: 資料庫 session
+            data: 檔案內容
+            mime_type: MIME 類型（未提供時由檔頭判斷）
+
+        Returns:
+            對應的 Blob（digest、size、mime_type）
+        """
+        digest = compute_digest(data)
+
+        # 先取得引用再寫入內容：與 collect_garbage() 同時執行時，引用數的 UPDATE 會等待清除交易結束，
+        # 之後寫入的內容不會被刪除；交易回滾時只會留下可重用的檔案
+        blob = None
+        for _ in range(2):
+            if self._increment(db, digest, 1):
+                blob = db.get(Blob, digest)
+                break
+            candidate = Blob(digest=digest, size=len(data), mime_type=mime_type or sniff_mime_type(data), refcount=1)
+            try:
+                with db.begin_nested():
+                    db.add(candidate)
+                blob = candidate
+                break
+            except IntegrityError:
+                # 其他請求同時新增了相同內容，改為增加引用數
+                continue
+        if blob is None:
+            raise RuntimeError(f"無法記錄 blob 引用: {digest}")
+
+        self.backend.put(digest, data)
+        return blob
+
+    def release(self, db: Session, digest: Optional[str]) -> None:
+        """
+        減少引用數；內容在 collect_garbage() 時才刪除
+
+        Args:
+            db: 資料庫 session
+            digest: 內容摘要（None 時不處理）
+        """
+        if digest:
+            self._increment(db, digest, -1)
+
+    def _increment(self, db: Session, digest: str, delta: int) -> bool:
+        # 以單一 UPDATE 調整引用數，併發請求不會互相覆蓋
+        result = db.execute(
+            update(Blob)
+            .where(Blob.digest == digest)
+            .values(refcount=Blob.refcount + delta)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    def open(self, digest: str) -> BinaryIO:
+        """開啟內容供串流讀取"""
+        return self.backend.open(digest)
+
+    def read(self, digest: str) -> bytes:
+        """讀取完整內容"""
+        with self.backend.open(digest) as f:
+            return f.read()
+
+    def collect_garbage(self, db: Optional[Session] = None, grace_seconds: int = BLOB_GC_GRACE_SECONDS,
+                        batch_size: int = 500) -> List[str]:
+        """
+        刪除引用數歸零且超過保留時間的內容，以及超過保留時間仍沒有對應資料列的檔案
+        （內容在交易提交前寫入，新增資料列的交易回滾時會留下這類檔案）
+
+        Args:
+            db: 資料庫 session（可選，未提供時自行建立）
+            grace_seconds: 建立後至少保留的秒數
+            batch_size: 每次處理的筆數
+
+        Returns:
+            已刪除的摘要列表
+        """
+        with session_scope(db) as db:
+            cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+            digests = [row.digest for row in db.query(Blob.digest).filter(
+                Blob.refcount <= 0, Blob.created_at < cutoff
+            ).limit(batch_size)]
+            db.rollback()
+
+            deleted = []
+            for digest in digests:
+                # 鎖定仍為零引用的資料列後才刪除檔案；同時增加引用的請求會等待此交易結束後重新建立
+                blob = db.query(Blob).filter(Blob.digest == digest, Blob.refcount <= 0).with_for_update().first()
+                if blob is None:
+                    db.rollback()
+                    continue
+                self.backend.delete(digest)
+                db.delete(blob)
+                db.commit()
+                deleted.append(digest)
+
+            orphans = self._collect_orphan_files(db, cutoff, batch_size)
+            if deleted or orphans:
+                logger.info(f"已清除 {len(deleted)} 個未引用的 blob、{len(orphans)} 個沒有資料列的檔案")
+            return deleted + orphans
+
+    def _collect_orphan_files(self, db: Session, cutoff: datetime, batch_size: int) -> List[str]:
+        cutoff_timestamp = (cutoff - datetime(1970, 1, 1)).total_seconds()
+        deleted = []
+        candidates = list(self.backend.list_digests(cutoff_timestamp))
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            known = {row.digest for row in db.query(Blob.digest).filter(Blob.digest.in_(batch))}
+            db.rollback()
+            for digest in batch:
+                # 再次確認修改時間：期間重用此內容的請求會更新修改時間
+                if digest not in known and self.backend.modified_before(digest, cutoff_timestamp):
+                    self.backend.delete(digest)
+                    deleted.append(digest)
+        return deleted
+
+
+# 創建全局實例
+blob_store = BlobStore(LocalFileBackend(BLOB_STORE_PATH))
+
+__all__ = ['BlobStore', 'LocalFileBackend', 'blob_store', 'compute_digest', 'sniff_mime_type']
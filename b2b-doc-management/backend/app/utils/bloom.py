@@ -0,0 +1,55 @@
+"""
+Bloom filter
+用少量記憶體快速判斷「一定不存在」，可能存在時再查精確集合
+"""
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """固定容量的 Bloom filter（double hashing）
+
+    依預期元素數量與誤判率計算位元數與雜湊次數；不支援刪除，需要時以 rebuild 重建。
+    """
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def _set(self, bits: bytearray, item: str) -> None:
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def add(self, item: str) -> None:
+        """加入元素"""
+        self._set(self._bits, item)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def rebuild(self, items: Iterable[str]) -> None:
+        """以指定元素重建；在新的位元陣列上建立後一次替換，重建期間不加鎖的查詢不會得到誤判的「不存在」"""
+        bits = bytearray(len(self._bits))
+        count = 0
+        for item in items:
+            self._set(bits, item)
+            count += 1
+        self._bits = bits
+        self.count = count
+
+
+__all__ = ['BloomFilter']
@@ -0,0 +1,123 @@
+"""
+行程內快取工具
+提供有容量上限、支援 TTL 與 LRU 淘汰的執行緒安全快取
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """有容量上限的 TTL/LRU 快取
+
+    每個項目都有自己的到期時間（預設為寫入時間加上 ttl，可個別指定更早的到期時間），
+    超過 maxsize 時淘汰最久未使用的項目。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        讀取快取項目
+
+        Args:
+            key: 快取鍵
+            default: 未命中時的回傳值
+
+        Returns:
+            快取值或 default
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """
+        寫入快取項目
+
+        Args:
+            key: 快取鍵
+            value: 快取值
+            expires_at: 以 time.monotonic() 為基準的到期時間，不得晚於預設 TTL
+        """
+        deadline = time.monotonic() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """移除並回傳快取項目"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def discard_if(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """
+        移除所有符合條件的項目
+
+        Args:
+            predicate: 接收 (key, value)，回傳 True 表示移除
+
+        Returns:
+            移除的項目數量
+        """
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """清空快取"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """回傳命中率等統計資訊"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
+
+
+__all__ = ['TTLCache']
@@ -1,29 +1,218 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
 import os
 import time
 import logging
+import threading
+from .cache import TTLCache
+from .query_stats import instrument_engine
 
 logger = logging.getLogger(__name__)
 
 # Use SQLite for development when DATABASE_URL is not set or points to MariaDB
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-def wait_for_db(database_url, max_retries=30, retry_interval=2):
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes')
+
+# 連線池設定：同步路由約有 40 個執行緒，預設 pool_size + max_overflow 與其相當；
+# pool_recycle 需小於 MariaDB 的 wait_timeout，避免取得已被伺服器關閉的連線
+POOL_SETTINGS = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 30)),
+    'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+}
+POOL_WARMUP = int(os.getenv('DB_POOL_WARMUP', POOL_SETTINGS['pool_size']))
+
+# 讀取副本；未設定時讀取 session 也使用主庫
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# 用戶寫入後在此秒數內的讀取仍走主庫（read-your-writes），應大於副本的複寫延遲；
+# 紀錄保存在各工作行程的記憶體中，多行程部署時請搭配依用戶的黏著負載平衡或拉長視窗
+READ_YOUR_WRITES_WINDOW = float(os.getenv('DB_READ_YOUR_WRITES_WINDOW', 5))
+
+
+class PoolMetrics:
+    """連線池事件累計統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait_total_ms': round(self.wait_total * 1000, 3),
+                'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+replica_pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """記錄取得連線等待時間與逾時次數的 QueuePool"""
+
+    metrics = pool_metrics
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.incr('timeouts')
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - start)
+
+
+class ReplicaQueuePool(InstrumentedQueuePool):
+    """讀取副本的連線池，統計與主庫分開"""
+
+    metrics = replica_pool_metrics
+
+
+def _create_engine(database_url: str, poolclass=InstrumentedQueuePool):
+    if database_url.startswith("sqlite"):
+        engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(database_url, poolclass=poolclass, **POOL_SETTINGS)
+
+    metrics = poolclass.metrics
+    event.listen(engine, 'connect', lambda *args: metrics.incr('connects'))
+    event.listen(engine, 'checkout', lambda *args: metrics.incr('checkouts'))
+    event.listen(engine, 'checkin', lambda *args: metrics.incr('checkins'))
+    event.listen(engine, 'invalidate', lambda *args: metrics.incr('invalidations'))
+    instrument_engine(engine)
+    return engine
+
+_engine = None
+_replica_engine = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+Base = declarative_base()
+
+# 最近寫入過的用戶 ID，視窗內的讀取改走主庫
+recent_writers = TTLCache(maxsize=100000, ttl=READ_YOUR_WRITES_WINDOW)
+
+def get_engine():
+    """
+    取得全域唯一的 engine，首次呼叫時才建立（匯入模組時不連線、不等待資料庫）
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if not DATABASE_URL:
+                    raise RuntimeError("DATABASE_URL 未設定")
+                _engine = _create_engine(DATABASE_URL)
+                _session_factory.configure(bind=_engine)
+    return _engine
+
+def __getattr__(name):
+    # 向後相容：`from app.utils.db import engine` 會觸發延遲建立
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_replica_engine():
+    """
+    取得讀取副本的 engine，首次呼叫時才建立；未設定 DATABASE_REPLICA_URL 時回傳主庫 engine
+    """
+    global _replica_engine
+    if not DATABASE_REPLICA_URL:
+        return get_engine()
+    if _replica_engine is None:
+        with _engine_lock:
+            if _replica_engine is None:
+                _replica_engine = _create_engine(DATABASE_REPLICA_URL, poolclass=ReplicaQueuePool)
+    return _replica_engine
+
+def SessionLocal() -> Session:
+    """建立新的 session（沿用舊名稱；首次呼叫時才建立 engine）"""
+    get_engine()
+    return _session_factory()
+
+def ReadSessionLocal(user_id: Optional[int] = None) -> Session:
+    """
+    建立讀取專用的 session
+
+    Args:
+        user_id: 發出請求的用戶 ID；該用戶仍在 read-your-writes 視窗內時改用主庫
+
+    Returns:
+        綁定讀取副本（或主庫）的 session，嘗試寫入時會拋出 RuntimeError
+    """
+    if user_id is not None and recent_writers.get(user_id):
+        bind = get_engine()
+    else:
+        bind = get_replica_engine()
+    return _session_factory(bind=bind, info={'read_only': True})
+
+def bind_session_user(db: Session, user_id: int) -> None:
+    """標記 session 所屬用戶，該 session 提交寫入後開始此用戶的 read-your-writes 視窗"""
+    db.info['user_id'] = user_id
+
+def wrote_recently(user_id: int) -> bool:
+    """用戶是否仍在 read-your-writes 視窗內"""
+    return bool(recent_writers.get(user_id))
+
+@event.listens_for(_session_factory, 'before_flush')
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get('read_only'):
+        raise RuntimeError("讀取專用 session 不可寫入")
+
+@event.listens_for(_session_factory, 'after_flush')
+def _mark_session_wrote(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(_session_factory, 'after_commit')
+def _record_recent_write(session):
+    if session.info.pop('wrote', False) and session.info.get('user_id') is not None:
+        recent_writers.set(session.info['user_id'], True)
+
+@event.listens_for(_session_factory, 'after_soft_rollback')
+def _clear_session_wrote(session, previous_transaction):
+    session.info.pop('wrote', None)
+
+def wait_for_db(max_retries=30, retry_interval=2):
     """
-    等待數據庫變為可用
+    等待數據庫變為可用（所有重試共用同一個 engine；應在背景執行，不要在匯入時呼叫）
     """
     retries = 0
     
     while retries < max_retries:
         try:
-            # 創建臨時引擎進行連接測試
-            test_engine = create_engine(database_url)
-            
             # 嘗試建立連接並執行簡單查詢
-            with test_engine.connect() as connection:
+            with get_engine().connect() as connection:
                 connection.execute(text("SELECT 1"))
                 logger.info("數據庫連接成功!")
                 return True
@@ -45,14 +234,38 @@ def wait_for_db(database_url, max_retries=30, retry_interval=2):
     
     return False
 
-# 等待數據庫可用
-wait_for_db(DATABASE_URL)
-
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+def check_db() -> bool:
+    """執行 SELECT 1 確認資料庫可連線（readiness probe 用）"""
+    try:
+        with get_engine().connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logger.warning(f"數據庫健康檢查失敗: {e}")
+        return False
 
 def get_db():
+    """
+    請求範圍的資料庫 session（FastAPI 依賴）
+
+    FastAPI 在同一個請求內會快取依賴結果，認證中間件與各服務共用這個 session，
+    每個請求最多只取用一條連線，並在回應結束時確定釋放。
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def session_scope(db: Optional[Session] = None) -> Iterator[Session]:
+    """
+    沿用呼叫端傳入的 session；未提供時（例如腳本）建立新的 session 並在結束時關閉
+    """
+    if db is not None:
+        yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
@@ -63,8 +276,61 @@ def get_db_connection():
     """Return a raw DB-API connection from the SQLAlchemy engine for simple scripts.
     The caller should call .cursor() and manage commits if needed.
     """
-    return engine.raw_connection()
+    return get_engine().raw_connection()
 
 def init_db():
     """Initialize database schema from SQLAlchemy models (Base)."""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=get_engine())
+
+def warm_up_pool(connections: int = POOL_WARMUP) -> int:
+    """
+    預先建立連線池中的連線，避免第一批請求承擔連線建立成本
+
+    Args:
+        connections: 預先建立的連線數（不超過 pool_size）
+
+    Returns:
+        實際建立的連線數
+    """
+    engine = get_engine()
+    if not isinstance(engine.pool, QueuePool):
+        return 0
+
+    held = []
+    try:
+        for _ in range(min(connections, engine.pool.size())):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            held.append(conn)
+    except OperationalError as e:
+        logger.warning(f"連線池預熱失敗: {e}")
+    finally:
+        for conn in held:
+            conn.close()
+    return len(held)
+
+def _pool_status(engine, metrics: PoolMetrics) -> Dict[str, Any]:
+    pool = engine.pool
+    status: Dict[str, Any] = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': POOL_SETTINGS['max_overflow'],
+            'timeout': POOL_SETTINGS['pool_timeout'],
+            'recycle': POOL_SETTINGS['pool_recycle'],
+            'pre_ping': POOL_SETTINGS['pool_pre_ping'],
+        })
+    status.update(metrics.snapshot())
+    return status
+
+def get_pool_status() -> Dict[str, Any]:
+    """回傳連線池即時狀態與累計統計（有設定讀取副本時一併回傳副本連線池）"""
+    status = _pool_status(get_engine(), pool_metrics)
+    if DATABASE_REPLICA_URL:
+        status['replica'] = _pool_status(get_replica_engine(), replica_pool_metrics)
+        status['replica']['read_your_writes_window'] = READ_YOUR_WRITES_WINDOW
+        status['replica']['recent_writers'] = len(recent_writers)
+    return status
\ No newline at end of file
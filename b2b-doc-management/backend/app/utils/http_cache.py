@@ -0,0 +1,128 @@
+"""
+HTTP 條件請求與 Range 工具
+處理 ETag / If-None-Match / If-Modified-Since / If-Range 與單一位元組範圍
+"""
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# 串流讀取的區塊大小
+STREAM_CHUNK_SIZE = 64 * 1024
+# 圖片在瀏覽器快取中免驗證的秒數；預設 0，每次以 ETag 重新驗證（圖片更新後立即生效，未變更時回應 304）
+IMAGE_CACHE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE', 0))
+
+
+class RangeNotSatisfiable(Exception):
+    """Range 超出內容大小（回應 416）"""
+
+
+def http_date(value: datetime) -> str:
+    """將 UTC 的 naive datetime 轉為 HTTP 日期格式"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value, usegmt=True)
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match 是否符合目前的 ETag（弱比較，'*' 一律符合）
+
+    Args:
+        if_none_match: If-None-Match header
+        etag: 目前內容的 ETag（含引號）
+
+    Returns:
+        符合時返回 True（應回應 304）
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(',')}
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """If-Modified-Since 之後內容是否未變更（HTTP 日期只精確到秒）"""
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0) if last_modified.tzinfo is None else last_modified
+    return modified <= since
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析單一位元組範圍
+
+    Args:
+        range_header: Range header（例如 bytes=0-1023、bytes=1024-、bytes=-500）
+        size: 內容總大小
+
+    Returns:
+        (start, end) 包含兩端；未指定、格式不支援或多重範圍時返回 None（回應完整內容）
+
+    Raises:
+        RangeNotSatisfiable: 範圍超出內容大小
+    """
+    if not range_header or not range_header.startswith('bytes='):
+        return None
+    spec = range_header[len('bytes='):].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+
+    start_text, end_text = (part.strip() for part in spec.split('-', 1))
+    try:
+        if not start_text:
+            # 最後 N 個位元組
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - suffix, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def iter_file_range(f: BinaryIO, start: int, end: int, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    以區塊串流檔案的指定範圍，結束後關閉檔案
+
+    Args:
+        f: 已開啟的二進位檔案
+        start: 起始位元組
+        end: 結束位元組（包含）
+        chunk_size: 區塊大小
+    """
+    try:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+__all__ = [
+    'IMAGE_CACHE_MAX_AGE', 'RangeNotSatisfiable', 'etag_matches', 'http_date', 'iter_file_range',
+    'not_modified_since', 'parse_range'
+]
@@ -0,0 +1,63 @@
+"""
+上傳圖片的正規化
+只解碼一次：套用 EXIF 方向、移除中繼資料（EXIF/GPS、XMP、註解）、將長邊限制在 OCR 仍可辨識的尺寸內，
+再以目標品質重新編碼；無法解碼的內容（例如 PDF）原樣保留
+"""
+import io
+import logging
+import os
+from typing import Tuple
+from .blob_store import sniff_mime_type
+
+logger = logging.getLogger(__name__)
+
+# 是否在寫入前正規化圖片
+IMAGE_INGEST_ENABLED = os.getenv('IMAGE_INGEST_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# 長邊的最大像素數（2400px 的身分證約 280 DPI，足夠 OCR 使用）
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 2400))
+# 重新編碼 JPEG 的品質
+IMAGE_INGEST_QUALITY = int(os.getenv('IMAGE_INGEST_QUALITY', 85))
+
+
+def normalize_image(data: bytes) -> Tuple[bytes, str]:
+    """
+    正規化上傳的圖片
+
+    有透明度的圖片輸出 PNG，其餘輸出 JPEG。
+
+    Args:
+        data: 原始圖片內容
+
+    Returns:
+        (正規化後的內容, MIME 類型)
+    """
+    if not IMAGE_INGEST_ENABLED:
+        return data, sniff_mime_type(data)
+
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            if max(source.size) > IMAGE_MAX_DIMENSION:
+                # 大張 JPEG 在解碼時就以不小於上限的縮小比例讀取，省下完整解碼的時間與記憶體
+                source.draft('RGB', (IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+            image = ImageOps.exif_transpose(source)
+            # 等比縮小且不放大
+            image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+            output = io.BytesIO()
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                # 只寫入像素資料，不帶入原圖的 info（EXIF、文字區塊等）
+                image.convert('RGBA').save(output, format='PNG', optimize=True)
+                mime_type = 'image/png'
+            else:
+                image.convert('RGB').save(output, format='JPEG', quality=IMAGE_INGEST_QUALITY, optimize=True)
+                mime_type = 'image/jpeg'
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError) as e:
+        logger.info(f"無法解碼為圖片，保留原始內容: {e}")
+        return data, sniff_mime_type(data)
+
+    return output.getvalue(), mime_type
+
+
+__all__ = ['IMAGE_INGEST_ENABLED', 'IMAGE_INGEST_QUALITY', 'IMAGE_MAX_DIMENSION', 'normalize_image']
@@ -0,0 +1,121 @@
+"""
+版本化資料庫遷移
+依序執行 app/migrations 下的 mXXXX_*.py 模組，已套用的版本記錄在 schema_migrations 資料表；
+新資料庫由 init_db() 依模型建立後，遷移會偵測既有物件並直接記錄版本
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+from typing import List, Sequence
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, text
+from sqlalchemy.exc import IntegrityError
+from .db import get_engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PACKAGE = 'app.migrations'
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', String(32), primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def create_index_if_missing(connection, table: str, name: str, columns: Sequence[str]) -> bool:
+    """
+    索引不存在時建立（CREATE INDEX 語法 MariaDB 與 SQLite 通用）
+
+    Returns:
+        有建立索引時返回 True
+    """
+    existing = {index['name'] for index in inspect(connection).get_indexes(table)}
+    if name in existing:
+        return False
+    connection.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+    logger.info(f"已建立索引 {name} ON {table}")
+    return True
+
+
+def drop_index_if_exists(connection, table: str, name: str) -> bool:
+    """
+    索引存在時刪除（MariaDB 需指定資料表，SQLite 不接受 ON 子句）
+
+    Returns:
+        有刪除索引時返回 True
+    """
+    existing = {index['name'] for index in inspect(connection).get_indexes(table)}
+    if name not in existing:
+        return False
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DROP INDEX {name}"))
+    else:
+        connection.execute(text(f"DROP INDEX {name} ON {table}"))
+    logger.info(f"已刪除索引 {name} ON {table}")
+    return True
+
+
+def add_column_if_missing(connection, table: str, name: str, ddl_type: str) -> bool:
+    """
+    欄位不存在時新增（ALTER TABLE ... ADD COLUMN 語法 MariaDB 與 SQLite 通用）
+
+    Returns:
+        有新增欄位時返回 True
+    """
+    existing = {column['name'] for column in inspect(connection).get_columns(table)}
+    if name in existing:
+        return False
+    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+    logger.info(f"已新增欄位 {table}.{name}")
+    return True
+
+
+def load_migrations() -> List:
+    """依版本排序載入所有遷移模組"""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    modules = [
+        importlib.import_module(f"{MIGRATIONS_PACKAGE}.{info.name}")
+        for info in pkgutil.iter_modules(package.__path__)
+        if info.name.startswith('m')
+    ]
+    return sorted(modules, key=lambda module: module.VERSION)
+
+
+def run_migrations(engine=None) -> List[str]:
+    """
+    套用所有尚未執行的遷移
+
+    Returns:
+        本次套用的版本列表
+    """
+    engine = engine or get_engine()
+    schema_migrations.create(engine, checkfirst=True)
+
+    with engine.connect() as connection:
+        applied = {row.version for row in connection.execute(schema_migrations.select())}
+
+    newly_applied = []
+    for module in load_migrations():
+        if module.VERSION in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                module.upgrade(connection)
+                connection.execute(schema_migrations.insert().values(
+                    version=module.VERSION,
+                    name=module.DESCRIPTION,
+                    applied_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            # 其他工作行程已同時套用並記錄此版本
+            logger.info(f"遷移 {module.VERSION} 已由其他行程套用")
+            continue
+        logger.info(f"已套用遷移 {module.VERSION}: {module.DESCRIPTION}")
+        newly_applied.append(module.VERSION)
+    return newly_applied
+
+
+__all__ = ['add_column_if_missing', 'create_index_if_missing', 'load_migrations', 'run_migrations', 'schema_migrations']
@@ -0,0 +1,48 @@
+"""
+游標（keyset）分頁
+游標以 (排序欄位, id) 記錄上一頁最後一筆的位置，下一頁以 WHERE 條件接續，
+不論翻到第幾頁成本都相同；對外是不透明的 base64url 字串
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Tuple, Union
+
+
+def encode_cursor(value: Union[datetime, date], row_id: int) -> str:
+    """
+    將排序鍵編碼為游標
+
+    Args:
+        value: 最後一筆的排序欄位值（例如建立時間）
+        row_id: 最後一筆的 ID
+
+    Returns:
+        不透明的游標字串
+    """
+    payload = json.dumps([value.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解碼游標
+
+    Args:
+        cursor: encode_cursor() 產生的字串
+
+    Returns:
+        (排序欄位值, id)；日期欄位的值為當天 00:00 的 datetime
+
+    Raises:
+        ValueError: 游標格式錯誤
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(value), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'無效的分頁游標: {cursor}') from e
+
+
+__all__ = ['decode_cursor', 'encode_cursor']
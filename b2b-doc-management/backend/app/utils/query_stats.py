@@ -0,0 +1,159 @@
+"""
+每個請求的 SQL 統計
+以 engine 事件累計語句數、資料庫耗時與讀取列數，統計物件放在 contextvar 中，
+同一請求內的同步依賴、執行緒池與非同步路由都會記到同一份統計
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from sqlalchemy import event
+from .slow_query import slow_query_log
+
+# 統計語句內容時每條 SQL 保留的最大長度
+STATEMENT_PREVIEW_LENGTH = 300
+
+
+class QueryStats:
+    """單一請求（或測試區塊）的 SQL 統計"""
+
+    __slots__ = ('count', 'duration', 'rows', 'started', 'statements', 'scope')
+
+    def __init__(self, record_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.started = time.perf_counter()
+        # 只有測試/除錯時才保留語句內容，避免正式環境的額外開銷
+        self.statements: Optional[List[str]] = [] if record_statements else None
+        # 由中間件設定的 ASGI scope，用於標示慢查詢的來源路由
+        self.scope: Optional[Dict[str, Any]] = None
+
+    def record(self, statement: str, duration: float, rows: int) -> None:
+        self.count += 1
+        self.duration += duration
+        self.rows += rows
+        if self.statements is not None:
+            self.statements.append(statement[:STATEMENT_PREVIEW_LENGTH])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'db_queries': self.count,
+            'db_ms': round(self.duration * 1000, 3),
+            'db_rows': self.rows,
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+        }
+
+    @property
+    def route(self) -> Optional[str]:
+        """來源路由（例如 GET /api/v2/applications/{application_id}）"""
+        if self.scope is None:
+            return None
+        route = self.scope.get('route')
+        return f"{self.scope['method']} {route.path if route is not None else self.scope['path']}"
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar('query_stats', default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """取得目前請求的統計（不在請求範圍內時為 None）"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(record_statements: bool = False) -> Iterator[QueryStats]:
+    """
+    在區塊內累計 SQL 統計
+
+    Args:
+        record_statements: 是否保留每條 SQL（測試失敗時列出）
+
+    Returns:
+        區塊內累計的 QueryStats
+    """
+    stats = QueryStats(record_statements)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 開始時間記在本次執行的 context 上，語句失敗時不會殘留
+    context._query_started = time.perf_counter()
+
+
+def instrument_engine(engine, explain_bind: Optional[Callable] = None) -> None:
+    """
+    為 engine 掛上統計與慢查詢事件（非同步 engine 請傳入 async_engine.sync_engine）
+
+    Args:
+        engine: SQLAlchemy Engine
+        explain_bind: 回傳慢查詢 EXPLAIN 所用同步 engine 的函式（預設為 engine 本身；
+            非同步 engine 無法在背景執行緒使用，需指定對應的同步 engine）
+    """
+    explain_bind = explain_bind or (lambda: engine)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_started
+        stats = _current_stats.get()
+        if stats is not None:
+            # 有結果集的語句才計算讀取列數；MySQLdb/aiomysql 預先緩衝結果，rowcount 即為列數，SQLite 回報 -1
+            rows = cursor.rowcount if cursor.description is not None and cursor.rowcount > 0 else 0
+            stats.record(statement, duration, rows)
+        if slow_query_log.is_slow(duration) and context.execution_options.get('slow_query_log', True):
+            slow_query_log.record(statement, parameters, duration, stats.route if stats else None, explain_bind)
+
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    查詢預算檢查（測試用）：區塊內的 SQL 語句數超過 limit 時拋出 AssertionError
+
+    用法:
+        with assert_max_queries(3):
+            ApplicationService.get_all_applications(page=1, limit=50)
+
+    Args:
+        limit: 允許的最大語句數
+
+    Returns:
+        區塊內累計的 QueryStats
+    """
+    with track_queries(record_statements=True) as stats:
+        yield stats
+    if stats.count > limit:
+        listing = '\n'.join(f"  {i}. {sql}" for i, sql in enumerate(stats.statements, 1))
+        raise AssertionError(f"執行了 {stats.count} 條 SQL，超過預算 {limit}:\n{listing}")
+
+
+def assert_response_query_budget(response, limit: int) -> int:
+    """
+    端點查詢預算檢查（測試用）：讀取回應的 X-DB-Queries header，超過 limit 時拋出 AssertionError
+
+    TestClient 在另一個執行緒執行應用程式，無法以 assert_max_queries 包住請求，改由中介層回報的 header 判斷。
+
+    Args:
+        response: TestClient/httpx 回應
+        limit: 允許的最大語句數
+
+    Returns:
+        實際的語句數
+    """
+    count = int(response.headers['X-DB-Queries'])
+    if count > limit:
+        raise AssertionError(
+            f"{response.request.method} {response.request.url.path} 執行了 {count} 條 SQL，超過預算 {limit}"
+        )
+    return count
+
+
+__all__ = [
+    'QueryStats', 'current_stats', 'track_queries', 'instrument_engine',
+    'assert_max_queries', 'assert_response_query_budget'
+]
@@ -0,0 +1,217 @@
+"""
+慢查詢紀錄
+超過門檻的語句連同參數、來源路由與服務方法寫入日誌，並在背景以另一條連線取得 EXPLAIN；
+依正規化後的 SQL 彙總，供管理員端點找出缺少索引或全表掃描的查詢（紀錄保存在各工作行程的記憶體中）
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger('app.slow_query')
+
+# 慢查詢門檻（毫秒），設為 0 停用
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 500))
+# 是否對慢查詢的 SELECT 取得執行計畫
+SLOW_QUERY_EXPLAIN = os.getenv('DB_SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+# 彙總保留的不同語句數上限
+SLOW_QUERY_MAX_ENTRIES = int(os.getenv('DB_SLOW_QUERY_MAX_ENTRIES', 200))
+
+# 參數在日誌中保留的最大長度（圖片等二進位參數只記錄大小）
+PARAMS_PREVIEW_LENGTH = 500
+
+_SERVICE_MODULE_PREFIX = 'app.services.'
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s|:\w+|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    將 SQL 正規化為彙總用的鍵：合併空白、常數與參數改為 ?、IN 列表合併為 (...)
+
+    Args:
+        statement: 原始 SQL
+
+    Returns:
+        正規化後的 SQL
+    """
+    sql = _WHITESPACE.sub(' ', statement).strip()
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    return _IN_LIST.sub('(...)', sql)
+
+
+def _preview_params(parameters) -> str:
+    def describe(value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return f'<{len(value)} bytes>'
+        return value
+
+    if isinstance(parameters, dict):
+        parameters = {key: describe(value) for key, value in parameters.items()}
+    elif isinstance(parameters, (list, tuple)):
+        parameters = [describe(value) for value in parameters]
+    preview = repr(parameters)
+    return preview if len(preview) <= PARAMS_PREVIEW_LENGTH else preview[:PARAMS_PREVIEW_LENGTH] + '...'
+
+
+def find_service_caller() -> Optional[str]:
+    """
+    由呼叫堆疊找出最近的服務方法（例如 ApplicationService.get_applications_by_user）
+
+    非同步服務在 greenlet 中執行 SQL，堆疊不含協程本身，此時回傳 None
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith(_SERVICE_MODULE_PREFIX):
+            return frame.f_code.co_qualname
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """慢查詢日誌與彙總"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, explain: bool = SLOW_QUERY_EXPLAIN,
+                 max_entries: int = SLOW_QUERY_MAX_ENTRIES):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def is_slow(self, duration: float) -> bool:
+        return self.enabled and duration * 1000 >= self.threshold_ms
+
+    def record(self, statement: str, parameters, duration: float, route: Optional[str],
+               explain_bind: Callable) -> None:
+        """
+        記錄一筆慢查詢
+
+        Args:
+            statement: 送到 driver 的 SQL
+            parameters: driver 參數
+            duration: 執行秒數
+            route: 來源路由（例如 GET /api/v2/applications）
+            explain_bind: 回傳可用於 EXPLAIN 的同步 engine
+        """
+        duration_ms = round(duration * 1000, 3)
+        key = normalize_sql(statement)
+        caller = find_service_caller()
+        params = _preview_params(parameters)
+
+        logger.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': duration_ms,
+            'route': route,
+            'caller': caller,
+            'sql': key,
+            'params': params
+        }, ensure_ascii=False))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    # 淘汰累計耗時最少的語句
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k]['total_ms'])]
+                entry = self._entries[key] = {
+                    'sql': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'routes': {}, 'callers': {}, 'explain': None
+                }
+            worst = duration_ms > entry['max_ms']
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['last_seen'] = datetime.utcnow().isoformat()
+            if worst:
+                entry['max_ms'] = duration_ms
+                entry['worst_params'] = params
+            for field, value in (('routes', route), ('callers', caller)):
+                if value:
+                    entry[field][value] = entry[field].get(value, 0) + 1
+
+        # 每種語句只在首次或出現更慢的執行時取得執行計畫
+        if self.explain and worst and statement.lstrip()[:6].upper() == 'SELECT':
+            self._submit_explain(key, statement, parameters, explain_bind)
+
+    def _submit_explain(self, key: str, statement: str, parameters, explain_bind: Callable) -> None:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        self._executor.submit(self._explain, key, statement, parameters, explain_bind)
+
+    def _explain(self, key: str, statement: str, parameters, explain_bind: Callable) -> None:
+        try:
+            engine = explain_bind()
+            # 側連線的 EXPLAIN 本身不列入慢查詢
+            with engine.connect().execution_options(slow_query_log=False) as connection:
+                if connection.dialect.name == 'sqlite':
+                    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                else:
+                    rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+                plan = [{
+                    column: value if isinstance(value, (int, float, str, type(None))) else str(value)
+                    for column, value in row._mapping.items()
+                } for row in rows]
+        except Exception as e:
+            logger.warning(f"取得慢查詢執行計畫失敗: {e}")
+            return
+
+        logger.warning(json.dumps({'event': 'slow_query_explain', 'sql': key, 'plan': plan}, ensure_ascii=False))
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]['explain'] = plan
+
+    def top(self, limit: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+        """
+        依累計耗時（或 max_ms、count）排序的最慢語句
+
+        Args:
+            limit: 回傳筆數
+            order_by: 排序欄位（total_ms、max_ms、count）
+
+        Returns:
+            彙總後的語句列表
+        """
+        if order_by not in ('total_ms', 'max_ms', 'count'):
+            order_by = 'total_ms'
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry[order_by], reverse=True)[:limit]
+            return [{
+                **entry,
+                'total_ms': round(entry['total_ms'], 3),
+                'avg_ms': round(entry['total_ms'] / entry['count'], 3),
+                'routes': dict(entry['routes']),
+                'callers': dict(entry['callers'])
+            } for entry in entries]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 創建全局實例
+slow_query_log = SlowQueryLog()
+
+__all__ = ['SlowQueryLog', 'normalize_sql', 'find_service_caller', 'slow_query_log']
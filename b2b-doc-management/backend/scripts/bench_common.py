@@ -0,0 +1,38 @@
+"""
+基準測試共用工具
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(samples, pct):
+    """回傳樣本的第 pct 百分位數"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_concurrent(call, requests, concurrency):
+    """
+    以 concurrency 個執行緒呼叫 call 共 requests 次
+
+    Returns:
+        (成功呼叫的延遲列表, 失敗次數, 總耗時秒數)
+    """
+    latencies = []
+    rejected = 0
+
+    def one(_):
+        start = time.perf_counter()
+        ok = call()
+        return ok, time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ok, latency in pool.map(one, range(requests)):
+            if ok:
+                latencies.append(latency)
+            else:
+                rejected += 1
+    elapsed = time.perf_counter() - started
+    return latencies, rejected, elapsed
@@ -0,0 +1,94 @@
+"""
+登入吞吐量基準測試
+
+直接模式（預設）：以專用行程池平行驗證密碼，量測每秒登入數、每核心吞吐量與 p50/p99 延遲；
+--methods 可一次比較多組雜湊參數，協助挑選符合 CPU 預算的成本
+    python -m scripts.bench_login --workers 4 --requests 400
+    python -m scripts.bench_login --methods scrypt:32768:8:1,scrypt:16384:8:1,pbkdf2:sha256:600000
+
+HTTP 模式：對執行中的服務並行呼叫 /auth/login
+    python -m scripts.bench_login --url http://localhost:5050 --username 84472643 --password ...
+"""
+import argparse
+import json
+import os
+import statistics
+import urllib.error
+import urllib.request
+from werkzeug.security import generate_password_hash
+
+from app.services.password_hasher import PasswordHasher, PasswordHasherBusy
+from scripts.bench_common import percentile, run_concurrent
+
+
+def bench_direct(args, method):
+    hasher = PasswordHasher(workers=args.workers, queue_size=args.concurrency, method=method)
+    hasher.warm_up()
+    pwhash = generate_password_hash(args.password, method=method)
+
+    def call():
+        try:
+            return hasher.verify(pwhash, args.password)
+        except PasswordHasherBusy:
+            return False
+
+    try:
+        return run_concurrent(call, args.requests, args.concurrency)
+    finally:
+        hasher.shutdown()
+
+
+def bench_http(args):
+    body = json.dumps({'username': args.username, 'password': args.password}).encode('utf-8')
+
+    def call():
+        request = urllib.request.Request(
+            f"{args.url.rstrip('/')}/auth/login",
+            data=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status == 200
+        except urllib.error.HTTPError:
+            return False
+
+    return run_concurrent(call, args.requests, args.concurrency)
+
+
+def _report(args, label, latencies, rejected, elapsed):
+    print(f"[{label}] workers: {args.workers}，並行: {args.concurrency}")
+    if not latencies:
+        print(f"  所有請求皆失敗（拒絕/錯誤 {rejected} 筆）")
+        return
+
+    throughput = len(latencies) / elapsed
+    print(f"  成功: {len(latencies)}，拒絕/錯誤: {rejected}，耗時: {elapsed:.2f}s")
+    print(f"  吞吐量: {throughput:.1f} logins/s，每核心: {throughput / max(args.workers, 1):.1f} logins/s")
+    print(f"  延遲 p50: {statistics.median(latencies) * 1000:.1f}ms，p99: {percentile(latencies, 99) * 1000:.1f}ms")
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登入吞吐量基準測試')
+    parser.add_argument('--url', help='服務位址，提供時改為 HTTP 模式')
+    parser.add_argument('--username', default='bench')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)),
+                        help='雜湊行程數（HTTP 模式下為伺服器端設定，用於計算每核心吞吐量）')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--methods', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+                        help='以逗號分隔的 werkzeug 雜湊參數（僅直接模式）')
+    args = parser.parse_args()
+
+    if args.url:
+        _report(args, 'http', *bench_http(args))
+        return
+
+    for method in args.methods.split(','):
+        _report(args, method, *bench_direct(args, method.strip()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+v2 API 同步/非同步路徑吞吐量比較
+
+分別以 API_V2_ASYNC=false 與 API_V2_ASYNC=true 啟動兩個服務實例，再對兩者發送相同的請求：
+    python -m scripts.bench_v2 --target sync=http://localhost:8001 --target async=http://localhost:8002 \
+        --username 84472643 --password ... --path /api/v2/applications --path /api/v2/admin/applications
+"""
+import argparse
+import json
+import statistics
+import urllib.error
+import urllib.request
+
+from scripts.bench_common import percentile, run_concurrent
+
+
+def login(base_url, username, password):
+    """登入並取得 token"""
+    request = urllib.request.Request(
+        f"{base_url.rstrip('/')}/auth/login",
+        data=json.dumps({'username': username, 'password': password}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())['user']['token']
+
+
+def bench_path(base_url, path, token, requests, concurrency):
+    url = f"{base_url.rstrip('/')}{path}"
+
+    def call():
+        request = urllib.request.Request(url, headers={'Authorization': f'Bearer {token}'})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                return response.status == 200
+        except (urllib.error.HTTPError, urllib.error.URLError):
+            return False
+
+    return run_concurrent(call, requests, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='v2 API 同步/非同步吞吐量比較')
+    parser.add_argument('--target', action='append', required=True, help='label=url，可重複指定')
+    parser.add_argument('--path', action='append', help='要測試的路徑，可重複指定（預設 /api/v2/applications）')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    for target in args.target:
+        label, base_url = target.split('=', 1)
+        token = login(base_url, args.username, args.password)
+        for path in args.path or ['/api/v2/applications']:
+            # 暖機，避免首次連線與快取填充影響結果
+            bench_path(base_url, path, token, min(50, args.requests), args.concurrency)
+            latencies, failed, elapsed = bench_path(base_url, path, token, args.requests, args.concurrency)
+            print(f"[{label}] {path}")
+            if not latencies:
+                print(f"  所有請求皆失敗（{failed} 筆）")
+                continue
+            print(f"  成功: {len(latencies)}，失敗: {failed}，吞吐量: {len(latencies) / elapsed:.1f} req/s")
+            print(f"  延遲 p50: {statistics.median(latencies) * 1000:.1f}ms，p99: {percentile(latencies, 99) * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+列表端點查詢預算檢查
+
+灌入測試資料後以 assert_max_queries 執行申請案件列表服務，確認 SQL 語句數固定、不隨筆數增加（沒有 N+1）；
+超過預算時以非零狀態結束，可放入 CI。預設使用暫存 SQLite 資料庫
+    python -m scripts.check_query_budget
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+# (說明, 預算, 呼叫方式)；列表服務以單一 JOIN 查詢取得資料，另外計算總數（游標分頁預設不計算）
+BUDGETS = [
+    ('用戶申請列表', 2, lambda svc, db: svc.get_applications_by_user(1, db=db)),
+    ('用戶申請列表（狀態篩選）', 2, lambda svc, db: svc.get_applications_by_user(1, status='待審核', db=db)),
+    ('用戶申請列表（申請日期區間、類型篩選）', 2, lambda svc, db: svc.get_applications_by_user(
+        1, db=db, application_type='首次申請', date_from='2024-01-01', sort='-application_date')),
+    ('用戶申請列表（游標分頁）', 1, lambda svc, db: svc.get_applications_by_user(1, db=db, cursor='WyIyMDk5LTAxLTAxVDAwOjAwOjAwIiwxXQ')),
+    ('管理員申請列表', 2, lambda svc, db: svc.get_all_applications(page=1, limit=50, db=db)),
+    ('管理員申請列表（狀態篩選）', 2, lambda svc, db: svc.get_all_applications(status='待審核', page=2, limit=20, db=db)),
+    ('申請案件統計', 1, lambda svc, db: application_stats(db)),
+    ('管理員申請列表（游標分頁，連續兩頁）', 2, lambda svc, db: svc.get_all_applications(
+        limit=50, db=db, cursor=svc.get_all_applications(limit=50, db=db, with_total=False)['pagination']['next_cursor'])),
+]
+
+ASYNC_BUDGETS = [
+    ('用戶申請列表（非同步）', 2, lambda svc, db: svc.get_applications_by_user(1, db)),
+    ('管理員申請列表（非同步）', 2, lambda svc, db: svc.get_all_applications(db, page=1, limit=50)),
+]
+
+
+def application_stats(db):
+    """儀表板統計（各公司的統計列）"""
+    from app.services.application_stats import ApplicationStatsService
+    return ApplicationStatsService.get_stats(db=db)['data']['by_company']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列表端點查詢預算檢查')
+    parser.add_argument('--users', type=int, default=5)
+    parser.add_argument('--individuals', type=int, default=500)
+    parser.add_argument('--applications', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir.name, 'budget.db')}"
+
+    # DATABASE_URL 於匯入時讀取，必須在設定環境變數之後才匯入
+    from app import models  # noqa: F401  註冊模型，init_db 才會建立資料表
+    from app.services.application_service import ApplicationService
+    from app.services.application_stats import ApplicationStatsService
+    from app.services.async_application_service import AsyncApplicationService
+    from app.utils.async_db import AsyncSessionLocal, dispose_async_engine
+    from app.utils.db import SessionLocal, get_engine, init_db
+    from app.utils.migrations import run_migrations
+    from app.utils.query_stats import assert_max_queries
+    from scripts.check_query_plans import seed
+
+    init_db()
+    run_migrations()
+    seed(get_engine(), args.users, args.individuals, args.applications)
+    # 測試資料直接寫入資料表，需重新計算統計計數
+    ApplicationStatsService.reconcile()
+
+    failures = []
+
+    def report(label, budget, stats, result):
+        rows = result['data'] if isinstance(result, dict) else result
+        print(f"[OK  ] {label}: {stats.count} 條 SQL，{len(rows)} 筆（預算 {budget}）")
+
+    db = SessionLocal()
+    try:
+        for label, budget, call in BUDGETS:
+            try:
+                with assert_max_queries(budget) as stats:
+                    result = call(ApplicationService, db)
+                report(label, budget, stats, result)
+            except AssertionError as e:
+                failures.append(label)
+                print(f"[FAIL] {label}: {e}")
+    finally:
+        db.close()
+
+    async def check_async():
+        # 查詢在事件迴圈中執行，統計與 await 在同一個 context 內累計
+        async with AsyncSessionLocal() as db:
+            for label, budget, call in ASYNC_BUDGETS:
+                try:
+                    with assert_max_queries(budget) as stats:
+                        result = await call(AsyncApplicationService, db)
+                    report(label, budget, stats, result)
+                except AssertionError as e:
+                    failures.append(label)
+                    print(f"[FAIL] {label}: {e}")
+        await dispose_async_engine()
+
+    asyncio.run(check_async())
+    get_engine().dispose()
+    workdir.cleanup()
+
+    if failures:
+        print(f"{len(failures)} 個列表超過查詢預算")
+        sys.exit(1)
+    print('所有列表皆在查詢預算內')
+
+
+if __name__ == '__main__':
+    main()
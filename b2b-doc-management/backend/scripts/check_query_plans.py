@@ -0,0 +1,181 @@
+"""
+熱門查詢執行計畫檢查
+
+灌入大量測試資料後對熱門查詢執行 EXPLAIN，確認皆使用預期的索引；任一查詢未使用索引時以非零狀態結束，可放入 CI。
+預設使用暫存 SQLite 資料庫；指定 --database-url 時請勿指向正式資料庫（會寫入測試資料）
+    python -m scripts.check_query_plans --applications 200000
+    python -m scripts.check_query_plans --database-url mysql://root:pw@localhost/b2b_check
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+STATUSES = ['草稿', '待審核', '補件', '送件中', '已完成']
+
+# (說明, SQL, 參數, 可接受的索引)
+HOT_QUERIES = [
+    ('用戶申請列表',
+     'SELECT a.id, a.status, a.created_at, i.chinese_last_name, i.chinese_first_name FROM applications a '
+     'LEFT OUTER JOIN individuals i ON i.id = a.individual_id WHERE a.user_id = :user_id '
+     'ORDER BY a.created_at DESC, a.id DESC LIMIT 51 OFFSET 0',
+     {'user_id': 1}, ('ix_applications_user_created_id', 'ix_applications_user_status_created_id')),
+    ('用戶申請列表（狀態篩選、游標分頁）',
+     'SELECT id, individual_id, status, created_at FROM applications WHERE user_id = :user_id AND status = :status '
+     'AND (created_at < :created_at OR (created_at = :created_at AND id < :id)) ORDER BY created_at DESC, id DESC LIMIT 51',
+     {'user_id': 1, 'status': '待審核', 'created_at': '2024-01-01 00:00:00', 'id': 1000},
+     ('ix_applications_user_status_created_id',)),
+    ('用戶申請列表（申請日期區間、依申請日期排序）',
+     'SELECT id, individual_id, status, application_date FROM applications WHERE user_id = :user_id '
+     'AND application_date >= :date_from AND application_date <= :date_to '
+     'ORDER BY application_date DESC, id DESC LIMIT 51 OFFSET 0',
+     {'user_id': 1, 'date_from': '2024-01-01', 'date_to': '2024-12-31'}, ('ix_applications_user_date_id',)),
+    ('用戶申請總數（申請日期區間）',
+     'SELECT count(id) FROM applications WHERE user_id = :user_id AND application_date >= :date_from',
+     {'user_id': 1, 'date_from': '2024-01-01'}, ('ix_applications_user_date_id',)),
+    ('管理員申請列表',
+     'SELECT a.id, a.created_at, i.chinese_last_name, i.chinese_first_name, u.company_name FROM applications a '
+     'LEFT OUTER JOIN individuals i ON i.id = a.individual_id LEFT OUTER JOIN users u ON u.id = a.user_id '
+     'ORDER BY a.created_at DESC, a.id DESC LIMIT 51 OFFSET 0',
+     {}, ('ix_applications_created_id',)),
+    ('管理員申請列表（游標分頁）',
+     'SELECT a.id, a.created_at, i.chinese_last_name, i.chinese_first_name, u.company_name FROM applications a '
+     'LEFT OUTER JOIN individuals i ON i.id = a.individual_id LEFT OUTER JOIN users u ON u.id = a.user_id '
+     'WHERE a.created_at < :created_at OR (a.created_at = :created_at AND a.id < :id) '
+     'ORDER BY a.created_at DESC, a.id DESC LIMIT 51',
+     {'created_at': '2024-01-01 00:00:00', 'id': 1000}, ('ix_applications_created_id',)),
+    ('管理員申請列表（狀態篩選）',
+     'SELECT id, user_id, individual_id, created_at FROM applications WHERE status = :status '
+     'ORDER BY created_at DESC, id DESC LIMIT 51 OFFSET 0',
+     {'status': '待審核'}, ('ix_applications_status_created_id',)),
+    ('管理員申請列表（狀態篩選、游標分頁）',
+     'SELECT id, user_id, individual_id, created_at FROM applications WHERE status = :status '
+     'AND (created_at < :created_at OR (created_at = :created_at AND id < :id)) ORDER BY created_at DESC, id DESC LIMIT 51',
+     {'status': '待審核', 'created_at': '2024-01-01 00:00:00', 'id': 1000}, ('ix_applications_status_created_id',)),
+    ('依中文姓名查找個人資料',
+     'SELECT id FROM individuals WHERE chinese_last_name = :last_name AND chinese_first_name = :first_name',
+     {'last_name': '王', 'first_name': '小明1'}, ('ix_individuals_chinese_name',)),
+    ('搜尋索引詞（每個詞讀取最新的文件）',
+     'SELECT doc_id FROM search_terms WHERE field = :field AND term = :term ORDER BY doc_id DESC LIMIT 2001',
+     {'field': 'individual', 'term': '小明'}, ('sqlite_autoindex_search_terms_1', 'PRIMARY')),
+    ('搜尋候選文件（常見詞取交集）',
+     'SELECT doc_id FROM search_terms WHERE field = :field AND term IN (:first, :second) '
+     'GROUP BY doc_id HAVING count(*) = 2 LIMIT 2000',
+     {'field': 'individual', 'first': '王小', 'second': '小明'}, ('sqlite_autoindex_search_terms_1', 'PRIMARY')),
+    ('搜尋結果（依申請案件與個人資料 ID）',
+     'SELECT id, created_at FROM applications WHERE id IN (1, 2, 3) OR individual_id IN (4, 5, 6) '
+     'ORDER BY created_at DESC, id DESC LIMIT 21',
+     {}, ('ix_applications_individual_id',)),
+    ('未讀通知',
+     'SELECT id, message FROM notifications WHERE user_id = :user_id AND is_read = 0',
+     {'user_id': 1}, ('ix_notifications_user_read',)),
+]
+
+
+def seed(engine, users, individuals, applications, batch_size=5000):
+    """以批次 INSERT 灌入測試資料"""
+    from app.models import User, Individual, Application, Notification
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            'id': i, 'company_name': f'測試公司{i}', 'username': f'plan{i}', 'password': 'x',
+            'email': f'plan{i}@example.com', 'role': 'user', 'created_at': now, 'updated_at': now
+        } for i in range(1, users + 1)])
+
+        for start in range(1, individuals + 1, batch_size):
+            conn.execute(Individual.__table__.insert(), [{
+                'id': i, 'chinese_last_name': rng.choice('王李張劉陳楊黃趙吳周'), 'chinese_first_name': f'小明{i}',
+                'english_last_name': 'WANG', 'english_first_name': f'MING{i}', 'national_id': f'P{i:09d}',
+                'gender': rng.choice('男女'), 'created_at': now, 'updated_at': now
+            } for i in range(start, min(start + batch_size, individuals + 1))])
+
+        for start in range(1, applications + 1, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, applications + 1)):
+                created_at = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+                rows.append({
+                    'id': i, 'user_id': rng.randint(1, users), 'individual_id': rng.randint(1, individuals),
+                    'application_type': '首次申請', 'urgency': '普通件', 'application_date': date.today(),
+                    'customer_name': f'客戶{i}', 'status': rng.choice(STATUSES),
+                    'created_at': created_at, 'updated_at': created_at
+                })
+            conn.execute(Application.__table__.insert(), rows)
+
+        conn.execute(Notification.__table__.insert(), [{
+            'user_id': rng.randint(1, users), 'message': f'通知{i}', 'is_read': rng.random() < 0.9, 'created_at': now
+        } for i in range(applications // 10)])
+
+
+def explain(conn, sql, params):
+    """取得查詢計畫的文字表示"""
+    from sqlalchemy import text
+
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)
+        return ' | '.join(row.detail for row in rows)
+    rows = conn.execute(text(f'EXPLAIN {sql}'), params).mappings()
+    return ' | '.join(f"{row['table']}: type={row['type']} key={row['key']} extra={row['Extra']}" for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='熱門查詢執行計畫檢查')
+    parser.add_argument('--database-url', help='預設為暫存 SQLite 資料庫')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--individuals', type=int, default=50000)
+    parser.add_argument('--applications', type=int, default=200000)
+    parser.add_argument('--no-seed', action='store_true', help='使用既有資料，不灌入測試資料')
+    args = parser.parse_args()
+
+    workdir = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.TemporaryDirectory()
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir.name, 'plans.db')}"
+
+    # DATABASE_URL 於匯入時讀取，必須在設定環境變數之後才匯入
+    from sqlalchemy import text
+    from app import models  # noqa: F401  註冊模型，init_db 才會建立資料表
+    from app.utils.db import get_engine, init_db
+    from app.utils.migrations import run_migrations
+
+    engine = get_engine()
+    init_db()
+    run_migrations()
+    if not args.no_seed:
+        print(f"灌入測試資料：{args.users} 用戶、{args.individuals} 個人資料、{args.applications} 申請案件")
+        seed(engine, args.users, args.individuals, args.applications)
+
+    failures = 0
+    with engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            conn.execute(text('ANALYZE'))
+        else:
+            conn.execute(text('ANALYZE TABLE applications, individuals, notifications, search_terms'))
+
+        for label, sql, params, expected in HOT_QUERIES:
+            plan = explain(conn, sql, params)
+            used = [name for name in expected if re.search(rf'\b{name}\b', plan)]
+            status = 'OK  ' if used else 'FAIL'
+            failures += not used
+            print(f"[{status}] {label}")
+            print(f"       預期索引: {' 或 '.join(expected)}")
+            print(f"       執行計畫: {plan}")
+
+    engine.dispose()
+    if workdir:
+        workdir.cleanup()
+
+    if failures:
+        print(f"{failures} 個查詢未使用預期索引")
+        sys.exit(1)
+    print('所有熱門查詢皆使用預期索引')
+
+
+if __name__ == '__main__':
+    main()
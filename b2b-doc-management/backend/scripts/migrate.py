@@ -0,0 +1,17 @@
+"""
+套用資料庫遷移
+    python -m scripts.migrate
+"""
+from app import models  # noqa: F401  註冊模型，init_db 才會建立資料表
+from app.utils.db import init_db
+from app.utils.migrations import run_migrations
+
+
+def migrate():
+    init_db()
+    applied = run_migrations()
+    print(f"已套用遷移: {', '.join(applied)}" if applied else '資料庫已是最新版本')
+
+
+if __name__ == '__main__':
+    migrate()
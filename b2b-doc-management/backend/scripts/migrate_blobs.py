@@ -0,0 +1,86 @@
+"""
+將 individuals 資料列中的舊圖片（LONGBLOB）分批搬移到 blob store
+
+可在服務運行中執行：每批只讀取少量資料列並各自提交，更新時確認資料列仍未遷移，
+期間被使用者重新上傳的圖片不會被覆蓋。可重複執行，已遷移的資料列會略過。
+    python -m scripts.migrate_blobs --batch-size 50 --sleep 0.5
+"""
+import argparse
+import time
+from sqlalchemy import func, update
+
+from app.models import Individual, INDIVIDUAL_IMAGE_FIELDS
+from app.utils.blob_store import blob_store
+from app.utils.db import SessionLocal
+
+
+def migrate_batch(db, field: str, batch_size: int) -> int:
+    """
+    遷移一批資料列的指定圖片欄位
+
+    Args:
+        db: 資料庫 session
+        field: 圖片欄位名稱
+        batch_size: 每批資料列數
+
+    Returns:
+        本批處理的資料列數（0 表示此欄位已遷移完成）
+    """
+    legacy = getattr(Individual, field)
+    digest_column = getattr(Individual, f'{field}_digest')
+
+    ids = [row.id for row in db.query(Individual.id).filter(
+        legacy.isnot(None), digest_column.is_(None)
+    ).order_by(Individual.id).limit(batch_size)]
+
+    for individual_id in ids:
+        # 逐筆讀取圖片內容，避免一次載入整批 LONGBLOB
+        data = db.query(legacy).filter(Individual.id == individual_id).scalar()
+        if data is None:
+            continue
+        blob = blob_store.put(db, data)
+        result = db.execute(
+            update(Individual)
+            .where(Individual.id == individual_id, legacy.isnot(None), digest_column.is_(None))
+            .values({
+                f'{field}_digest': blob.digest,
+                f'{field}_size': blob.size,
+                f'{field}_mime': blob.mime_type,
+                f'{field}_updated_at': func.coalesce(getattr(Individual, f'{field}_updated_at'), Individual.updated_at),
+                field: None,
+                # 搬移儲存位置不算資料更新
+                'updated_at': Individual.updated_at
+            })
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            # 資料列在讀取後已被更新，撤銷這次的引用
+            blob_store.release(db, blob.digest)
+    db.commit()
+    return len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='將個人資料圖片搬移到 blob store')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--sleep', type=float, default=0.5, help='每批之間暫停的秒數，降低對線上服務的影響')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for field in INDIVIDUAL_IMAGE_FIELDS.values():
+            total = 0
+            while True:
+                processed = migrate_batch(db, field, args.batch_size)
+                if not processed:
+                    break
+                total += processed
+                print(f"{field}: 已處理 {total} 筆")
+                time.sleep(args.sleep)
+            print(f"{field}: 遷移完成，共 {total} 筆")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
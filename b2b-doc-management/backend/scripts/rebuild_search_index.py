@@ -0,0 +1,22 @@
+"""
+依現有的申請案件與個人資料重建搜尋索引（套用遷移 0007 後執行一次；之後由寫入時增量維護）
+
+可在服務運行中執行：每批各自提交，只寫入與現有索引不同的詞，可重複執行。
+    python -m scripts.rebuild_search_index --batch-size 1000
+"""
+import argparse
+
+from app.services.search_index import SearchIndexService
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建搜尋索引')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    counts = SearchIndexService.rebuild(batch_size=args.batch_size)
+    print(f"已索引 {counts['applications']} 筆申請案件、{counts['individuals']} 筆個人資料")
+
+
+if __name__ == '__main__':
+    main()
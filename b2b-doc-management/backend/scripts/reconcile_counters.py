@@ -0,0 +1,23 @@
+"""
+以 applications 重新計算申請案件統計計數並修正差異（服務內也會依 APPLICATION_COUNTER_RECONCILE_INTERVAL 定期執行）
+    python -m scripts.reconcile_counters
+"""
+import sys
+
+from app.services.application_stats import ApplicationStatsService
+
+
+def reconcile():
+    result = ApplicationStatsService.reconcile()
+    if not result['success']:
+        print(result['error'])
+        sys.exit(1)
+
+    for row in result['corrected']:
+        print(f"user_id={row['user_id']} status={row['status'] or '(無)'} urgency={row['urgency']}: "
+              f"{row['recorded']} → {row['actual']}")
+    print(f"已修正 {len(result['corrected'])} 列" if result['corrected'] else '計數與申請案件一致')
+
+
+if __name__ == '__main__':
+    reconcile()
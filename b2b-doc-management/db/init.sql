@@ -36,6 +36,18 @@ CREATE TABLE individuals (
     passport_infomation_image LONGBLOB COMMENT '護照資訊頁圖片',
     id_card_front_image LONGBLOB COMMENT '身分證正面圖片',
     id_card_back_image LONGBLOB COMMENT '身分證背面圖片',
+    passport_infomation_image_digest VARCHAR(64) COMMENT '護照資訊頁圖片摘要',
+    passport_infomation_image_size INT,
+    passport_infomation_image_mime VARCHAR(100),
+    passport_infomation_image_updated_at DATETIME,
+    id_card_front_image_digest VARCHAR(64) COMMENT '身分證正面圖片摘要',
+    id_card_front_image_size INT,
+    id_card_front_image_mime VARCHAR(100),
+    id_card_front_image_updated_at DATETIME,
+    id_card_back_image_digest VARCHAR(64) COMMENT '身分證背面圖片摘要',
+    id_card_back_image_size INT,
+    id_card_back_image_mime VARCHAR(100),
+    id_card_back_image_updated_at DATETIME,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
@@ -66,3 +78,48 @@ CREATE TABLE notifications (
     FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
+
+CREATE TABLE revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY COMMENT 'token 唯一識別碼',
+    user_id INT NULL COMMENT 'token 所屬用戶',
+    expires_at DATETIME NOT NULL COMMENT 'token 過期時間',
+    revoked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_revoked_tokens_expires_at (expires_at),
+    INDEX idx_revoked_tokens_revoked_at (revoked_at)
+);
+
+CREATE TABLE blobs (
+    digest VARCHAR(64) PRIMARY KEY COMMENT 'SHA-256 摘要（十六進位）',
+    size INT NOT NULL COMMENT '位元組數',
+    mime_type VARCHAR(100) NOT NULL,
+    refcount INT NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_blobs_refcount (refcount)
+);
+
+CREATE TABLE application_counters (
+    user_id INT NOT NULL COMMENT '申請用戶（公司）',
+    status VARCHAR(20) NOT NULL COMMENT '申請狀態（無狀態時為空字串）',
+    urgency VARCHAR(20) NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, status, urgency)
+);
+
+CREATE TABLE search_terms (
+    field VARCHAR(16) NOT NULL COMMENT 'application（客戶名稱）、individual（姓名）、national_id',
+    term VARCHAR(16) NOT NULL COMMENT '正規化後的 n-gram',
+    doc_id INT NOT NULL COMMENT '申請案件或個人資料 ID',
+    PRIMARY KEY (field, term, doc_id),
+    INDEX ix_search_terms_doc (doc_id, field)
+);
+
+-- 熱門查詢的複合索引（與 app/migrations/m0001_hot_query_indexes.py、m0004_keyset_pagination.py、m0006_user_list_indexes.py、m0007_search_index.py 一致）
+CREATE INDEX ix_applications_user_created_id ON applications (user_id, created_at, id);
+CREATE INDEX ix_applications_user_status_created_id ON applications (user_id, status, created_at, id);
+CREATE INDEX ix_applications_user_date_id ON applications (user_id, application_date, id);
+CREATE INDEX ix_applications_status_created_id ON applications (status, created_at, id);
+CREATE INDEX ix_applications_created_id ON applications (created_at, id);
+CREATE INDEX ix_applications_individual_id ON applications (individual_id);
+CREATE INDEX ix_individuals_chinese_name ON individuals (chinese_last_name, chinese_first_name);
+CREATE INDEX ix_notifications_user_read ON notifications (user_id, is_read);